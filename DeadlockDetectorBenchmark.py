@@ -0,0 +1,315 @@
+"""Бенчмарк этапов анализа WFG на синтетических графах.
+
+Генераторы с фиксированным seed строят типичные графы ожидания, каждый этап
+(разбор, поиск тупиков, построение networkx, раскладка, отрисовка в Agg без
+дисплея) замеряется отдельно. Отдельно в свежих процессах Python замеряется
+холодный запуск: импорт модулей и открытие окна, число загруженных модулей и
+пиковая память. Результат - JSON-файл, который можно сравнить с результатом
+другой ревизии.
+
+Пример:
+    python DeadlockDetectorBenchmark.py --output bench.json
+    python DeadlockDetectorBenchmark.py --sizes 10 1000 --output new.json --compare bench.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from DeadlockDetectorCore import analyze_deadlocks, detect_deadlock_wfg, parse_wfg_stream
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000, 1000000]  # Число ребер
+DEFAULT_STAGES = ['parse', 'detect', 'detect_legacy', 'networkx', 'layout', 'render']
+HEAVY_MODULES = ('matplotlib', 'networkx', 'numpy', 'tkinter')  # Их загрузку при запуске отмечает замер старта
+
+# Холодный запуск: имя -> код, выполняемый в свежем интерпретаторе
+STARTUP_TARGETS = {
+    'import_core': "import DeadlockDetectorCore",
+    'import_cli': "import DeadlockDetectorCLI",
+    'import_gui': "import DeadlockDetectorGUI",
+    # Окно показано и готово к вводу; Matplotlib к этому моменту загружаться не должен
+    'gui_window': ("import tkinter\n"
+                   "import DeadlockDetectorGUI\n"
+                   "root = tkinter.Tk()\n"
+                   "DeadlockDetectorGUI.DeadlockApp(root)\n"
+                   "root.update()\n"
+                   "root.destroy()"),
+}
+# ru_maxrss наследуется через fork+exec от процесса бенчмарка, поэтому в Linux пик памяти берется из VmHWM
+STARTUP_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+exec(compile(sys.argv[1], '<startup>', 'exec'))
+seconds = time.perf_counter() - started
+max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open('/proc/self/status') as status:
+        max_rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+except (OSError, StopIteration):
+    pass
+print(json.dumps({"seconds": seconds, "modules": len(sys.modules), "max_rss_kb": max_rss_kb,
+                  "heavy": sorted(name for name in sys.argv[2:] if name in sys.modules)}))
+"""
+MAX_LEGACY_EDGES = 10000  # Рекурсивный find_cycle_util дальше упирается в глубину стека
+MAX_RENDER_EDGES = 100000  # Отрисовка миллиона ребер в Agg занимает минуты
+
+GENERATORS = {}  # Имя -> функция(edge_count, rng) -> список строк "P1 -> P2"
+
+
+def register_generator(name):
+    def decorator(generator):
+        GENERATORS[name] = generator
+        return generator
+    return decorator
+
+
+# --- Генераторы графов ожидания ---
+@register_generator('chain')
+def generate_chain(edge_count, rng):
+    # Длинная цепочка ожидания без тупика: худший случай для рекурсивного обхода
+    return [f"P{index} -> P{index + 1}" for index in range(edge_count)]
+
+
+@register_generator('small_cycles')
+def generate_small_cycles(edge_count, rng):
+    # Много независимых тупиков на 2-8 процессов
+    lines = []
+    next_id = 0
+    while len(lines) < edge_count:
+        size = min(rng.randint(2, 8), max(edge_count - len(lines), 1))
+        members = range(next_id, next_id + size)
+        lines.extend(f"P{member} -> P{next_id + (member - next_id + 1) % size}" for member in members)
+        next_id += size
+    return lines[:edge_count]
+
+
+@register_generator('giant_scc')
+def generate_giant_scc(edge_count, rng):
+    # Одна огромная компонента: кольцо плюс случайные хорды
+    node_count = max(2, edge_count // 3)
+    lines = [f"P{index} -> P{(index + 1) % node_count}" for index in range(min(node_count, edge_count))]
+    while len(lines) < edge_count:
+        lines.append(f"P{rng.randrange(node_count)} -> P{rng.randrange(node_count)}")
+    return lines
+
+
+@register_generator('hot_locks')
+def generate_hot_locks(edge_count, rng):
+    # Высокий fan-in: тысячи процессов ждут нескольких держателей горячих блокировок,
+    # два держателя ждут друг друга
+    hot_count = max(2, int(math.sqrt(edge_count)) // 4)
+    lines = ["H0 -> H1", "H1 -> H0"][:edge_count]
+    waiter = 0
+    while len(lines) < edge_count:
+        lines.append(f"W{waiter} -> H{rng.randrange(hot_count)}")
+        waiter += 1
+    return lines
+
+
+@register_generator('power_law')
+def generate_power_law(edge_count, rng):
+    # Степенное распределение исходящей степени: немногие процессы ждут очень многих
+    node_count = max(2, edge_count // 2)
+    lines = []
+    while len(lines) < edge_count:
+        waiter = rng.randrange(node_count)
+        fan_out = min(int(rng.paretovariate(1.2)), edge_count - len(lines), node_count)
+        lines.extend(f"P{waiter} -> P{rng.randrange(node_count)}" for _ in range(fan_out))
+    return lines
+
+
+# --- Этапы ---
+def make_headless_renderer():
+    # DeadlockApp без окна: отрисовка тем же draw_graph_visual в FigureCanvasAgg
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from DeadlockDetectorGUI import DeadlockApp, load_visualization
+    load_visualization()
+    app = DeadlockApp.__new__(DeadlockApp)
+    app.master = None
+    app.layout_cache = None
+    app._init_view_state()
+    app.fig = Figure(figsize=(7, 5), dpi=100, facecolor=app.frame_bg_color)
+    app.ax = app.fig.add_subplot(111)
+    app.canvas = FigureCanvasAgg(app.fig)
+    return app
+
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def run_case(generator_name, edge_count, stages, repeat=1, seed=42, max_render_edges=MAX_RENDER_EDGES):
+    # Замеры одного графа: [{stage, seconds | error | skipped}], берется лучший из repeat запусков
+    lines = GENERATORS[generator_name](edge_count, random.Random(seed))
+    results = []
+    context = {}
+
+    def measure(stage, function, *args):
+        best = None
+        try:
+            for _ in range(repeat):
+                seconds, value = _timed(function, *args)
+                best = seconds if best is None else min(best, seconds)
+        except (RecursionError, MemoryError, ImportError) as exc:
+            results.append({"stage": stage, "error": f"{type(exc).__name__}: {exc}"})
+            return None
+        results.append({"stage": stage, "seconds": round(best, 6)})
+        return value
+
+    graph, _ = measure('parse', parse_wfg_stream, lines) if 'parse' in stages else parse_wfg_stream(lines)
+    context.update(nodes=graph.node_count, edges=graph.edge_count)
+    deadlocked_sccs, component_cycles = (measure('detect', analyze_deadlocks, graph) if 'detect' in stages
+                                         else analyze_deadlocks(graph))
+    context["deadlocked_sccs"] = len(deadlocked_sccs)
+
+    if 'detect_legacy' in stages:
+        if graph.edge_count <= MAX_LEGACY_EDGES:
+            measure('detect_legacy', detect_deadlock_wfg, graph.to_dict())
+        else:
+            results.append({"stage": 'detect_legacy', "skipped": f"больше {MAX_LEGACY_EDGES} ребер"})
+
+    heavy = [stage for stage in ('networkx', 'layout', 'render') if stage in stages]
+    if heavy:
+        try:
+            from DeadlockDetectorLayout import compute_layout, positions_to_dict
+        except ImportError as exc:
+            for stage in heavy:
+                results.append({"stage": stage, "error": f"ImportError: {exc}"})
+            return context, results
+        graph_nx = measure('networkx', graph.to_networkx) if 'networkx' in stages else None
+        components = [[graph.index_of[name] for name in component] for component in deadlocked_sccs]
+        layout = measure('layout', compute_layout, graph, 'auto', components) if 'layout' in stages else None
+
+        if 'render' in stages:
+            if graph.edge_count > max_render_edges:
+                results.append({"stage": 'render', "skipped": f"больше {max_render_edges} ребер"})
+            else:
+                if graph_nx is None:
+                    graph_nx = graph.to_networkx()
+                if layout is None:
+                    layout = compute_layout(graph, 'auto', components)
+                graph_pos = positions_to_dict(graph, layout[1])
+                cycle = component_cycles[0] if component_cycles else None
+
+                def render():
+                    app = make_headless_renderer()
+                    app.draw_graph_visual(graph, cycle, recalculate_layout_and_graph=True,
+                                          deadlocked_sccs=deadlocked_sccs,
+                                          precomputed_layout=(graph_nx, dict(graph_pos), None))
+                    app.canvas.draw()
+
+                measure('render', render)
+    return context, results
+
+
+def measure_startup(target, repeat=1):
+    # Холодный запуск в новом процессе: полное время (с запуском интерпретатора), время кода цели,
+    # число модулей, пиковая память и какие тяжелые библиотеки оказались загружены. Лучший из repeat
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", STARTUP_PROBE, STARTUP_TARGETS[target], *HEAVY_MODULES],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            return {"stage": target, "error": lines[-1] if lines else f"код возврата {completed.returncode}"}
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        if best is None or wall < best["seconds"]:
+            best = {"stage": target, "seconds": round(wall, 6), "code_seconds": round(probe["seconds"], 6),
+                    "modules": probe["modules"], "max_rss_kb": probe["max_rss_kb"], "heavy_modules": probe["heavy"]}
+    return best
+
+
+def collect_metadata(repeat, seed):
+    metadata = {
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "seed": seed,
+    }
+    try:
+        metadata["revision"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        metadata["revision"] = None
+    for module_name in ('numpy', 'networkx', 'matplotlib'):
+        try:
+            metadata[module_name] = __import__(module_name).__version__
+        except ImportError:
+            metadata[module_name] = None
+    return metadata
+
+
+def compare_results(current, baseline, threshold=1.2, min_delta=0.001):
+    # Строки сравнения "генератор/ребра/этап: было -> стало (x раз)"; замедления помечаются,
+    # если время выросло больше чем в threshold раз и хотя бы на min_delta секунд (шум мелких замеров)
+    def index(report):
+        return {(row["generator"], row["size"], row["stage"]): row["seconds"]
+                for row in report["results"] if "seconds" in row}
+
+    old, new = index(baseline), index(current)
+    lines = []
+    for key in sorted(old.keys() & new.keys(), key=lambda item: (item[0], item[1], item[2])):
+        ratio = new[key] / old[key] if old[key] > 0 else float('inf')
+        mark = "  <-- замедление" if ratio > threshold and new[key] - old[key] > min_delta else ""
+        lines.append(f"{key[0]}/{key[1]}/{key[2]}: {old[key]:.4f} -> {new[key]:.4f} с (x{ratio:.2f}){mark}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора, поиска тупиков, раскладки и отрисовки WFG.")
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Число ребер графов")
+    parser.add_argument("--stages", nargs="+", choices=DEFAULT_STAGES, default=DEFAULT_STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="Запусков на замер (берется лучший)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-render-edges", type=int, default=MAX_RENDER_EDGES)
+    parser.add_argument("--startup", nargs="*", choices=sorted(STARTUP_TARGETS), default=sorted(STARTUP_TARGETS),
+                        help="Замеры холодного запуска (без значений - не замерять)")
+    parser.add_argument("--output", default="benchmark.json", help="Файл результатов JSON")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args(argv)
+
+    report = {"metadata": collect_metadata(args.repeat, args.seed), "results": []}
+    for target in args.startup:
+        row = measure_startup(target, args.repeat)
+        report["results"].append({"generator": 'startup', "size": 0, **row})
+        timing = (f"{row['seconds']:.4f} с, модулей {row['modules']}, {row['max_rss_kb']} КБ"
+                  + (f", загружены {', '.join(row['heavy_modules'])}" if row['heavy_modules'] else "")
+                  if "seconds" in row else row["error"])
+        print(f"{'startup':>12} {0:>8} {target:>13}: {timing}", file=sys.stderr, flush=True)
+    for generator_name in args.generators:
+        for size in args.sizes:
+            context, results = run_case(generator_name, size, args.stages, args.repeat, args.seed,
+                                        args.max_render_edges)
+            for row in results:
+                report["results"].append({"generator": generator_name, "size": size, **context, **row})
+                timing = f"{row['seconds']:.4f} с" if "seconds" in row else row.get("error") or row.get("skipped")
+                print(f"{generator_name:>12} {size:>8} {row['stage']:>13}: {timing}", file=sys.stderr, flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, ensure_ascii=False, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        for line in compare_results(report, baseline):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Пакетный анализ снимков WFG без графического интерфейса.
+
+Не импортирует Tkinter/Matplotlib: работает на серверах без дисплея.
+Результат по каждому файлу - одна строка JSON в stdout.
+
+Пример:
+    python DeadlockDetectorCLI.py snapshots/ --pattern "*.wfg" --workers 16 > report.jsonl
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from DeadlockDetectorCore import WFGParseErrors, analyze_deadlocks, parse_wfg_file
+from DeadlockDetectorParallel import parallel_deadlocked_components
+from DeadlockDetectorResources import is_resource_file, parse_resource_file
+from DeadlockDetectorSnapshot import is_snapshot, open_snapshot
+
+
+def analyze_file(path, detect_workers=1):
+    # Выполняется в процессе пула: разбор и поиск всех тупиковых компонент одного снимка.
+    # Двоичный снимок (*.wfgs) не разбирается, а отображается в память, компоненты берутся из него.
+    # Файл со строками RESOURCE/HOLD/REQUEST - граф распределения ресурсов.
+    # detect_workers > 1 - большой граф делится по слабым компонентам между процессами
+    result = {"file": path}
+    started = time.perf_counter()
+    components = None
+    try:
+        if path != '-' and is_snapshot(path):
+            snapshot = open_snapshot(path)
+            parsed_graph, errors = snapshot.graph, WFGParseErrors()
+            if snapshot.has_components:
+                components = snapshot.deadlocked_components()
+        elif is_resource_file(path):
+            return _analyze_resource_file(path, result, started)
+        else:
+            parsed_graph, errors = parse_wfg_file(path)
+    except (OSError, UnicodeDecodeError, ValueError) as exc:
+        result["error"] = str(exc)
+        return result
+    parsed = time.perf_counter()
+
+    if components is None and detect_workers > 1:
+        components = parallel_deadlocked_components(parsed_graph, detect_workers)
+    deadlocked_sccs, cycles = analyze_deadlocks(parsed_graph, components)
+    detected = time.perf_counter()
+
+    result.update({
+        "deadlocked": bool(deadlocked_sccs),
+        "cycles": cycles,
+        "scc_sizes": [len(component) for component in deadlocked_sccs],
+        "nodes": parsed_graph.node_count,
+        "edges": parsed_graph.edge_count,
+        "parse_errors": errors.count,
+        "timings": {"parse": round(parsed - started, 6), "detect": round(detected - parsed, 6)},
+    })
+    return result
+
+
+def _analyze_resource_file(path, result, started):
+    # Граф распределения ресурсов (RESOURCE/HOLD/REQUEST): тупик ищется редукцией, а не по циклам
+    allocation, errors = parse_resource_file(path)
+    parsed = time.perf_counter()
+    reduction = allocation.reduce()
+    detected = time.perf_counter()
+    result.update({
+        "deadlocked": bool(reduction),
+        "deadlocked_processes": reduction.deadlocked,
+        "deadlocked_resources": reduction.deadlocked_resources,
+        "processes": len(allocation.processes),
+        "resources": len(allocation.resources),
+        "edges": len(allocation.holds) + len(allocation.requests),
+        "parse_errors": errors.count,
+        "timings": {"parse": round(parsed - started, 6), "detect": round(detected - parsed, 6)},
+    })
+    return result
+
+
+def collect_files(inputs, pattern):
+    # Аргументы: файлы, каталоги (файлы по pattern) или glob-шаблоны; '-' - stdin
+    files = []
+    for item in inputs:
+        if item == '-':
+            files.append(item)
+        elif os.path.isdir(item):
+            files.extend(sorted(path for path in glob.glob(os.path.join(item, pattern)) if os.path.isfile(path)))
+        elif glob.has_magic(item):
+            files.extend(sorted(path for path in glob.glob(item) if os.path.isfile(path)))
+        else:
+            files.append(item)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный поиск тупиков в снимках графа ожидания (WFG).")
+    parser.add_argument("inputs", nargs="+", help="Файлы, каталоги или glob-шаблоны снимков ('-' - stdin)")
+    parser.add_argument("--pattern", default="*", help="Шаблон имен файлов внутри каталогов (по умолчанию '*')")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Число процессов пула (1 - без пула); для одного файла - процессы поиска тупиков")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs, args.pattern)
+    if not files:
+        parser.error("не найдено ни одного файла для анализа")
+
+    if args.workers <= 1 or len(files) == 1 or '-' in files:
+        # Пул по файлам не нужен - процессы отдаются поиску тупиков внутри каждого графа
+        for result in (analyze_file(path, args.workers) for path in files):
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        return 0
+
+    # map сохраняет порядок файлов; chunksize снижает накладные расходы на тысячах мелких снимков
+    chunksize = max(1, len(files) // (args.workers * 4))
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(analyze_file, files, chunksize=chunksize):
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Сжатое представление графа ожидания для просмотра больших графов.
+
+Каждая тупиковая компонента сильной связности сворачивается в одну супервершину.
+Остальные (ациклические) процессы объединяются в группы: процессы попадают в одну
+группу, если они связаны друг с другом и одинаково связаны с тупиками (достигают
+одних и тех же тупиковых компонент и достижимы из одних и тех же). Сжатый граф при
+этом остается ациклическим, а его размер зависит от числа компонент, а не процессов.
+Только стандартная библиотека, как и DeadlockDetectorCore.
+"""
+from array import array
+
+from DeadlockDetectorCore import WFGraphBuilder
+
+
+class WFGCondensation:
+    def __init__(self, graph, deadlocked_components=None):
+        # deadlocked_components - списки ID вершин, если они уже найдены (иначе ищутся заново)
+        self.graph = graph
+        if deadlocked_components is None:
+            deadlocked_components = graph.deadlocked_components()
+        self.groups = []  # ID группы -> список ID вершин
+        self.deadlocked = []  # ID группы -> тупиковая ли это компонента
+        self.group_of = array('i', [-1]) * graph.node_count  # ID вершины -> ID группы
+        for component in deadlocked_components:
+            self._add_group(component, True)
+        self._group_acyclic_nodes(len(deadlocked_components))
+
+        names = graph.names
+        self.labels = []  # ID группы -> имя супервершины (для одиночек - имя процесса)
+        deadlock_number = region_number = 0
+        for members, is_deadlocked in zip(self.groups, self.deadlocked):
+            if len(members) == 1:
+                self.labels.append(names[members[0]])
+            elif is_deadlocked:
+                deadlock_number += 1
+                self.labels.append(f"[тупик {deadlock_number}: {len(members)}]")
+            else:
+                region_number += 1
+                self.labels.append(f"[группа {region_number}: {len(members)}]")
+        # Имена процессов не содержат пробелов, поэтому с метками супервершин они не совпадут
+        self._group_by_label = {label: group for group, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def _add_group(self, members, is_deadlocked):
+        group = len(self.groups)
+        self.groups.append(list(members))
+        self.deadlocked.append(is_deadlocked)
+        for node_id in members:
+            self.group_of[node_id] = group
+
+    def _group_acyclic_nodes(self, deadlock_count):
+        # Узлы DAG компонент: тупиковая компонента c -> c, ациклическая вершина v -> deadlock_count + v
+        graph = self.graph
+        node_count = graph.node_count
+        unit_of = array('i', (self.group_of[node_id] if self.group_of[node_id] >= 0 else deadlock_count + node_id
+                              for node_id in range(node_count)))
+        unit_count = deadlock_count + node_count
+        successors = [[] for _ in range(unit_count)]
+        predecessors = [[] for _ in range(unit_count)]
+        indegree = array('i', bytes(4 * unit_count))
+        for source, target in graph.edges():
+            source_unit, target_unit = unit_of[source], unit_of[target]
+            if source_unit != target_unit:
+                successors[source_unit].append(target_unit)
+                predecessors[target_unit].append(source_unit)
+                indegree[target_unit] += 1
+
+        # Топологический порядок (Кан); пустые слоты тупиковых вершин просто проходят насквозь
+        order = [unit for unit in range(unit_count) if indegree[unit] == 0]
+        for unit in order:
+            for successor in successors[unit]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    order.append(successor)
+
+        # Множества тупиковых компонент ниже (ожидаемых) и выше (ожидающих) каждого узла DAG.
+        # Одинаковые множества разделяются, поэтому на типичных графах памяти уходит немного
+        interned = {}
+        empty = frozenset()
+        below = self._reachable_deadlocks(reversed(order), successors, deadlock_count, interned, empty, unit_count)
+        above = self._reachable_deadlocks(order, predecessors, deadlock_count, interned, empty, unit_count)
+
+        # Группа - связный кусок ациклических вершин с одинаковой парой множеств: любой цикл
+        # между группами означал бы равенство их множеств, поэтому сжатый граф остается DAG
+        parent = array('i', range(node_count))
+
+        def find(node_id):
+            while parent[node_id] != node_id:
+                parent[node_id] = parent[parent[node_id]]
+                node_id = parent[node_id]
+            return node_id
+
+        for source, target in graph.edges():
+            if self.group_of[source] < 0 and self.group_of[target] < 0:
+                source_unit, target_unit = unit_of[source], unit_of[target]
+                if below[source_unit] is below[target_unit] and above[source_unit] is above[target_unit]:
+                    root_source, root_target = find(source), find(target)
+                    if root_source != root_target:
+                        parent[max(root_source, root_target)] = min(root_source, root_target)
+
+        members_by_root = {}
+        for node_id in range(node_count):
+            if self.group_of[node_id] < 0:
+                members_by_root.setdefault(find(node_id), []).append(node_id)
+        for members in members_by_root.values():
+            self._add_group(members, False)
+
+    @staticmethod
+    def _reachable_deadlocks(order, neighbors, deadlock_count, interned, empty, unit_count):
+        reached = [empty] * unit_count
+        with_self = [empty] * unit_count  # reached плюс сам узел, если это тупиковая компонента
+        for unit in order:
+            accumulated = empty
+            for neighbor in neighbors[unit]:
+                contribution = with_self[neighbor]
+                if contribution is not accumulated and not contribution <= accumulated:
+                    accumulated = accumulated | contribution
+            accumulated = interned.setdefault(accumulated, accumulated)
+            reached[unit] = accumulated
+            if unit < deadlock_count:
+                own = accumulated | {unit}
+                with_self[unit] = interned.setdefault(own, own)
+            else:
+                with_self[unit] = accumulated
+        return reached
+
+    def group_of_name(self, name):
+        # Группа по имени в представлении: метке супервершины или имени процесса
+        group = self._group_by_label.get(name)
+        if group is None:
+            node_id = self.graph.index_of.get(name)
+            group = None if node_id is None else self.group_of[node_id]
+        return group
+
+    def view(self, expanded=()):
+        # (граф представления, тупиковые компоненты в его именах, {метка: число процессов}).
+        # Группы из expanded показываются своими процессами, остальные - супервершинами
+        expanded = set(expanded)
+        graph = self.graph
+        names = graph.names
+        builder = WFGraphBuilder()
+        view_id_of = array('i', bytes(4 * graph.node_count))
+        collapsed_sizes = {}
+        for group, members in enumerate(self.groups):
+            if len(members) == 1 or group in expanded:
+                for node_id in members:
+                    view_id_of[node_id] = builder.intern(names[node_id])
+            else:
+                label_id = builder.intern(self.labels[group])
+                collapsed_sizes[self.labels[group]] = len(members)
+                for node_id in members:
+                    view_id_of[node_id] = label_id
+
+        view_names = builder.names
+        for source, target in graph.edges():
+            view_source, view_target = view_id_of[source], view_id_of[target]
+            if view_source != view_target or (source == target and view_names[view_source] == names[source]):
+                builder.add_edge(view_names[view_source], view_names[view_target])
+
+        deadlocked_view_components = []
+        for group, members in enumerate(self.groups):
+            if self.deadlocked[group]:
+                if len(members) == 1 or group in expanded:
+                    deadlocked_view_components.append([names[node_id] for node_id in members])
+                else:
+                    deadlocked_view_components.append([self.labels[group]])
+        return builder.build(), deadlocked_view_components, collapsed_sizes
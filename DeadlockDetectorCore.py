@@ -0,0 +1,955 @@
+"""Ядро детектора тупиков: разбор WFG и алгоритмы поиска циклов.
+
+Модуль использует только стандартную библиотеку и не импортирует Tkinter/Matplotlib,
+поэтому подходит для серверов без дисплея (см. DeadlockDetectorCLI.py).
+"""
+import sys
+import time
+from array import array
+
+COST_DIRECTIVE = '#@cost'  # '#@cost P1 5' - стоимость снятия процесса P1 при разрешении тупика
+
+
+def find_cycle_util(node, graph, visited, recursion_stack, path_accumulator):
+    visited.add(node)
+    recursion_stack.add(node)
+    path_accumulator.append(node)
+    for neighbor in graph.get(node, []):
+        if neighbor not in visited:
+            cycle = find_cycle_util(neighbor, graph, visited, recursion_stack, path_accumulator)
+            if cycle:
+                return cycle
+        elif neighbor in recursion_stack:
+            try:
+                start_index = path_accumulator.index(neighbor)
+                return path_accumulator[start_index:]
+            except ValueError:
+                return []
+    recursion_stack.remove(node)
+    path_accumulator.pop()
+    return None
+
+
+def detect_deadlock_wfg(graph):
+    if not graph:
+        return None
+    all_nodes = set(graph.keys())
+    for dependencies in graph.values():
+        all_nodes.update(dependencies)
+    visited = set()
+    recursion_stack = set()
+    for node in sorted(list(all_nodes)):
+        if node not in visited:
+            path_accumulator = []
+            cycle = find_cycle_util(node, graph, visited, recursion_stack, path_accumulator)
+            if cycle:
+                return cycle
+    return None
+
+
+class WFGraphBuilder:
+    # Накопитель ребер: имена процессов интернируются в плотные int ID один раз,
+    # дубликаты ребер отсекаются по множеству целочисленных ключей.
+    def __init__(self):
+        self.names = []  # ID -> имя процесса
+        self.index_of = {}  # Имя процесса -> ID
+        self._sources = array('i')
+        self._targets = array('i')
+        self._seen_edges = set()
+
+    def intern(self, name):
+        node_id = self.index_of.get(name)
+        if node_id is None:
+            node_id = len(self.names)
+            self.index_of[name] = node_id
+            self.names.append(name)
+        return node_id
+
+    def add_edge(self, waiter, holder):
+        source = self.intern(waiter)
+        target = self.intern(holder)
+        key = (source << 32) | target
+        if key in self._seen_edges:
+            return False
+        self._seen_edges.add(key)
+        self._sources.append(source)
+        self._targets.append(target)
+        return True
+
+    def build(self):
+        return WFGraph.from_arrays(self.names, self.index_of, self._sources, self._targets)
+
+
+class WFGraph:
+    # Граф ожидания в формате CSR (compressed sparse row): исходящие ребра вершины i
+    # лежат в targets[offsets[i]:offsets[i + 1]]. Алгоритмы работают прямо на массивах.
+    def __init__(self, names, index_of, offsets, targets):
+        self.names = names
+        self.index_of = index_of
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def from_arrays(cls, names, index_of, sources, targets):
+        # Сортировка подсчетом по источнику - O(V+E), без промежуточных списков
+        node_count = len(names)
+        offsets = array('q', bytes(8 * (node_count + 1)))
+        for source in sources:
+            offsets[source + 1] += 1
+        for node_id in range(node_count):
+            offsets[node_id + 1] += offsets[node_id]
+        fill = array('q', offsets)
+        csr_targets = array('i', bytes(4 * len(targets)))
+        for source, target in zip(sources, targets):
+            csr_targets[fill[source]] = target
+            fill[source] += 1
+        return cls(names, index_of, offsets, csr_targets)
+
+    @classmethod
+    def from_dict(cls, graph):
+        builder = WFGraphBuilder()
+        for waiter, holders in graph.items():
+            builder.intern(waiter)
+            for holder in holders:
+                builder.add_edge(waiter, holder)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def node_count(self):
+        return len(self.names)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def neighbors(self, node_id):
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def has_edge(self, source, target):
+        return target in self.neighbors(source)
+
+    def edges(self):
+        offsets = self.offsets
+        targets = self.targets
+        for source in range(self.node_count):
+            for position in range(offsets[source], offsets[source + 1]):
+                yield source, targets[position]
+
+    def to_dict(self):
+        # Обратная совместимость с форматом parse_input/detect_deadlock_wfg
+        graph = {}
+        for source, target in self.edges():
+            graph.setdefault(self.names[source], []).append(self.names[target])
+        return graph
+
+    def to_networkx(self, node_ids=None):
+        # Адаптер только для реально отрисовываемого подграфа
+        import networkx as nx
+        graph_nx = nx.DiGraph()
+        names = self.names
+        if node_ids is None:
+            graph_nx.add_nodes_from(names)
+            graph_nx.add_edges_from((names[source], names[target]) for source, target in self.edges())
+            return graph_nx
+        selected = set(node_ids)
+        graph_nx.add_nodes_from(names[node_id] for node_id in selected)
+        graph_nx.add_edges_from((names[source], names[target])
+                                for source in selected for target in self.neighbors(source)
+                                if target in selected)
+        return graph_nx
+
+    def deadlocked_components(self, roots=None):
+        # Итеративный алгоритм Тарьяна на массивах: за один проход O(V+E) находит все
+        # нетривиальные компоненты сильной связности и петли (P -> P).
+        # Явный стек вместо рекурсии - длинные цепочки ожидания не упираются в recursionlimit.
+        # roots - обход только от этих вершин (например, одной слабой компоненты); по умолчанию - все
+        node_count = len(self.offsets) - 1
+        offsets = self.offsets
+        targets = self.targets
+        index = array('i', [-1]) * node_count
+        lowlink = array('i', bytes(4 * node_count))
+        # Следующее непросмотренное ребро вершины; копия через байты, а не поэлементно (offsets бывает memoryview)
+        edge_cursor = array('q', memoryview(offsets)[:node_count].tobytes())
+        on_stack = bytearray(node_count)
+        scc_stack = []
+        components = []
+        counter = 0
+
+        for root in (range(node_count) if roots is None else roots):
+            if index[root] != -1:
+                continue
+            index[root] = lowlink[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            on_stack[root] = 1
+            work_stack = [root]
+
+            while work_stack:
+                node = work_stack[-1]
+                position = edge_cursor[node]
+                end = offsets[node + 1]
+                descended = False
+                while position < end:
+                    neighbor = targets[position]
+                    position += 1
+                    if index[neighbor] == -1:
+                        index[neighbor] = lowlink[neighbor] = counter
+                        counter += 1
+                        scc_stack.append(neighbor)
+                        on_stack[neighbor] = 1
+                        work_stack.append(neighbor)
+                        descended = True
+                        break
+                    elif on_stack[neighbor] and index[neighbor] < lowlink[node]:
+                        lowlink[node] = index[neighbor]
+                edge_cursor[node] = position
+                if descended:
+                    continue
+
+                work_stack.pop()
+                if work_stack:
+                    parent = work_stack[-1]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or self.has_edge(node, node):
+                        component.reverse()  # Порядок обнаружения
+                        components.append(component)
+
+        components.sort(key=lambda comp: index[comp[0]])
+        return components
+
+    def cycle_in_component(self, component):
+        # Любой конкретный цикл внутри компоненты: в нетривиальной SCC у каждой вершины
+        # есть исходящее ребро внутри компоненты, поэтому обход по ним обязательно замкнется.
+        members = set(component)
+        position = {}
+        path = []
+        node = component[0]
+        while node not in position:
+            position[node] = len(path)
+            path.append(node)
+            node = next(neighbor for neighbor in self.neighbors(node) if neighbor in members)
+        return path[position[node]:]
+
+    def elementary_cycles(self, component, max_length=None, expired=None):
+        # Генератор элементарных циклов внутри компоненты (алгоритм Джонсона, итеративно).
+        # Циклы через наименьшую вершину перечисляются, затем она удаляется, а остаток
+        # снова делится на компоненты - в памяти только текущий путь и множества блокировок.
+        pending = [sorted(component)]
+        steps = 0
+        while pending:
+            members = pending.pop()
+            member_set = set(members)
+            start = members[0]
+            local = {node: [neighbor for neighbor in self.neighbors(node) if neighbor in member_set]
+                     for node in members}
+            path = [start]
+            blocked = {start}
+            blocked_by = {}  # Вершина -> вершины, разблокируемые вместе с ней
+            stack = [(start, list(local[start]))]
+            closed = [False]
+            while stack:
+                steps += 1
+                if expired is not None and steps & 1023 == 0 and expired():
+                    return
+                node, pending_neighbors = stack[-1]
+                if pending_neighbors:
+                    neighbor = pending_neighbors.pop()
+                    if neighbor == start:
+                        yield list(path)
+                        closed[-1] = True
+                    elif neighbor not in blocked:
+                        if max_length is not None and len(path) >= max_length:
+                            # Обрезанная ветвь считается успешной: иначе вершина осталась бы
+                            # заблокированной и пропали бы короткие циклы через нее
+                            closed[-1] = True
+                        else:
+                            path.append(neighbor)
+                            stack.append((neighbor, list(local[neighbor])))
+                            closed.append(False)
+                            blocked.add(neighbor)
+                            continue
+                if not pending_neighbors:
+                    stack.pop()
+                    path.pop()
+                    if closed.pop():
+                        if closed:
+                            closed[-1] = True
+                        self._unblock(node, blocked, blocked_by)
+                    else:
+                        for neighbor in local[node]:
+                            blocked_by.setdefault(neighbor, set()).add(node)
+            rest = {node: [neighbor for neighbor in local[node] if neighbor != start]
+                    for node in members[1:]}
+            pending.extend(sorted(piece) for piece in reversed(find_deadlocked_sccs(rest)))
+
+    @staticmethod
+    def _unblock(node, blocked, blocked_by):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current in blocked:
+                blocked.discard(current)
+                stack.extend(blocked_by.pop(current, ()))
+
+
+def find_deadlocked_sccs(graph):
+    # Все тупиковые компоненты по именам процессов; принимает WFGraph или словарь parse_input
+    if not graph:
+        return []
+    if not isinstance(graph, WFGraph):
+        graph = WFGraph.from_dict(graph)
+    names = graph.names
+    return [[names[node_id] for node_id in component] for component in graph.deadlocked_components()]
+
+
+def find_cycle_in_scc(graph, component):
+    if not isinstance(graph, WFGraph):
+        graph = WFGraph.from_dict(graph)
+    names = graph.names
+    cycle = graph.cycle_in_component([graph.index_of[name] for name in component])
+    return [names[node_id] for node_id in cycle]
+
+
+def iter_deadlock_cycles(graph, max_cycles=None, max_length=None, time_limit=None):
+    # Ленивый перебор всех элементарных циклов по именам процессов, компонента за компонентой.
+    # Ограничения: число циклов, длина цикла и время счета (с) - паузы, пока потребитель не
+    # запрашивает следующий цикл, не учитываются. При любом ограничении генератор просто заканчивается
+    if not graph:
+        return
+    if not isinstance(graph, WFGraph):
+        graph = WFGraph.from_dict(graph)
+    names = graph.names
+    deadline = [time.perf_counter() + time_limit] if time_limit is not None else None
+
+    def expired():
+        return time.perf_counter() > deadline[0]
+
+    if max_cycles is not None and max_cycles <= 0:
+        return
+    produced = 0
+    for component in graph.deadlocked_components():
+        for cycle in graph.elementary_cycles(component, max_length, expired if deadline else None):
+            produced += 1
+            paused = time.perf_counter()
+            yield [names[node_id] for node_id in cycle]
+            # Предел проверяется сразу после выдачи: иначе следующий next() запустил бы лишний поиск
+            if max_cycles is not None and produced >= max_cycles:
+                return
+            if deadline is not None:
+                deadline[0] += time.perf_counter() - paused
+        if deadline is not None and expired():
+            return
+
+
+class WFGParseErrors:
+    # Сводный отчет о некорректных строках: считаются все, подробно хранятся первые max_samples
+    def __init__(self, max_samples=100):
+        self.max_samples = max_samples
+        self.count = 0
+        self.samples = []  # (номер строки, строка, причина)
+
+    def __bool__(self):
+        return self.count > 0
+
+    def add(self, line_number, line, reason):
+        self.count += 1
+        if len(self.samples) < self.max_samples:
+            self.samples.append((line_number, line, reason))
+
+    def format_report(self, limit=20):
+        report_lines = [f"Строка {line_number}: '{line}'. {reason}"
+                        for line_number, line, reason in self.samples[:limit]]
+        if self.count > limit:
+            report_lines.append(f"... и еще некорректных строк: {self.count - limit}")
+        return "\n".join(report_lines)
+
+
+def parse_wfg_line(line):
+    # (ожидающий, удерживающий) или None для пустых строк и комментариев
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if '->' in line:
+        parts = line.split('->', 1)
+    else:
+        parts = line.split(None, 1)
+    if len(parts) != 2:
+        raise ValueError("Неверный формат. Используйте 'P1 -> P2' или 'P1 P2'.")
+    p_waiting = parts[0].strip()
+    p_holding = parts[1].strip()
+    if not p_waiting or not p_holding:
+        raise ValueError("Пустое имя процесса.")
+    if ' ' in p_waiting or ' ' in p_holding:
+        raise ValueError("Имена процессов не должны содержать пробелов.")
+    return p_waiting, p_holding
+
+
+def parse_wfg_cost(line):
+    # (процесс, стоимость) для директивы '#@cost P1 5', None для всех остальных строк.
+    # Для старых версий директива - обычный комментарий
+    line = line.strip()
+    if not line.startswith(COST_DIRECTIVE):
+        return None
+    parts = line[len(COST_DIRECTIVE):].split()
+    if len(parts) != 2:
+        raise ValueError(f"Неверный формат. Используйте '{COST_DIRECTIVE} P1 5'.")
+    try:
+        cost = float(parts[1])
+    except ValueError:
+        raise ValueError(f"Стоимость должна быть числом: '{parts[1]}'.") from None
+    if not 0 < cost < float('inf'):
+        raise ValueError("Стоимость должна быть положительным конечным числом.")
+    return parts[0], cost
+
+
+def iter_wfg_edges(lines, errors=None, costs=None):
+    # Генератор ребер по любому итерируемому источнику строк (файл, stdin, StringIO).
+    # Без errors первая ошибка прерывает разбор, с errors - строка пропускается и попадает в отчет.
+    # costs - словарь, в который попутно собираются стоимости из директив '#@cost' (None - не собирать)
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            edge = parse_wfg_line(line)
+            if edge is None and costs is not None:  # Директива - комментарий, ребра разбираются без проверки
+                cost = parse_wfg_cost(line)
+                if cost is not None:
+                    costs[cost[0]] = cost[1]
+        except ValueError as exc:
+            if errors is None:
+                raise ValueError(f"Строка {line_number}: {exc}") from None
+            errors.add(line_number, line.strip(), str(exc))
+            continue
+        if edge is not None:
+            yield edge
+
+
+def parse_wfg_costs(lines, errors=None):
+    # Только стоимости процессов из директив '#@cost': {имя: стоимость}
+    costs = {}
+    for _ in iter_wfg_edges(lines, errors, costs):
+        pass
+    return costs
+
+
+def parse_wfg_stream(lines, costs=None):
+    # Однопроходный разбор в CSR-граф: в памяти только ребра, а не весь текст
+    errors = WFGParseErrors()
+    builder = WFGraphBuilder()
+    for p_waiting, p_holding in iter_wfg_edges(lines, errors, costs):
+        builder.add_edge(p_waiting, p_holding)
+    return builder.build(), errors
+
+
+def parse_wfg_file(path, costs=None):
+    # path == '-' читает stdin
+    if path == '-':
+        return parse_wfg_stream(sys.stdin, costs)
+    with open(path, encoding='utf-8') as source:
+        return parse_wfg_stream(source, costs)
+
+
+def analyze_deadlocks(graph, components=None):
+    # Тупиковые компоненты и по одному конкретному циклу в каждой - по именам процессов.
+    # components - уже известные компоненты (списки ID), например из двоичного снимка
+    names = graph.names
+    if components is None:
+        components = graph.deadlocked_components()
+    deadlocked_sccs = [[names[node_id] for node_id in component] for component in components]
+    component_cycles = [[names[node_id] for node_id in graph.cycle_in_component(component)]
+                        for component in components]
+    return deadlocked_sccs, component_cycles
+
+
+class IncrementalWFG:
+    # Онлайн-обнаружение тупиков для потока событий "ожидание/освобождение".
+    # Поддерживается динамический топологический порядок (Pearce-Kelly) над
+    # компонентами сильной связности: новое ребро проверяется поиском только в
+    # области между метками его концов, найденный цикл сжимается в одну компоненту.
+    LABEL_GAP = 1 << 32  # Разреженные метки оставляют место для разбиения компонент
+
+    def __init__(self):
+        self._succ = {}  # Процесс -> множество процессов, которых он ждет
+        self._pred = {}  # Процесс -> множество процессов, ждущих его
+        self._comp = {}  # Процесс -> id компоненты
+        self._members = {}  # id компоненты -> множество процессов
+        self._label = {}  # id компоненты -> метка топологического порядка
+        self._used_labels = set()
+        self._deadlocked = set()  # id компонент, образующих тупик
+        self._next_comp_id = 0
+        self._max_label = 0
+
+    @classmethod
+    def from_graph(cls, graph):
+        # Начальное состояние по готовому WFGraph за O(V+E): компоненты - одним проходом Тарьяна,
+        # метки - топологический порядок сжатого графа. Поребренный add_wait на больших графах
+        # с гигантской компонентой квадратичен
+        incremental = cls()
+        names = graph.names
+        node_count = graph.node_count
+        components = graph.deadlocked_components()
+        unit_of = array('i', [-1]) * node_count  # Вершина -> ее компонента (одиночки - свои номера)
+        for unit, component in enumerate(components):
+            for node_id in component:
+                unit_of[node_id] = unit
+        unit_count = len(components)
+        for node_id in range(node_count):
+            if unit_of[node_id] == -1:
+                unit_of[node_id] = unit_count
+                unit_count += 1
+        successors = [[] for _ in range(unit_count)]
+        indegree = array('i', bytes(4 * unit_count))
+        has_edges = bytearray(node_count)
+        for source, target in graph.edges():
+            has_edges[source] = has_edges[target] = 1
+            source_unit, target_unit = unit_of[source], unit_of[target]
+            if source_unit != target_unit:
+                successors[source_unit].append(target_unit)
+                indegree[target_unit] += 1
+        order = [unit for unit in range(unit_count) if indegree[unit] == 0]
+        for unit in order:
+            for successor in successors[unit]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    order.append(successor)
+
+        members = [set() for _ in range(unit_count)]
+        for node_id in range(node_count):
+            if has_edges[node_id]:  # Процессы без ожиданий IncrementalWFG не хранит
+                name = names[node_id]
+                members[unit_of[node_id]].add(name)
+                incremental._succ[name] = set()
+                incremental._pred[name] = set()
+        for source, target in graph.edges():
+            incremental._succ[names[source]].add(names[target])
+            incremental._pred[names[target]].add(names[source])
+        for unit in order:
+            if not members[unit]:
+                continue
+            incremental._max_label += cls.LABEL_GAP
+            comp_id = incremental._new_comp(members[unit], incremental._max_label)
+            for name in members[unit]:
+                incremental._comp[name] = comp_id
+            if unit < len(components):
+                incremental._deadlocked.add(comp_id)
+        return incremental
+
+    def __contains__(self, node):
+        return node in self._succ
+
+    def has_wait(self, waiter, holder):
+        return holder in self._succ.get(waiter, ())
+
+    def edge_count(self):
+        return sum(len(holders) for holders in self._succ.values())
+
+    def node_count(self):
+        return len(self._succ)
+
+    def in_same_component(self, node, other):
+        return node in self._comp and self._comp[node] == self._comp.get(other)
+
+    def component_size(self, node):
+        # Процессов в компоненте node (0 - процесса нет): столько стоит разбиение после remove_wait внутри нее
+        comp_id = self._comp.get(node)
+        return 0 if comp_id is None else len(self._members[comp_id])
+
+    def has_deadlock(self):
+        return bool(self._deadlocked)
+
+    def deadlocked_sccs(self):
+        return [sorted(self._members[comp_id]) for comp_id in sorted(self._deadlocked, key=self._label.get)]
+
+    def to_graph(self, nodes=None):
+        # Снимок в формате parse_input - для перекрестной проверки пакетным detect_deadlock_wfg.
+        # nodes - только подграф на этих процессах (например, на тупиковых компонентах)
+        if nodes is None:
+            return {node: sorted(holders) for node, holders in self._succ.items() if holders}
+        nodes = set(nodes)
+        return {node: sorted(holder for holder in self._succ[node] if holder in nodes)
+                for node in nodes if node in self._succ}
+
+    def cycle_in_component(self, component):
+        # Один конкретный цикл тупиковой компоненты (список процессов из deadlocked_sccs)
+        members = set(component)
+        node = component[0]
+        holder = next(holder for holder in self._succ[node] if holder in members)
+        return [node] + self._path_within(holder, node, members)[:-1]
+
+    def add_wait(self, waiter, holder):
+        # Возвращает новый цикл (список процессов), если ребро его замкнуло, иначе None
+        self._ensure_node(waiter)
+        self._ensure_node(holder)
+        if holder in self._succ[waiter]:
+            return None
+        self._succ[waiter].add(holder)
+        self._pred[holder].add(waiter)
+
+        comp_u = self._comp[waiter]
+        comp_v = self._comp[holder]
+        if comp_u == comp_v:
+            # Ребро внутри уже существующей компоненты (или петля)
+            self._deadlocked.add(comp_u)
+            return [waiter] + self._path_within(holder, waiter, self._members[comp_u])[:-1]
+        if self._label[comp_u] < self._label[comp_v]:
+            return None
+
+        lower = self._label[comp_v]
+        upper = self._label[comp_u]
+        forward = self._search(comp_v, self._succ, lambda label: label <= upper)
+        backward = self._search(comp_u, self._pred, lambda label: label >= lower)
+
+        if comp_u not in forward:
+            self._reassign_labels(sorted(backward, key=self._label.get) + sorted(forward, key=self._label.get))
+            return None
+
+        # Все компоненты на путях holder ~> waiter сливаются в одну
+        merged = forward & backward
+        merged_nodes = set()
+        for comp_id in merged:
+            merged_nodes.update(self._members[comp_id])
+        # Как в обычном Pearce-Kelly, но сливаемые компоненты идут подряд между B и F
+        self._reassign_labels(
+            sorted(backward - merged, key=self._label.get) + sorted(merged, key=self._label.get) +
+            sorted(forward - merged, key=self._label.get))
+        self._merge(merged)
+        return [waiter] + self._path_within(holder, waiter, merged_nodes)[:-1]
+
+    def remove_wait(self, waiter, holder):
+        if holder not in self._succ.get(waiter, ()):
+            return False
+        self._succ[waiter].discard(holder)
+        self._pred[holder].discard(waiter)
+
+        comp_id = self._comp[waiter]
+        if comp_id == self._comp[holder]:
+            self._split(comp_id)
+        for node in {waiter, holder}:
+            if not self._succ[node] and not self._pred[node]:
+                self._drop_node(node)
+        return True
+
+    # --- Внутренние операции ---
+    def _ensure_node(self, node):
+        if node in self._succ:
+            return
+        self._succ[node] = set()
+        self._pred[node] = set()
+        self._max_label += self.LABEL_GAP
+        comp_id = self._new_comp({node}, self._max_label)
+        self._comp[node] = comp_id
+
+    def _new_comp(self, members, label):
+        comp_id = self._next_comp_id
+        self._next_comp_id += 1
+        self._members[comp_id] = members
+        self._label[comp_id] = label
+        self._used_labels.add(label)
+        return comp_id
+
+    def _drop_node(self, node):
+        comp_id = self._comp.pop(node)
+        del self._succ[node]
+        del self._pred[node]
+        self._used_labels.discard(self._label.pop(comp_id))
+        del self._members[comp_id]
+        self._deadlocked.discard(comp_id)
+
+    def _comp_neighbors(self, comp_id, adjacency):
+        for node in self._members[comp_id]:
+            for neighbor in adjacency[node]:
+                neighbor_comp = self._comp[neighbor]
+                if neighbor_comp != comp_id:
+                    yield neighbor_comp
+
+    def _search(self, start_comp, adjacency, in_bounds):
+        # Обход только "затронутой области" - компонент с метками в границах
+        visited = {start_comp}
+        stack = [start_comp]
+        while stack:
+            comp_id = stack.pop()
+            for neighbor_comp in self._comp_neighbors(comp_id, adjacency):
+                if neighbor_comp not in visited and in_bounds(self._label[neighbor_comp]):
+                    visited.add(neighbor_comp)
+                    stack.append(neighbor_comp)
+        return visited
+
+    def _reassign_labels(self, ordered_comps):
+        # Пул меток затронутых компонент раздается им заново в новом порядке
+        pool = sorted(self._label[comp_id] for comp_id in ordered_comps)
+        for comp_id, label in zip(ordered_comps, pool):
+            self._label[comp_id] = label
+
+    def _merge(self, comp_ids):
+        merged_id = max(comp_ids, key=lambda comp_id: len(self._members[comp_id]))
+        merged_members = self._members[merged_id]
+        # Метки сливаемых компонент идут подряд - оставляем наименьшую
+        kept_label = min(self._label[comp_id] for comp_id in comp_ids)
+        for comp_id in comp_ids:
+            self._used_labels.discard(self._label[comp_id])
+        self._label[merged_id] = kept_label
+        self._used_labels.add(kept_label)
+        for comp_id in comp_ids:
+            if comp_id == merged_id:
+                continue
+            for node in self._members.pop(comp_id):
+                self._comp[node] = merged_id
+                merged_members.add(node)
+            del self._label[comp_id]
+            self._deadlocked.discard(comp_id)
+        self._deadlocked.add(merged_id)
+        return merged_id
+
+    def _split(self, comp_id):
+        members = self._members[comp_id]
+        local_graph = {node: [holder for holder in self._succ[node] if holder in members] for node in members}
+        pieces = find_deadlocked_sccs(local_graph)
+        # Тривиальные компоненты (одиночные процессы без петли) тоже становятся частями
+        pieces_by_node = {}
+        for piece in pieces:
+            for node in piece:
+                pieces_by_node[node] = piece
+        if len(pieces) == 1 and len(pieces[0]) == len(members):
+            return  # Компонента осталась сильно связной
+        if len(members) == 1:
+            self._deadlocked.discard(comp_id)  # Удалена петля
+            return
+
+        ordered_pieces = self._topological_pieces(members, local_graph, pieces_by_node)
+        upper = min((self._label[other] for other in self._comp_neighbors(comp_id, self._succ)), default=None)
+        labels = self._free_labels_after(self._label[comp_id], upper, len(ordered_pieces) - 1)
+        if labels is None:
+            self._relabel_all()
+            upper = min((self._label[other] for other in self._comp_neighbors(comp_id, self._succ)), default=None)
+            labels = self._free_labels_after(self._label[comp_id], upper, len(ordered_pieces) - 1)
+
+        self._deadlocked.discard(comp_id)
+        self._members[comp_id] = set(ordered_pieces[0])
+        if self._is_deadlocked_piece(ordered_pieces[0]):
+            self._deadlocked.add(comp_id)
+        for piece, label in zip(ordered_pieces[1:], labels):
+            new_id = self._new_comp(set(piece), label)
+            for node in piece:
+                self._comp[node] = new_id
+            if self._is_deadlocked_piece(piece):
+                self._deadlocked.add(new_id)
+
+    def _is_deadlocked_piece(self, piece):
+        return len(piece) > 1 or piece[0] in self._succ[piece[0]]
+
+    def _topological_pieces(self, members, local_graph, pieces_by_node):
+        # Части распавшейся компоненты в топологическом порядке (алгоритм Кана по сжатому графу)
+        piece_of = {}
+        pieces = []
+        for node in members:
+            if node in piece_of:
+                continue
+            piece = pieces_by_node.get(node, [node])
+            for member in piece:
+                piece_of[member] = len(pieces)
+            pieces.append(piece)
+        indegree = [0] * len(pieces)
+        piece_edges = [set() for _ in pieces]
+        for node, holders in local_graph.items():
+            for holder in holders:
+                source, target = piece_of[node], piece_of[holder]
+                if source != target and target not in piece_edges[source]:
+                    piece_edges[source].add(target)
+                    indegree[target] += 1
+        queue = [index for index, degree in enumerate(indegree) if degree == 0]
+        ordered = []
+        while queue:
+            index = queue.pop()
+            ordered.append(pieces[index])
+            for target in piece_edges[index]:
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    queue.append(target)
+        return ordered
+
+    def _free_labels_after(self, label, upper, count):
+        # count свободных меток строго между label и upper (или max_label, если upper нет)
+        if count == 0:
+            return []
+        if upper is None:
+            upper = self._max_label + self.LABEL_GAP * (count + 1)
+        step = (upper - label) // (count + 1)
+        if step < 1:
+            return None
+        labels = []
+        candidate = label
+        for _ in range(count):
+            candidate += step
+            while candidate in self._used_labels and candidate < upper:
+                candidate += 1
+            if candidate >= upper:
+                return None
+            labels.append(candidate)
+        self._max_label = max(self._max_label, labels[-1])
+        return labels
+
+    def _relabel_all(self):
+        # Редкий случай: между метками не осталось места - равномерно перенумеровываем все
+        self._used_labels.clear()
+        for position, comp_id in enumerate(sorted(self._label, key=self._label.get), start=1):
+            self._label[comp_id] = position * self.LABEL_GAP
+            self._used_labels.add(position * self.LABEL_GAP)
+        self._max_label = len(self._label) * self.LABEL_GAP
+
+    def _path_within(self, source, target, allowed_nodes):
+        # Кратчайший путь source ~> target внутри компоненты (BFS)
+        parent = {source: None}
+        queue = [source]
+        for node in queue:
+            if node == target:
+                break
+            for neighbor in self._succ[node]:
+                if neighbor in allowed_nodes and neighbor not in parent:
+                    parent[neighbor] = node
+                    queue.append(neighbor)
+        path = []
+        node = target
+        while node is not None:
+            path.append(node)
+            node = parent[node]
+        path.reverse()
+        return path
+
+
+class WFGTextEdit:
+    # Результат WFGTextModel.update: что изменилось в графе после правки текста
+    def __init__(self, added, removed, cycles, errors, deadlocks_changed):
+        self.added = added  # Появившиеся ребра (ожидающий, удерживающий)
+        self.removed = removed  # Исчезнувшие ребра
+        self.cycles = cycles  # Циклы, замкнутые появившимися ребрами
+        self.errors = errors  # WFGParseErrors только по измененным строкам
+        self.deadlocks_changed = deadlocks_changed  # Мог ли измениться состав тупиковых компонент
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+
+class WFGTextModel:
+    # Текст WFG для анализа "на лету": для каждой строки хранится ее разбор, для каждого ребра -
+    # число строк с ним. Новый текст сравнивается с прошлым по общему началу и концу, и в
+    # IncrementalWFG уходят только появившиеся и исчезнувшие ребра измененного диапазона строк.
+    DIFF_CHUNK = 4096  # Строки сравниваются срезами: равные срезы проверяются на уровне C
+
+    def __init__(self):
+        self.lines = []
+        self._parsed = []  # Строка -> ребро, None (пусто/комментарий) или причина ошибки (str)
+        self._edge_lines = {}  # Ребро -> число строк с ним
+        self.error_count = 0
+        self.graph = IncrementalWFG()
+
+    @classmethod
+    def parse(cls, lines, costs=None):
+        # Полный разбор: (модель, WFGraph, WFGParseErrors) - граф и отчет те же, что у parse_wfg_stream
+        model = cls()
+        errors = WFGParseErrors()
+        builder = WFGraphBuilder()
+        model.lines = list(lines)
+        for line_number, line in enumerate(model.lines, start=1):
+            parsed = model._parse_line(line)
+            model._parsed.append(parsed)
+            if isinstance(parsed, str):
+                model.error_count += 1
+                errors.add(line_number, line.strip(), parsed)
+            elif parsed is not None:
+                model._edge_lines[parsed] = model._edge_lines.get(parsed, 0) + 1
+                builder.add_edge(*parsed)
+            elif costs is not None:
+                try:
+                    cost = parse_wfg_cost(line)
+                except ValueError as exc:
+                    errors.add(line_number, line.strip(), str(exc))
+                    continue
+                if cost is not None:
+                    costs[cost[0]] = cost[1]
+        graph = builder.build()
+        model.graph = IncrementalWFG.from_graph(graph)
+        return model, graph, errors
+
+    def update(self, lines):
+        # Новый текст -> WFGTextEdit
+        lines = list(lines)
+        old_lines = self.lines
+        start = self._common_prefix(old_lines, lines)
+        old_end, new_end = len(old_lines), len(lines)
+        while old_end > start and new_end > start and old_lines[old_end - 1] == lines[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+
+        before = {}  # Затронутое ребро -> было ли оно в графе до правки
+        edge_lines = self._edge_lines
+        for parsed in self._parsed[start:old_end]:
+            if isinstance(parsed, str):
+                self.error_count -= 1
+            elif parsed is not None:
+                before.setdefault(parsed, True)
+                edge_lines[parsed] -= 1
+        errors = WFGParseErrors()
+        new_parsed = []
+        for line_number, line in enumerate(lines[start:new_end], start=start + 1):
+            parsed = self._parse_line(line)
+            new_parsed.append(parsed)
+            if isinstance(parsed, str):
+                self.error_count += 1
+                errors.add(line_number, line.strip(), parsed)
+            elif parsed is not None:
+                count = edge_lines.get(parsed, 0)
+                before.setdefault(parsed, count > 0)
+                edge_lines[parsed] = count + 1
+        self._parsed[start:old_end] = new_parsed
+        self.lines = lines
+
+        removed = []
+        added = []
+        for edge, was_present in before.items():
+            count = edge_lines[edge]
+            if count == 0:
+                del edge_lines[edge]
+                if was_present:
+                    removed.append(edge)
+            elif not was_present:
+                added.append(edge)
+        # Сначала освобождения: ребро, перенесенное в другую строку, не дает ложного цикла.
+        # Тупики меняются, только если удалено ребро внутри компоненты или замкнут новый цикл
+        graph = self.graph
+        deadlocks_changed = False
+        for edge in removed:
+            deadlocks_changed = deadlocks_changed or graph.in_same_component(*edge)
+            graph.remove_wait(*edge)
+        cycles = [cycle for cycle in (graph.add_wait(*edge) for edge in added) if cycle]
+        return WFGTextEdit(added, removed, cycles, errors, deadlocks_changed or bool(cycles))
+
+    @staticmethod
+    def _parse_line(line):
+        try:
+            return parse_wfg_line(line)
+        except ValueError as exc:
+            return str(exc)
+
+    @classmethod
+    def _common_prefix(cls, old_lines, new_lines):
+        limit = min(len(old_lines), len(new_lines))
+        position = 0
+        while position < limit:
+            stop = min(position + cls.DIFF_CHUNK, limit)
+            if old_lines[position:stop] != new_lines[position:stop]:
+                break
+            position = stop
+        while position < limit and old_lines[position] == new_lines[position]:
+            position += 1
+        return position
@@ -1,19 +1,86 @@
 import tkinter as tk
-from tkinter import scrolledtext, messagebox, font as tkfont, PanedWindow
+from tkinter import scrolledtext, messagebox, filedialog, simpledialog, ttk, font as tkfont, PanedWindow
+import collections
+import contextlib
+import importlib.util
+import io
 import math  # For pi
-
-
-try:
-    import matplotlib
-
-    matplotlib.use("TkAgg")
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-    import networkx as nx
-
-    VISUALIZATION_ENABLED = True
-except ImportError:
-    VISUALIZATION_ENABLED = False
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Реэкспорт для обратной совместимости: эти функции раньше были определены в этом модуле
+from DeadlockDetectorCore import find_cycle_util, detect_deadlock_wfg
+from DeadlockDetectorCore import (
+    WFGraphBuilder, WFGraph, WFGParseErrors, parse_wfg_stream, parse_wfg_file, analyze_deadlocks,
+    iter_deadlock_cycles, WFGTextModel, COST_DIRECTIVE, parse_wfg_costs,
+)
+from DeadlockDetectorCondensation import WFGCondensation
+from DeadlockDetectorParallel import PARALLEL_MIN_EDGES, parallel_deadlocked_components
+from DeadlockDetectorHistory import HistoryCursor, WFGHistory
+from DeadlockDetectorLive import LiveDelta, LiveMonitor, merge_deltas, open_event_source, run_live_reader
+from DeadlockDetectorReachability import WFGReachability
+from DeadlockDetectorResolution import plan_resolution, plan_resolution_by_names
+from DeadlockDetectorResources import (RESOURCE_SUFFIX, is_resource_file, is_resource_format, parse_resource_file,
+                                       parse_resource_stream)
+from DeadlockDetectorProfiling import PhaseTimings, ProfileCapture, default_report_path, format_seconds
+from DeadlockDetectorSnapshot import SNAPSHOT_SUFFIX, is_snapshot, open_snapshot, save_snapshot
+
+
+__all__ = ['DeadlockApp', 'find_cycle_util', 'detect_deadlock_wfg']
+
+# Наличие библиотек проверяется без импорта: сами Matplotlib, NetworkX и NumPy загружаются
+# load_visualization() при первой отрисовке графа, поэтому окно появляется сразу
+VISUALIZATION_MODULES = ('matplotlib', 'networkx', 'numpy')
+VISUALIZATION_ENABLED = all(importlib.util.find_spec(name) is not None for name in VISUALIZATION_MODULES)
+_visualization_loaded = False
+
+
+def load_visualization():
+    # Импортирует стек визуализации в глобальные имена модуля (повторный вызов ничего не делает).
+    # Только из главного потока: бэкенд TkAgg нельзя загружать из рабочего потока анализа
+    global _visualization_loaded, VISUALIZATION_ENABLED, matplotlib, LineCollection, Figure, FigureCanvasTkAgg, \
+        NavigationToolbar2Tk, nx, np, LAYOUT_ENGINES, LayoutCache, compute_layout, graph_structure_key, \
+        positions_to_dict, seeded_layout, SpatialGridIndex, InstrumentedCanvas
+    if _visualization_loaded or not VISUALIZATION_ENABLED:
+        return VISUALIZATION_ENABLED
+    try:
+        import matplotlib
+
+        matplotlib.use("TkAgg")
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        import networkx as nx
+        import numpy as np
+
+        from DeadlockDetectorLayout import (LAYOUT_ENGINES, LayoutCache, compute_layout, graph_structure_key,
+                                            positions_to_dict, seeded_layout)
+        from DeadlockDetectorSpatial import SpatialGridIndex
+    except ImportError as exc:  # Пакет найден, но не импортируется (например, сломанная установка)
+        VISUALIZATION_ENABLED = False
+        print(f"Предупреждение: Визуализация графа отключена: {exc}")
+        return False
+
+    class InstrumentedCanvas(FigureCanvasTkAgg):
+        # Сообщает длительность каждой полной перерисовки (сводка по этапам, время перерисовки при зуме)
+        draw_listener = None
+
+        def draw(self):
+            started = time.perf_counter()
+            super().draw()
+            if self.draw_listener is not None:
+                self.draw_listener(time.perf_counter() - started)
+
+    _visualization_loaded = True
+    return True
+
+
+if not VISUALIZATION_ENABLED:
     print("Предупреждение: Библиотеки Matplotlib или NetworkX не найдены. Визуализация графа будет отключена.")
     print("Для включения визуализации, пожалуйста, установите их: pip install matplotlib networkx")
 
@@ -65,42 +132,31 @@ except ImportError:
 
 
 
-def find_cycle_util(node, graph, visited, recursion_stack, path_accumulator):
-    visited.add(node)
-    recursion_stack.add(node)
-    path_accumulator.append(node)
-    for neighbor in graph.get(node, []):
-        if neighbor not in visited:
-            cycle = find_cycle_util(neighbor, graph, visited, recursion_stack, path_accumulator)
-            if cycle:
-                return cycle
-        elif neighbor in recursion_stack:
-            try:
-                start_index = path_accumulator.index(neighbor)
-                return path_accumulator[start_index:]
-            except ValueError:
-                return []
-    recursion_stack.remove(node)
-    path_accumulator.pop()
-    return None
-
-
-def detect_deadlock_wfg(graph):
-    if not graph:
-        return None
-    all_nodes = set(graph.keys())
-    for dependencies in graph.values():
-        all_nodes.update(dependencies)
-    visited = set()
-    recursion_stack = set()
-    for node in sorted(list(all_nodes)):
-        if node not in visited:
-            path_accumulator = []
-            cycle = find_cycle_util(node, graph, visited, recursion_stack, path_accumulator)
-            if cycle:
-                return cycle
-    return None
+class AnalysisCancelled(Exception):
+    pass
+
 
+LAYOUT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".wfg_layout_cache.json")  # Раскладки между запусками
+LOD_EDGE_THRESHOLD = 2000  # Выше этого числа ребер граф рисуется упрощенно (LineCollection вместо стрелок)
+LOD_MAX_LABELS = 200  # В упрощенном режиме подписи появляются, когда в области видно не больше вершин
+LOD_MAX_CURVED_EDGES = 200  # Ребра тупиковых компонент сверх этого числа рисуются прямыми штриховыми линиями
+CULL_MARGIN = 0.5  # Запас вокруг видимой области (доля ее ширины/высоты), чтобы панорамирование не упиралось в край
+CULL_DELAY_MS = 150  # Отсечение пересчитывается, когда зум/панорамирование затихли на это время
+LIVE_POLL_MS = 50  # Период применения дельт живого мониторинга к холсту
+LIVE_NODE_SPACING = 1.0  # Расстояние между вершинами живого графа (размер ячейки его пространственного индекса)
+LIVE_RECENT_CYCLES = 5  # Сколько последних циклов показывать в поле результата
+LIVE_LOD_EDGE_THRESHOLD = 300  # В живом режиме стрелки меняются постоянно, поэтому упрощенный режим включается раньше
+CYCLE_PAGE_SIZE = 10  # Циклов на странице перечня в поле результата
+CYCLE_ENUM_MAX_CYCLES = 100000  # Дальше перечень циклов обрывается (в плотной компоненте их экспоненциально много)
+CYCLE_ENUM_MAX_LENGTH = 50  # Более длинные циклы не перечисляются
+CYCLE_ENUM_TIME_LIMIT = 2.0  # Суммарное время перебора циклов на один анализ, с
+AUTO_ANALYZE_DELAY_MS = 250  # Автоанализ запускается, когда правки в поле ввода затихли на это время
+AUTO_RESULT_MAX_COMPONENTS = 20  # Сколько тупиковых компонент с циклами перечислять при автоанализе
+QUERY_MAX_NAMES = 8  # Сколько имен из ответа запроса достижимости показывать в строке под результатом
+RESOLUTION_MAX_NAMES = 30  # Сколько жертв плана разрешения перечислять в поле результата
+RESOURCE_RESULT_MAX_PROCESSES = 20  # Сколько процессов в тупике графа ресурсов расписывать по запросам
+HISTORY_MAX_EDGES = 200_000  # Графы больше этого в историю состояний не пишутся (сравнение с ней в главном потоке)
+REMEMBERED_POS_MAX = 100_000  # Сколько позиций исчезнувших вершин помнить для их возвращения на старое место
 
 
 class DeadlockApp:
@@ -117,33 +173,41 @@ class DeadlockApp:
         self.label_font = tkfont.Font(family="Arial", size=12, weight="normal")
         self.text_font = tkfont.Font(family="Consolas", size=11)
 
-        # Цвета
-        self.bg_color = "#e9ebee"  # Светло-серый фон
-        self.frame_bg_color = "#ffffff"  # Белый фон для фреймов
-        self.button_color = "#4CAF50"  # Зеленая кнопка
-        self.button_fg_color = "#ffffff"  # Белый текст на кнопке
-        self.clear_button_color = "#f44336"  # Красная кнопка
-        self.text_bg_color = "#fdfdfe"
-        self.error_color_fg = "#D32F2F"  # Темно-красный для текста ошибки
-        self.success_color_fg = "#388E3C"  # Темно-зеленый для текста успеха
-        self.info_color_fg = "#1976D2"  # Темно-синий для инфо текста
-
-        self.node_color_default = "skyblue"
-        self.node_color_cycle = "#ff796c"  # Ярко-красный для узлов цикла
-        self.edge_color_default = "grey"
-        self.edge_color_cycle = self.error_color_fg  # Темно-красный для ребер цикла
-
+        self._init_view_state()
         master.configure(bg=self.bg_color)
 
-        # --- Переменные для перетаскивания вершин ---
-        self.graph_G = None  # NetworkX DiGraph object
-        self.graph_pos = None  # Словарь позиций вершин {node: (x,y)}
-        self.dragged_node_id = None  # ID перетаскиваемой вершины
-        self.drag_offset_x = 0  # Смещение курсора относительно центра вершины по X
-        self.drag_offset_y = 0  # Смещение курсора относительно центра вершины по Y
-        self.parsed_graph_for_draw = None  # Сохраняем структуру графа для перерисовки
-        self.cycle_nodes_for_draw = None  # Сохраняем цикл для перерисовки
-        self.node_size_val = 1200  # Стандартный размер вершины (площадь в points^2)
+        # --- Кэш раскладок: повторный анализ того же графа не пересчитывает раскладку ---
+        self.layout_cache = None  # Загружается вместе с холстом, при первой отрисовке графа
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # --- Фоновый анализ ---
+        self._analysis_queue = queue.Queue()  # Сообщения рабочего потока: (поколение, тип, данные)
+        self._analysis_generation = 0  # Результаты устаревших запусков отбрасываются
+        self._analysis_cancel_event = None
+        self._analysis_poll_id = None
+        self._profile_capture = None  # cProfile/tracemalloc текущего анализа, если профилирование включено
+        self._detect_executor = None  # Пул поиска тупиков в больших графах: создается при первой надобности
+        self._detect_executor_lock = threading.Lock()
+
+        # --- Живой мониторинг ---
+        self._live_queue = queue.Queue()  # Сообщения читающего потока: (stop_event запуска, тип, данные)
+        self._live_stop_event = None  # Не None, пока мониторинг идет
+        self._live_poll_id = None
+        self._live_pending = []  # Дельты, отложенные на время перетаскивания вершины
+        self._live_source_spec = ""
+
+        # --- Автоанализ при правке текста ---
+        self._text_model = None  # WFGTextModel текста, по которому нарисован граф (None - нужен полный анализ)
+        self._auto_analysis_id = None
+
+        # --- История состояний графа (шкала времени) ---
+        self.history = WFGHistory()
+        self._history_cursor = HistoryCursor(self.history)  # Граф прошлого состояния при перемотке
+        self._history_tracking = False  # Последнее состояние истории - текущий граф (текст или мониторинг)
+        self._history_shown = None  # Номер состояния, граф процессов которого показан (None - показано другое)
+        self._history_view_index = None  # Номер показанного прошлого состояния (None - показано последнее)
+        self._scrub_target = None
+        self._scrub_id = None
 
         # --- Основной разделяемый контейнер ---
         self.paned_window = PanedWindow(master, orient=tk.VERTICAL, sashrelief=tk.RAISED, bg=self.bg_color, sashwidth=6)
@@ -181,6 +245,7 @@ class DeadlockApp:
         self.input_area.insert(tk.END,
     "# Пример с тупиком:\nP1 -> P2\nP2 -> P3\nP3 -> P1\nP4 -> P1\n\n# Пример без тупика:\nA -> B\nB -> C\nX -> Y")
         self.input_area.focus_set()
+        self.input_area.bind('<<Modified>>', self._on_input_modified)
 
         # Кнопки управления
         button_frame = tk.Frame(input_section_frame, bg=self.frame_bg_color)
@@ -192,11 +257,63 @@ class DeadlockApp:
                                        relief=tk.RAISED, borderwidth=2, padx=12, pady=6, activebackground="#45a049")
         self.detect_button.pack(side=tk.LEFT, padx=10)
 
+        self.load_button = tk.Button(button_frame, text="Загрузить из Файла", command=self.load_from_file,
+                                     font=self.default_font, bg=self.info_color_fg, fg=self.button_fg_color,
+                                     relief=tk.RAISED, borderwidth=2, padx=12, pady=6, activebackground="#1565C0")
+        self.load_button.pack(side=tk.LEFT, padx=10)
+
+        self.save_snapshot_button = tk.Button(button_frame, text="Сохранить Снимок", command=self.save_snapshot_file,
+                                              font=self.default_font, relief=tk.RAISED, borderwidth=2, padx=12,
+                                              pady=6)
+        self.save_snapshot_button.pack(side=tk.LEFT, padx=10)
+
         self.clear_button = tk.Button(button_frame, text="Очистить Поля", command=self.clear_all,
                                       font=self.default_font, bg=self.clear_button_color, fg=self.button_fg_color,
                                       relief=tk.RAISED, borderwidth=2, padx=12, pady=6, activebackground="#e53935")
         self.clear_button.pack(side=tk.LEFT, padx=10)
 
+        self.cancel_button = tk.Button(button_frame, text="Отмена", command=self.cancel_analysis,
+                                       font=self.default_font, relief=tk.RAISED, borderwidth=2, padx=12, pady=6,
+                                       state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
+
+        self.live_button = tk.Button(button_frame, text="Живой Мониторинг", command=self.toggle_live_monitor,
+                                     font=self.default_font, relief=tk.RAISED, borderwidth=2, padx=12, pady=6)
+        self.live_button.pack(side=tk.LEFT, padx=10)
+
+        # Индикатор хода фонового анализа
+        progress_frame = tk.Frame(input_section_frame, bg=self.frame_bg_color)
+        progress_frame.pack(fill=tk.X)
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=1.0, length=200)
+        self.progress_bar.pack(side=tk.LEFT, padx=(0, 10))
+        self.status_label = tk.Label(progress_frame, text="", bg=self.frame_bg_color, fg="#555555", anchor='w')
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        # Выбор алгоритма раскладки ('auto' - по размеру графа)
+        self.layout_engine_var = tk.StringVar(value='auto')
+        if VISUALIZATION_ENABLED:
+            # Список алгоритмов заполняется при раскрытии: он известен только после загрузки визуализации
+            self.layout_combobox = ttk.Combobox(progress_frame, textvariable=self.layout_engine_var, state='readonly',
+                                                width=14, values=['auto'], postcommand=self._fill_layout_engines)
+            self.layout_combobox.pack(side=tk.RIGHT)
+            tk.Label(progress_frame, text="Раскладка:", bg=self.frame_bg_color).pack(side=tk.RIGHT, padx=(10, 5))
+
+        # Сжатый вид: компоненты вместо процессов, двойной щелчок по супервершине разворачивает ее
+        self.condensed_view_var = tk.BooleanVar(value=False)
+        if VISUALIZATION_ENABLED:
+            ttk.Checkbutton(progress_frame, text="Сжатый вид", variable=self.condensed_view_var,
+                            command=self.on_view_mode_changed).pack(side=tk.RIGHT, padx=(10, 0))
+
+        # Автоанализ: правки текста применяются к графу без кнопки, только измененные строки
+        self.auto_analyze_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(progress_frame, text="Автоанализ", variable=self.auto_analyze_var,
+                        command=self.on_auto_analyze_toggled).pack(side=tk.RIGHT, padx=(10, 0))
+
+        # Профилирование по запросу: отчет cProfile/tracemalloc о следующем анализе пишется в файл
+        self.profiling_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(progress_frame, text="Профилирование", variable=self.profiling_var).pack(side=tk.RIGHT,
+                                                                                              padx=(10, 0))
+
         # Область вывода результата
         tk.Label(input_section_frame, text="Результат Анализа:",
                  font=self.label_font, bg=self.frame_bg_color, anchor='w').pack(fill=tk.X, pady=(10, 0))
@@ -204,7 +321,52 @@ class DeadlockApp:
                                                      font=self.text_font,
                                                      bg=self.text_bg_color, relief=tk.SOLID, borderwidth=1,
                                                      state=tk.DISABLED, padx=5, pady=5)
-        self.result_area.pack(fill=tk.X, expand=True, pady=(0, 10))  # expand=True для поля результата
+        self.result_area.pack(fill=tk.X, expand=True, pady=(0, 2))  # expand=True для поля результата
+        # Листание всех элементарных циклов: следующие циклы перебираются лениво, по мере листания
+        cycle_nav_frame = tk.Frame(input_section_frame, bg=self.frame_bg_color)
+        cycle_nav_frame.pack(fill=tk.X)
+        self.prev_cycle_button = tk.Button(cycle_nav_frame, text="< Цикл", command=lambda: self.select_cycle(-1),
+                                           state=tk.DISABLED)
+        self.prev_cycle_button.pack(side=tk.LEFT)
+        self.next_cycle_button = tk.Button(cycle_nav_frame, text="Цикл >", command=lambda: self.select_cycle(1),
+                                           state=tk.DISABLED)
+        self.next_cycle_button.pack(side=tk.LEFT, padx=(5, 10))
+        self.cycle_nav_label = tk.Label(cycle_nav_frame, text="", bg=self.frame_bg_color, fg="#555555", anchor='w')
+        self.cycle_nav_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # Запросы достижимости по индексу графа: ответ подсвечивается на холсте
+        query_frame = tk.Frame(input_section_frame, bg=self.frame_bg_color)
+        query_frame.pack(fill=tk.X, pady=(2, 0))
+        tk.Label(query_frame, text="Процесс:", bg=self.frame_bg_color).pack(side=tk.LEFT)
+        self.query_entry = tk.Entry(query_frame, width=16, font=self.text_font)
+        self.query_entry.pack(side=tk.LEFT, padx=5)
+        self.query_entry.bind('<Return>', lambda event: self.run_reachability_query('upstream'))
+        tk.Button(query_frame, text="Кого ждет",
+                  command=lambda: self.run_reachability_query('upstream')).pack(side=tk.LEFT)
+        tk.Button(query_frame, text="Кто ждет его",
+                  command=lambda: self.run_reachability_query('downstream')).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(query_frame, text="Длинная цепочка",
+                  command=lambda: self.run_reachability_query('chain')).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(query_frame, text="Сбросить", command=self.clear_reachability_query).pack(side=tk.LEFT,
+                                                                                          padx=(5, 10))
+        self.query_label = tk.Label(query_frame, text="", bg=self.frame_bg_color, fg="#555555", anchor='w')
+        self.query_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # Шкала времени: перемотка по истории состояний графа без повторного разбора текста
+        timeline_frame = tk.Frame(input_section_frame, bg=self.frame_bg_color)
+        timeline_frame.pack(fill=tk.X, pady=(2, 0))
+        tk.Label(timeline_frame, text="История:", bg=self.frame_bg_color).pack(side=tk.LEFT)
+        self.timeline_scale = tk.Scale(timeline_frame, orient=tk.HORIZONTAL, from_=0, to=0, showvalue=False,
+                                       length=220, bg=self.frame_bg_color, highlightthickness=0,
+                                       command=self._on_timeline_moved, state=tk.DISABLED)
+        self.timeline_scale.pack(side=tk.LEFT, padx=5)
+        self.latest_state_button = tk.Button(timeline_frame, text="Сейчас", command=self.show_latest_state,
+                                             state=tk.DISABLED)
+        self.latest_state_button.pack(side=tk.LEFT, padx=(0, 10))
+        self.timeline_label = tk.Label(timeline_frame, text="", bg=self.frame_bg_color, fg="#555555", anchor='w')
+        self.timeline_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # Время этапов последнего анализа и последней перерисовки
+        self.timings_label = tk.Label(input_section_frame, text="", bg=self.frame_bg_color, fg="#777777",
+                                      anchor='w', justify=tk.LEFT)
+        self.timings_label.pack(fill=tk.X, pady=(0, 8))
 
         control_panel_frame.pack(fill=tk.BOTH, expand=True, padx=5,
                                  pady=5)  # Упаковываем основной фрейм панели управления
@@ -214,16 +376,49 @@ class DeadlockApp:
         graph_display_outer_frame = tk.Frame(self.paned_window, bg=self.bg_color)  # Внешний фрейм
         graph_display_frame = tk.Frame(graph_display_outer_frame, bg=self.frame_bg_color, bd=1, relief=tk.SOLID)
 
+        self.graph_display_frame = graph_display_frame
+        self.canvas = None  # Холст Matplotlib создается _ensure_graph_view при первой отрисовке графа
         if VISUALIZATION_ENABLED:
             tk.Label(graph_display_frame, text="Визуализация Графа Ожидания (WFG):",
                      font=self.label_font, bg=self.frame_bg_color, fg="#333333", pady=10).pack(fill=tk.X, padx=15)
+            self.graph_placeholder = tk.Label(graph_display_frame, text="Граф для отображения отсутствует.",
+                                              font=self.default_font, bg=self.frame_bg_color, fg="grey")
+            self.graph_placeholder.pack(pady=20, padx=15, fill=tk.BOTH, expand=True)
+        else:
+            self._show_visualization_disabled()
+
+        graph_display_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.paned_window.add(graph_display_outer_frame, minsize=300)  # Минимальная высота для панели графа
+
+    def _show_visualization_disabled(self):
+        tk.Label(self.graph_display_frame, text="Визуализация графа отключена (отсутствуют Matplotlib/NetworkX).",
+                 font=self.default_font, bg=self.frame_bg_color, fg="red").pack(pady=20, padx=15, fill=tk.BOTH,
+                                                                                expand=True)
+
+    def _ensure_graph_view(self, create=True):
+        # True, если холст готов к рисованию. При первом вызове с create=True загружается стек
+        # визуализации и строятся холст, панель инструментов и кэш раскладок
+        if self.canvas is not None:
+            return True
+        if not create or not VISUALIZATION_ENABLED:
+            return False
+        self.master.config(cursor="watch")
+        self.master.update_idletasks()
+        try:
+            if not load_visualization():
+                self.graph_placeholder.destroy()
+                self._show_visualization_disabled()
+                return False
+            self.graph_placeholder.destroy()
+            graph_display_frame = self.graph_display_frame
 
             self.fig = Figure(figsize=(7, 5), dpi=100, facecolor=self.frame_bg_color)  # figsize влияет на пропорции
             self.ax = self.fig.add_subplot(111)
             self.ax.set_facecolor(self.frame_bg_color)  # Фон самого графика
             self.ax.axis('off')
 
-            self.canvas = FigureCanvasTkAgg(self.fig, master=graph_display_frame)
+            self.canvas = InstrumentedCanvas(self.fig, master=graph_display_frame)
+            self.canvas.draw_listener = self._on_canvas_drawn
             self.canvas_widget = self.canvas.get_tk_widget()
             self.canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=15, pady=(0, 5))
 
@@ -246,14 +441,85 @@ class DeadlockApp:
             self.canvas.mpl_connect('motion_notify_event', self._on_motion)
             self.canvas.mpl_connect('button_release_event', self._on_button_release)
 
-            self.draw_graph_visual(None, None, recalculate_layout_and_graph=True)  # Изначально рисуем пустой холст
-        else:
-            tk.Label(graph_display_frame, text="Визуализация графа отключена (отсутствуют Matplotlib/NetworkX).",
-                     font=self.default_font, bg=self.frame_bg_color, fg="red").pack(pady=20, padx=15, fill=tk.BOTH,
-                                                                                    expand=True)
+            self.layout_cache = LayoutCache(path=LAYOUT_CACHE_PATH)
+        finally:
+            self.master.config(cursor="")
+        return True
 
-        graph_display_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        self.paned_window.add(graph_display_outer_frame, minsize=300)  # Минимальная высота для панели графа
+    def _fill_layout_engines(self):
+        if load_visualization():
+            self.layout_combobox.configure(values=['auto'] + sorted(LAYOUT_ENGINES))
+
+    def _init_view_state(self):
+        # Цвета и состояние отрисовки, не требующие Tk: бенчмарк рисует граф тем же кодом в Agg без дисплея
+        self.bg_color = "#e9ebee"  # Светло-серый фон
+        self.frame_bg_color = "#ffffff"  # Белый фон для фреймов
+        self.button_color = "#4CAF50"  # Зеленая кнопка
+        self.button_fg_color = "#ffffff"  # Белый текст на кнопке
+        self.clear_button_color = "#f44336"  # Красная кнопка
+        self.text_bg_color = "#fdfdfe"
+        self.error_color_fg = "#D32F2F"  # Темно-красный для текста ошибки
+        self.success_color_fg = "#388E3C"  # Темно-зеленый для текста успеха
+        self.info_color_fg = "#1976D2"  # Темно-синий для инфо текста
+
+        self.node_color_default = "skyblue"
+        self.node_color_cycle = "#ff796c"  # Ярко-красный для узлов цикла
+        self.edge_color_default = "grey"
+        self.edge_color_cycle = self.error_color_fg  # Темно-красный для ребер цикла
+        self.node_color_query = "#ffb74d"  # Оранжевый для ответа запроса достижимости
+        self.edge_color_query = "#ef6c00"  # Темно-оранжевый для ребер самой длинной цепочки
+        self.node_color_victim = "#8e24aa"  # Фиолетовый для процессов, которые план разрешения снимает
+        self.node_color_resource = "#c5e1a5"  # Светло-зеленый для ресурсов (рисуются квадратами)
+
+        # --- Переменные для перетаскивания вершин ---
+        self.graph_G = None  # NetworkX DiGraph object
+        self.graph_pos = None  # Словарь позиций вершин {node: (x,y)}
+        self.spatial_index = None  # SpatialGridIndex над graph_pos для поиска вершин под курсором
+        self._hovered_node = None
+        self.dragged_node_id = None  # ID перетаскиваемой вершины
+        self.drag_offset_x = 0  # Смещение курсора относительно центра вершины по X
+        self.drag_offset_y = 0  # Смещение курсора относительно центра вершины по Y
+        self.parsed_graph_for_draw = None  # Сохраняем структуру графа для перерисовки
+        self.view_graph_for_draw = None  # Реально нарисованный граф (в сжатом виде - граф компонент)
+        self.condensation = None  # WFGCondensation текущего графа в сжатом виде
+        self._expanded_groups = set()  # Развернутые на месте группы сжатого вида
+        self._collapsed_sizes = {}  # Метка супервершины -> число процессов в ней
+        self._last_analysis_source = None  # Для повторного анализа при смене вида
+        self.cycle_nodes_for_draw = None  # Сохраняем цикл для перерисовки
+        self.deadlocked_sccs_for_draw = None  # Все компоненты сильной связности с тупиками
+        self.node_size_val = 1200  # Стандартный размер вершины (площадь в points^2)
+        self.lod_edge_threshold = LOD_EDGE_THRESHOLD
+        self.lod_node_size = 40  # Размер вершины в упрощенном режиме
+        self.lod_max_labels = LOD_MAX_LABELS
+        self.lod_max_curved_edges = LOD_MAX_CURVED_EDGES
+        self.cull_margin = CULL_MARGIN
+        self.cull_delay_ms = CULL_DELAY_MS
+        self._cull_after_id = None
+        self._layout_key = None  # Ключ кэша для текущей раскладки ("движок:хеш структуры")
+        self.analysis_timings = None  # PhaseTimings последнего анализа
+        self._render_pending = False  # Ближайшая перерисовка холста - этап 'render' этого анализа
+        self._last_redraw_seconds = None
+        self._live_spiral_index = 0  # Следующее место на спирали для вершины без размещенных соседей
+        self._remembered_pos = {}  # Позиции исчезнувших вершин: вернувшаяся вершина встает на старое место
+        self._live_auto_limits = None  # Пределы осей, выставленные автоматически (пользователь их не менял)
+        self._live_recent_cycles = collections.deque(maxlen=LIVE_RECENT_CYCLES)
+        self._live_victims = []  # Жертвы плана разрешения в живом режиме, по порядку компонент
+        self._cycle_iterator = None  # Генератор iter_deadlock_cycles текущего результата
+        self._seen_cycles = []  # Уже перебранные циклы (только до самого дальнего просмотренного)
+        self._selected_cycle = None  # Индекс выбранного цикла в _seen_cycles
+        self._cycle_summary = ""  # Заголовок отчета над страницей циклов
+        self._reach_index = None  # WFGReachability текущего графа: строится при первом запросе
+        self.resource_nodes = set()  # Вершины-ресурсы графа распределения ресурсов (пусто для обычного WFG)
+        self.query_nodes = set()  # Процессы из ответа последнего запроса (подсвечиваются)
+        self.query_edges = []  # Ребра (ожидающий, держатель) самой длинной цепочки
+        self.resolution_plan = None  # ResolutionPlan текущих тупиков (None в живом режиме: там только жертвы)
+        self.victim_nodes = set()  # Процессы, снятие которых разрывает все циклы (подсвечиваются)
+        self._resolution_costs = {}  # Стоимости '#@cost' текста, по которому построен план автоанализа
+
+        # --- Ссылки на художников (artists) matplotlib для быстрого перетаскивания ---
+        self._reset_artist_refs()
+        self._drag_state = None  # Состояние blit-перетаскивания (фон, перемещаемые artists)
+        self.drag_frame_interval = 1.0 / 60  # Не чаще частоты обновления экрана
 
     # --- Обработчики событий мыши для графа ---
     def _on_scroll(self, event):
@@ -262,6 +528,8 @@ class DeadlockApp:
 
         if self.toolbar.mode == 'zoom rect':  # type: ignore
             return
+        if self.dragged_node_id is not None:  # Зум сделал бы кэшированный фон перетаскивания неверным
+            return
 
         cur_xlim = self.ax.get_xlim()
         cur_ylim = self.ax.get_ylim()
@@ -299,6 +567,11 @@ class DeadlockApp:
         if event.button == 1:
             if self.toolbar.mode in ['pan/zoom', 'zoom rect']:  # type: ignore
                 return
+            if event.dblclick and self.condensation is not None and event.xdata is not None:
+                node = self._node_at(event.xdata, event.ydata)
+                if node is not None:
+                    self.toggle_group(node)
+                    return
             self._pan_active = True
             self._pan_start_x = event.xdata
             self._pan_start_y = event.ydata
@@ -312,48 +585,68 @@ class DeadlockApp:
             if not self.graph_pos or not self.graph_G or not self.graph_G.nodes(): return
 
             click_x, click_y = event.xdata, event.ydata
+            target_node = self._node_at(click_x, click_y)
 
-            # Рассчитываем порог для клика на вершине в координатах данных
-            # Это приблизительный расчет, так как размер вершины задан в points^2
-            node_radius_points = math.sqrt(self.node_size_val / math.pi)
-            node_diameter_points = 2 * node_radius_points
-
-            ax_bbox = self.ax.get_window_extent()
-            if ax_bbox.width == 0 or ax_bbox.height == 0: return
-
-            data_xlim = self.ax.get_xlim()
-            data_ylim = self.ax.get_ylim()
-            data_width = data_xlim[1] - data_xlim[0]
-            data_height = data_ylim[1] - data_ylim[0]
-            if data_width == 0 or data_height == 0: return
-
-            # Преобразование диаметра из точек в пиксели, затем в единицы данных
-            # dpi/72.0 - коэффициент для преобразования points в pixels (1 point = 1/72 inch)
-            node_diameter_pixels = node_diameter_points * (self.fig.dpi / 72.0)
-
-            # Средний размер пикселя в единицах данных
-            # (Это упрощение, если aspect ratio осей не сохранен, может быть неточно)
-            pixel_width_in_data_units = data_width / ax_bbox.width
-            pixel_height_in_data_units = data_height / ax_bbox.height
-
-            # Используем большее из двух, чтобы быть более снисходительным к клику
-            node_radius_data_units_approx = (node_diameter_pixels / 2.0) * max(pixel_width_in_data_units,
-                                                                               pixel_height_in_data_units)
-
-            min_dist_sq = float('inf')
-            target_node = None
-
-            for node_id, (px, py) in self.graph_pos.items():
-                dist_sq = (px - click_x) ** 2 + (py - click_y) ** 2
-                if dist_sq < min_dist_sq:
-                    min_dist_sq = dist_sq
-                    target_node = node_id
-
-            if target_node is not None and math.sqrt(min_dist_sq) < node_radius_data_units_approx:
+            if target_node is not None:
                 self.dragged_node_id = target_node
                 self.drag_offset_x = self.graph_pos[self.dragged_node_id][0] - click_x
                 self.drag_offset_y = self.graph_pos[self.dragged_node_id][1] - click_y
                 self.canvas_widget.config(cursor="hand2")  # или "grabbing"
+                self._begin_drag_blit()
+
+    def _node_pick_radius(self):
+        # Рассчитываем порог для клика на вершине в координатах данных
+        # Это приблизительный расчет, так как размер вершины задан в points^2
+        node_radius_points = math.sqrt(self._drawn_node_size / math.pi)
+        node_diameter_points = 2 * node_radius_points
+
+        ax_bbox = self.ax.get_window_extent()
+        if ax_bbox.width == 0 or ax_bbox.height == 0: return None
+
+        data_xlim = self.ax.get_xlim()
+        data_ylim = self.ax.get_ylim()
+        data_width = data_xlim[1] - data_xlim[0]
+        data_height = data_ylim[1] - data_ylim[0]
+        if data_width == 0 or data_height == 0: return None
+
+        # Преобразование диаметра из точек в пиксели, затем в единицы данных
+        # dpi/72.0 - коэффициент для преобразования points в pixels (1 point = 1/72 inch)
+        node_diameter_pixels = node_diameter_points * (self.fig.dpi / 72.0)
+
+        # Средний размер пикселя в единицах данных
+        # (Это упрощение, если aspect ratio осей не сохранен, может быть неточно)
+        pixel_width_in_data_units = data_width / ax_bbox.width
+        pixel_height_in_data_units = data_height / ax_bbox.height
+
+        # Используем большее из двух, чтобы быть более снисходительным к клику
+        return (node_diameter_pixels / 2.0) * max(abs(pixel_width_in_data_units), abs(pixel_height_in_data_units))
+
+    def _node_at(self, x, y):
+        # Вершина под курсором: запрос к сетке просматривает только соседние ячейки
+        if self.spatial_index is None:
+            return None
+        pick_radius = self._node_pick_radius()
+        if pick_radius is None:
+            return None
+        return self.spatial_index.nearest(x, y, max_distance=pick_radius)
+
+    def _update_hover(self, event):
+        # Подсказка о вершине под курсором в строке состояния
+        if event.inaxes != self.ax or event.xdata is None or event.ydata is None or self.graph_G is None:
+            node = None
+        else:
+            node = self._node_at(event.xdata, event.ydata)
+        if node == self._hovered_node:
+            return
+        self._hovered_node = node
+        if node is None:
+            self.status_label.config(text="")
+        elif node in self._collapsed_sizes:
+            self.status_label.config(text=f"{node}: процессов - {self._collapsed_sizes[node]} "
+                                          f"(двойной щелчок - развернуть)")
+        else:
+            self.status_label.config(text=f"{node}: ждет процессов - {self.graph_G.out_degree(node)}, "
+                                          f"его ждут - {self.graph_G.in_degree(node)}")
 
     def _on_motion(self, event):
         if not VISUALIZATION_ENABLED: return
@@ -379,9 +672,19 @@ class DeadlockApp:
             new_node_y = mouse_y + self.drag_offset_y
 
             self.graph_pos[self.dragged_node_id] = (new_node_x, new_node_y)
-            # Перерисовываем граф с обновленными позициями, не пересчитывая layout
-            self.draw_graph_visual(self.parsed_graph_for_draw, self.cycle_nodes_for_draw,
-                                   recalculate_layout_and_graph=False)
+            if self.spatial_index is not None:
+                self.spatial_index.move(self.dragged_node_id, new_node_x, new_node_y)
+            if self._drag_state is not None:
+                # Двигаем только artists перетаскиваемой вершины поверх кэшированного фона
+                self._update_drag_blit(new_node_x, new_node_y)
+            else:
+                # Перерисовываем граф с обновленными позициями, не пересчитывая layout
+                self.draw_graph_visual(self.view_graph_for_draw, self.cycle_nodes_for_draw,
+                                       recalculate_layout_and_graph=False,
+                                       deadlocked_sccs=self.deadlocked_sccs_for_draw)
+
+        elif self._analysis_cancel_event is None:  # Строка состояния не занята ходом анализа
+            self._update_hover(event)
 
     def _on_button_release(self, event):
         if not VISUALIZATION_ENABLED: return
@@ -397,42 +700,326 @@ class DeadlockApp:
 
         # Завершение перетаскивания вершины (правая кнопка)
         elif event.button == 3 and self.dragged_node_id is not None:
+            self._end_drag_blit()
             self.dragged_node_id = None
             self.canvas_widget.config(cursor="")
-            # Граф уже перерисован в _on_motion
+            if self.layout_cache is not None and self._layout_key is not None:
+                self.layout_cache.put(self._layout_key, self.graph_pos)  # Ручная расстановка переживет повторный анализ
+
+    # --- Быстрое перетаскивание вершины (blitting) ---
+    def _reset_artist_refs(self):
+        self._node_collection = None  # PathCollection всех вершин
+        self._node_artist_index = {}  # Вершина -> индекс в _node_collection
+        self._label_artists = {}  # Вершина -> Text
+        self._edge_artists_by_node = {}  # Вершина -> [((u, v), FancyArrowPatch), ...] инцидентных ребер
+        self._lod_edges = None  # Упрощенный режим: LineCollection обычных ребер и индекс ребер по вершинам
+        self._drawn_node_size = self.node_size_val  # Наибольший размер вершины (для радиуса захвата)
+        self._node_sizes = None  # Размеры вершин в порядке отрисовки
+        self._node_paths = None  # Формы вершин в порядке отрисовки, если они разные (процессы и ресурсы)
+        # Полные данные вершин для отсечения: в _node_collection остаются только видимые вершины
+        self._node_draw_index = {}  # Вершина -> индекс в порядке отрисовки
+        self._node_face_colors = None
+        self._node_edge_colors = None
+        self._edge_patches = []  # [((u, v), FancyArrowPatch), ...] всех нарисованных стрелок
+        self._lod_mode = False  # Граф нарисован упрощенно
+
+    def _arrow_segments(self, sources_xy, targets_xy):
+        # Ломаная на ребро: прямая с "галочкой" стрелки в середине, форма (m, 7, 2). Крылья проходятся
+        # туда и обратно - одна ломаная рисуется одним проходом, поэтому наложения прозрачности нет.
+        # Середина ребра не закрыта вершиной при любом масштабе, поэтому сдвиг на радиус вершины не нужен
+        delta = targets_xy - sources_xy
+        length = np.hypot(delta[:, 0], delta[:, 1])[:, None]
+        unit = delta / np.maximum(length, 1e-12)
+        head = np.minimum(length * 0.25, self._lod_edges['arrow_length'])
+        tip = (sources_xy + targets_xy) / 2 + unit * head / 2
+        back = tip - unit * head
+        normal = np.column_stack((-unit[:, 1], unit[:, 0])) * head * 0.5
+        return np.stack((sources_xy, tip, back + normal, tip, back - normal, tip, targets_xy), axis=1)
+
+    def _lod_edge_segments(self, edge_ids):
+        edges = self._lod_edges['edges']
+        sources_xy = np.array([self.graph_pos[edges[index][0]] for index in edge_ids], dtype=float).reshape(-1, 2)
+        targets_xy = np.array([self.graph_pos[edges[index][1]] for index in edge_ids], dtype=float).reshape(-1, 2)
+        return self._arrow_segments(sources_xy, targets_xy)
+
+    def _lod_edge_styles(self, edge_ids):
+        # Цвет, толщина и стиль линии для ребер edge_ids (ребра тупиков идут после обычных)
+        highlighted = np.asarray(edge_ids, dtype=np.int64).reshape(-1) >= self._lod_edges['normal_count']
+        if not highlighted.any():  # Единый стиль рисуется заметно быстрее
+            return {'colors': matplotlib.colors.to_rgba(self.edge_color_default, 0.6), 'linewidths': 0.6,
+                    'linestyles': 'solid'}
+        colors = np.where(highlighted[:, None], matplotlib.colors.to_rgba(self.edge_color_cycle, 0.9),
+                          matplotlib.colors.to_rgba(self.edge_color_default, 0.6))
+        linewidths = np.where(highlighted, 1.2, 0.6)
+        linestyles = ['dashed' if flag else 'solid' for flag in highlighted]
+        return {'colors': colors, 'linewidths': linewidths, 'linestyles': linestyles}
+
+    def _draw_lod_edges(self, normal_edges, highlighted_edges=(), collection=None):
+        # Все обычные ребра (и ребра тупиков сверх лимита кривых) - один artist вместо тысяч FancyArrowPatch.
+        # collection - уже добавленная коллекция (живой мониторинг): сегменты и стиль ей выставит _apply_culling
+        edgelist = list(normal_edges) + list(highlighted_edges)
+        coords = np.array(list(self.graph_pos.values()), dtype=float)
+        span = float((coords.max(axis=0) - coords.min(axis=0)).max()) if len(coords) else 1.0
+        edge_ids_by_node = {}
+        for index, (u, v) in enumerate(edgelist):
+            edge_ids_by_node.setdefault(u, []).append(index)
+            if v != u:
+                edge_ids_by_node.setdefault(v, []).append(index)
+        self._lod_edges = {'edges': edgelist, 'edge_ids_by_node': edge_ids_by_node, 'normal_count': len(normal_edges),
+                           'arrow_length': max(span, 1e-9) * 0.015, 'visible_ids': np.arange(len(edgelist))}
+        segments = self._lod_edge_segments(range(len(edgelist)))
+        if collection is None:
+            collection = LineCollection(segments, zorder=0.5, **self._lod_edge_styles(range(len(edgelist))))
+            self.ax.add_collection(collection)
+        self._lod_edges.update(collection=collection, segments=segments)
+
+    def _update_lod_labels(self):
+        # Подписи только для видимых вершин и только когда их немного
+        if self._lod_edges is None or self.spatial_index is None:
+            return
+        for text in self._label_artists.values():
+            text.remove()
+        self._label_artists = {}
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        visible_nodes = self.spatial_index.in_rect(x0, y0, x1, y1)
+        if len(visible_nodes) > self.lod_max_labels:
+            return
+        for node in visible_nodes:
+            node_x, node_y = self.graph_pos[node]
+            self._label_artists[node] = self.ax.text(node_x, node_y, str(node), fontsize=8, fontweight="bold",
+                                                     ha='center', va='bottom', clip_on=True)
+
+    def _register_edge_artists(self, edgelist, edge_artists):
+        # draw_networkx_edges возвращает FancyArrowPatch в порядке edgelist (для ориентированного графа)
+        if not isinstance(edge_artists, list) or len(edge_artists) != len(edgelist):
+            return
+        for edge, patch in zip(edgelist, edge_artists):
+            u, v = edge
+            self._edge_patches.append((edge, patch))
+            self._edge_artists_by_node.setdefault(u, []).append((edge, patch))
+            if v != u:
+                self._edge_artists_by_node.setdefault(v, []).append((edge, patch))
+
+    def _schedule_culling(self, ax=None):
+        # Обработчик смены пределов осей: каждый шаг зума/панорамирования лишь откладывает пересчет
+        if self._cull_after_id is not None:
+            self.master.after_cancel(self._cull_after_id)
+        self._cull_after_id = self.master.after(self.cull_delay_ms, self._apply_culling)
+
+    def _apply_culling(self, redraw=True):
+        # На холсте остается только то, что касается видимой области с запасом: стоимость
+        # перерисовки при навигации зависит от видимой части графа, а не от его размера
+        self._cull_after_id = None
+        if self._node_collection is None or self.spatial_index is None or self._drag_state is not None:
+            return
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        margin_x, margin_y = (x1 - x0) * self.cull_margin, (y1 - y0) * self.cull_margin
+        x0, x1, y0, y1 = x0 - margin_x, x1 + margin_x, y0 - margin_y, y1 + margin_y
+
+        # Вершины: порядок отрисовки сохраняется, чтобы наложение вершин не менялось
+        draw_ids = sorted(self._node_draw_index[node] for node in self.spatial_index.in_rect(x0, y0, x1, y1))
+        nodes = list(self._node_draw_index)
+        visible_nodes = [nodes[index] for index in draw_ids]
+        self._node_artist_index = {node: index for index, node in enumerate(visible_nodes)}
+        self._node_collection.set_offsets(
+            np.array([self.graph_pos[node] for node in visible_nodes], dtype=float).reshape(-1, 2))
+        self._node_collection.set_facecolors(self._node_face_colors[draw_ids])
+        self._node_collection.set_edgecolors(self._node_edge_colors[draw_ids])
+        self._node_collection.set_sizes(self._node_sizes[draw_ids])
+        if self._node_paths is not None:
+            self._node_collection.set_paths([self._node_paths[index] for index in draw_ids])
+
+        # Ребра упрощенного режима: отбор по габаритам ломаных
+        if self._lod_edges is not None:
+            segments = self._lod_edges['segments']
+            lower, upper = segments.min(axis=1), segments.max(axis=1)
+            touching = (upper[:, 0] >= x0) & (lower[:, 0] <= x1) & (upper[:, 1] >= y0) & (lower[:, 1] <= y1)
+            visible_ids = np.flatnonzero(touching)
+            self._lod_edges['visible_ids'] = visible_ids
+            self._lod_edges['collection'].set_segments(segments[visible_ids])
+            self._lod_edges['collection'].set(**self._lod_edge_styles(visible_ids))
+
+        # Отдельные стрелки и подписи просто скрываются
+        for (u, v), patch in self._edge_patches:
+            (ux, uy), (vx, vy) = self.graph_pos[u], self.graph_pos[v]
+            patch.set_visible(max(ux, vx) >= x0 and min(ux, vx) <= x1 and max(uy, vy) >= y0 and min(uy, vy) <= y1)
+        if self._lod_edges is not None:
+            self._update_lod_labels()
+        else:
+            for node, label in self._label_artists.items():
+                label.set_visible(node in self._node_artist_index)
+
+        if redraw:
+            self.canvas.draw_idle()
+
+    def _begin_drag_blit(self):
+        node = self.dragged_node_id
+        node_index = self._node_artist_index.get(node)
+        if node_index is None or self._node_collection is None or not getattr(self.canvas, 'supports_blit', False):
+            return  # Остается медленный путь с полной перерисовкой
+
+        collection = self._node_collection
+        face_colors = collection.get_facecolors().copy()
+        edge_colors = collection.get_edgecolors()
+        edge_colors = (edge_colors if len(edge_colors) == len(face_colors)
+                       else edge_colors.repeat(len(face_colors), axis=0)).copy()
+        node_x, node_y = self.graph_pos[node]
+
+        # Вершина на время перетаскивания рисуется отдельным artist'ом, в общей коллекции - прозрачна
+        node_size = self._node_sizes[self._node_draw_index[node]]
+        overlay = self.ax.scatter([node_x], [node_y], s=node_size, c=face_colors[node_index:node_index + 1],
+                                  marker='s' if node in self.resource_nodes else 'o',
+                                  edgecolors=edge_colors[node_index:node_index + 1], linewidths=0.5,
+                                  zorder=collection.get_zorder(), animated=True)
+        hidden_face_colors = face_colors.copy()
+        hidden_edge_colors = edge_colors.copy()
+        hidden_face_colors[node_index, 3] = 0.0
+        hidden_edge_colors[node_index, 3] = 0.0
+        collection.set_facecolors(hidden_face_colors)
+        collection.set_edgecolors(hidden_edge_colors)
+
+        label = self._label_artists.get(node)
+        edges = self._edge_artists_by_node.get(node, [])
+        moving_artists = [patch for _, patch in edges] + [overlay] + ([label] if label is not None else [])
+
+        # Упрощенный режим: инцидентные ребра вынимаются из общей LineCollection в отдельный artist
+        lod_edge_ids = self._lod_edges['edge_ids_by_node'].get(node, []) if self._lod_edges else []
+        lod_overlay = None
+        if lod_edge_ids:
+            lod_collection = self._lod_edges['collection']
+            visible_ids = self._lod_edges['visible_ids']
+            hidden_segments = self._lod_edges['segments'][visible_ids]
+            hidden_segments[np.isin(visible_ids, lod_edge_ids)] = np.nan  # Ломаные с NaN не рисуются
+            lod_collection.set_segments(hidden_segments)
+            lod_overlay = LineCollection(self._lod_edge_segments(lod_edge_ids), zorder=lod_collection.get_zorder(),
+                                         **self._lod_edge_styles(lod_edge_ids))
+            self.ax.add_collection(lod_overlay, autolim=False)
+            moving_artists.append(lod_overlay)
+        for artist in moving_artists:
+            artist.set_animated(True)
+
+        self.canvas.draw()  # Один полный рендер без перемещаемых artists - это фон
+        self._drag_state = {
+            'background': self.canvas.copy_from_bbox(self.ax.bbox),
+            'node_index': node_index,
+            'face_colors': face_colors,
+            'edge_colors': edge_colors,
+            'overlay': overlay,
+            'label': label,
+            'edges': edges,
+            'moving_artists': moving_artists,
+            'lod_edge_ids': lod_edge_ids,
+            'lod_overlay': lod_overlay,
+            'last_frame_time': 0.0,
+        }
+        self._blit_drag_frame()
+
+    def _update_drag_blit(self, node_x, node_y):
+        state = self._drag_state
+        state['overlay'].set_offsets([[node_x, node_y]])
+        if state['label'] is not None:
+            state['label'].set_position((node_x, node_y))
+        now = time.perf_counter()
+        if now - state['last_frame_time'] < self.drag_frame_interval:
+            return  # Положение запомнено, кадр будет нарисован следующим событием или при отпускании
+        state['last_frame_time'] = now
+        self._blit_drag_frame()
+
+    def _blit_drag_frame(self):
+        state = self._drag_state
+        for (u, v), patch in state['edges']:
+            patch.set_positions(self.graph_pos[u], self.graph_pos[v])
+        if state['lod_overlay'] is not None:
+            state['lod_overlay'].set_segments(self._lod_edge_segments(state['lod_edge_ids']))
+        self.canvas.restore_region(state['background'])
+        for artist in state['moving_artists']:
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.bbox)
+
+    def _end_drag_blit(self):
+        state = self._drag_state
+        if state is None:
+            return
+        self._drag_state = None
+        node_index = state['node_index']
+        offsets = self._node_collection.get_offsets().copy()
+        offsets[node_index] = self.graph_pos[self.dragged_node_id]
+        self._node_collection.set_offsets(offsets)
+        self._node_collection.set_facecolors(state['face_colors'])
+        self._node_collection.set_edgecolors(state['edge_colors'])
+        for (u, v), patch in state['edges']:
+            patch.set_positions(self.graph_pos[u], self.graph_pos[v])
+        if state['lod_overlay'] is not None:
+            self._lod_edges['segments'][state['lod_edge_ids']] = self._lod_edge_segments(state['lod_edge_ids'])
+            self._lod_edges['collection'].set_segments(self._lod_edges['segments'][self._lod_edges['visible_ids']])
+            state['lod_overlay'].remove()
+        state['overlay'].remove()
+        for artist in state['moving_artists']:
+            artist.set_animated(False)
+        self.canvas.draw_idle()
+        self._schedule_culling()  # Ребра перетащенной вершины могли войти в видимую область или выйти из нее
 
     def parse_input(self, input_text):
-        # (без изменений)
-        graph = {}
-        lines = input_text.strip().split('\n')
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '->' in line:
-                parts = line.split('->', 1)
-            else:
-                parts = line.split(None, 1)
-            if len(parts) != 2:
-                messagebox.showerror("Ошибка Ввода",
-                                     f"Неверный формат в строке {i + 1}: '{line}'.\n"
-                                     "Используйте 'P1 -> P2' или 'P1 P2'.")
-                return None
-            p_waiting = parts[0].strip()
-            p_holding = parts[1].strip()
-            if not p_waiting or not p_holding:
-                messagebox.showerror("Ошибка Ввода",
-                                     f"Пустое имя процесса в строке {i + 1}: '{line}'.")
-                return None
-            if ' ' in p_waiting or ' ' in p_holding:
-                messagebox.showerror("Ошибка Ввода",
-                                     f"Имена процессов не должны содержать пробелов. Строка {i + 1}: '{line}'.")
-                return None
-            if p_waiting not in graph:
-                graph[p_waiting] = []
-            if p_holding not in graph.get(p_waiting, []):
-                graph[p_waiting].append(p_holding)
-        return graph
+        # StringIO отдает строки по одной, без списка всех строк в памяти. Текст из строк
+        # RESOURCE/HOLD/REQUEST разбирается как граф распределения ресурсов (двудольный граф)
+        if is_resource_format(io.StringIO(input_text)):
+            resources, errors = parse_resource_stream(io.StringIO(input_text))
+            parsed_graph = resources.graph
+        else:
+            parsed_graph, errors = parse_wfg_stream(io.StringIO(input_text))
+        self.report_parse_errors(errors)
+        return parsed_graph
+
+    def report_parse_errors(self, errors):
+        # Одно окно на все некорректные строки; корректные ребра при этом не теряются
+        if errors:
+            messagebox.showwarning("Ошибка Ввода",
+                                   f"Некорректных строк: {errors.count} (пропущены).\n\n"
+                                   f"{errors.format_report()}")
+
+    def load_from_file(self):
+        path = filedialog.askopenfilename(title="Открыть файл WFG",
+                                          filetypes=[("Файлы WFG", f"*.txt *.wfg *.log *{SNAPSHOT_SUFFIX} "
+                                                                   f"*{RESOURCE_SUFFIX}"),
+                                                     ("Двоичные снимки", f"*{SNAPSHOT_SUFFIX}"), ("Все файлы", "*.*")])
+        if not path:
+            return
+        # Двоичный снимок отображается в память, текстовое поле не заполняется ни в одном из случаев
+        self.start_analysis(('snapshot' if is_snapshot(path) else 'file', path))
+
+    def _current_wfgraph(self):
+        # Граф текущего результата; после правок автоанализа и перемотки истории нарисованный граф
+        # новее parsed_graph_for_draw
+        if self._text_model is not None:
+            return WFGraph.from_dict(self._text_model.graph.to_graph())
+        cursor = self._history_cursor
+        if cursor.index is not None and cursor.index == self._history_shown:
+            return WFGraph.from_dict(cursor.graph.to_graph())
+        return self.parsed_graph_for_draw
+
+    def save_snapshot_file(self):
+        graph = self._current_wfgraph()
+        if graph is None:
+            messagebox.showinfo("Сохранение Снимка", "Нет графа для сохранения: сначала выполните анализ.")
+            return
+        path = filedialog.asksaveasfilename(title="Сохранить двоичный снимок WFG", defaultextension=SNAPSHOT_SUFFIX,
+                                            filetypes=[("Двоичные снимки", f"*{SNAPSHOT_SUFFIX}"),
+                                                       ("Все файлы", "*.*")])
+        if not path:
+            return
+        # Раскладка сохраняется, только если нарисованы сами процессы (не сжатый вид) и все они размещены
+        names = graph.names
+        coords = None
+        if self.condensation is None and self.graph_pos and all(name in self.graph_pos for name in names):
+            coords = [self.graph_pos[name] for name in names]
+        try:
+            save_snapshot(path, graph, graph.deadlocked_components(), coords)
+        except (OSError, ValueError) as exc:
+            messagebox.showerror("Ошибка Записи", f"Не удалось сохранить снимок '{path}':\n{exc}")
+            return
+        self._set_progress(0.0, f"Снимок сохранен: {path}")
 
     def display_result(self, text, color_fg):
         self.result_area.config(state=tk.NORMAL)
@@ -442,8 +1029,10 @@ class DeadlockApp:
         self.result_area.tag_config("result_style", foreground=color_fg, font=self.text_font)
         self.result_area.config(state=tk.DISABLED)
 
-    def draw_graph_visual(self, current_parsed_graph, cycle_nodes_list=None, recalculate_layout_and_graph=False):
-        if not VISUALIZATION_ENABLED:
+    def draw_graph_visual(self, current_parsed_graph, cycle_nodes_list=None, recalculate_layout_and_graph=False,
+                          deadlocked_sccs=None, precomputed_layout=None):
+        # Пустой холст до первой отрисовки графа не нужен: его заменяет надпись-заглушка
+        if not self._ensure_graph_view(create=current_parsed_graph is not None):
             return
 
         current_xlim = None
@@ -462,6 +1051,7 @@ class DeadlockApp:
                     current_ylim = None
 
         self.ax.cla()
+        self._reset_artist_refs()
         self.ax.set_facecolor(self.frame_bg_color)
         self.ax.axis('off')
 
@@ -471,6 +1061,8 @@ class DeadlockApp:
                          transform=self.ax.transAxes, fontdict={'size': 12, 'color': 'grey'})
             self.graph_G = None
             self.graph_pos = None
+            self._layout_key = None
+            self.spatial_index = None
             if hasattr(self, '_last_valid_xlim_for_redraw'):
                 del self._last_valid_xlim_for_redraw
                 del self._last_valid_ylim_for_redraw
@@ -478,37 +1070,24 @@ class DeadlockApp:
             return
 
         if recalculate_layout_and_graph or self.graph_G is None or self.graph_pos is None:
-            new_G = nx.DiGraph()
-            all_nodes_in_parsed_graph = set(current_parsed_graph.keys())
-            for dependencies in current_parsed_graph.values():
-                all_nodes_in_parsed_graph.update(dependencies)
-
-            if not all_nodes_in_parsed_graph and not current_parsed_graph:  # Явно пустой граф из ввода
+            if not current_parsed_graph:  # Явно пустой граф из ввода
                 self.ax.text(0.5, 0.5, "Граф пуст (нет узлов).",
                              horizontalalignment='center', verticalalignment='center',
                              transform=self.ax.transAxes, fontdict={'size': 12, 'color': 'grey'})
-                self.graph_G = new_G  # Пустой граф
+                self.graph_G = nx.DiGraph()  # Пустой граф
                 self.graph_pos = {}  # Пустые позиции
+                self._layout_key = None
+                self.spatial_index = None
                 self.canvas.draw_idle()
                 return
 
-            for node_name in all_nodes_in_parsed_graph:
-                new_G.add_node(node_name)
-            for u, dependencies in current_parsed_graph.items():
-                for v in dependencies:
-                    new_G.add_edge(u, v)
-            self.graph_G = new_G
-
-            if not self.graph_G.nodes():
-                self.graph_pos = {}
+            if precomputed_layout is not None:  # Граф и раскладка уже посчитаны в фоновом потоке
+                self.graph_G, self.graph_pos, self._layout_key = precomputed_layout
             else:
-                try:
-                    self.graph_pos = nx.kamada_kawai_layout(self.graph_G)
-                except Exception:
-                    try:
-                        self.graph_pos = nx.spring_layout(self.graph_G, k=0.7, iterations=70, seed=42)
-                    except Exception:
-                        self.graph_pos = nx.circular_layout(self.graph_G)
+                self.graph_G, self.graph_pos, self._layout_key = self.compute_graph_layout(
+                    current_parsed_graph, self.layout_engine_var.get(), deadlocked_sccs)
+            self.spatial_index = SpatialGridIndex(self.graph_pos)
+            self._hovered_node = None
 
         # Проверка после попытки создания/использования self.graph_G и self.graph_pos
         if not self.graph_G or not self.graph_G.nodes():
@@ -524,22 +1103,55 @@ class DeadlockApp:
 
         node_colors = []
         cycle_nodes_set = set(cycle_nodes_list) if cycle_nodes_list else set()
-
+        scc_id_by_node = {}  # Узел -> номер тупиковой компоненты
+        for scc_id, component in enumerate(deadlocked_sccs or []):
+            for node in component:
+                scc_id_by_node[node] = scc_id
+        cycle_nodes_set.update(scc_id_by_node)
 
         node_list_for_drawing = list(self.graph_G.nodes())
+        query_nodes, query_edge_set = self._query_view_highlight()
 
         for node in node_list_for_drawing:
-            if node in cycle_nodes_set:
+            if node in self.victim_nodes:
+                node_colors.append(self.node_color_victim)
+            elif node in cycle_nodes_set:
                 node_colors.append(self.node_color_cycle)
+            elif node in query_nodes:
+                node_colors.append(self.node_color_query)
+            elif node in self.resource_nodes:
+                node_colors.append(self.node_color_resource)
             else:
                 node_colors.append(self.node_color_default)
 
-        # Используем self.node_size_val
-        nx.draw_networkx_nodes(self.graph_G, self.graph_pos, ax=self.ax, nodelist=node_list_for_drawing,
-                               node_color=node_colors, node_size=self.node_size_val,
-                               alpha=0.95, edgecolors='black', linewidths=0.5)
-        nx.draw_networkx_labels(self.graph_G, self.graph_pos, ax=self.ax, font_size=9,
-                                font_weight="bold", font_color="black")
+        # Большой граф рисуется упрощенно: тысячи FancyArrowPatch и подписей рендерятся минутами
+        lod_mode = self.graph_G.number_of_edges() > self.lod_edge_threshold
+        self._lod_mode = lod_mode
+        base_node_size = self.lod_node_size if lod_mode else self.node_size_val
+        # Супервершина сжатого вида крупнее обычной, площадь растет с логарифмом числа процессов
+        self._node_sizes = np.array([base_node_size * min(1.0 + math.log2(self._collapsed_sizes[node]), 6.0)
+                                     if node in self._collapsed_sizes else base_node_size
+                                     for node in node_list_for_drawing], dtype=float)
+        self._drawn_node_size = float(self._node_sizes.max())
+        self._node_collection = nx.draw_networkx_nodes(self.graph_G, self.graph_pos, ax=self.ax,
+                                                       nodelist=node_list_for_drawing,
+                                                       node_color=node_colors, node_size=self._node_sizes,
+                                                       alpha=0.95, edgecolors='black',
+                                                       linewidths=0.2 if lod_mode else 0.5)
+        if self.resource_nodes:  # Ресурсы - квадраты в той же коллекции, форма задается каждой вершине
+            process_path, resource_path = self._marker_path('o'), self._marker_path('s')
+            self._node_paths = [resource_path if node in self.resource_nodes else process_path
+                                for node in node_list_for_drawing]
+            self._node_collection.set_paths(self._node_paths)
+        self._node_artist_index = {node: index for index, node in enumerate(node_list_for_drawing)}
+        self._node_draw_index = dict(self._node_artist_index)
+        self._node_face_colors = self._node_collection.get_facecolors().copy()
+        edge_colors = self._node_collection.get_edgecolors()
+        self._node_edge_colors = (edge_colors if len(edge_colors) == len(self._node_face_colors)
+                                  else edge_colors.repeat(len(self._node_face_colors), axis=0)).copy()
+        if not lod_mode:
+            self._label_artists = nx.draw_networkx_labels(self.graph_G, self.graph_pos, ax=self.ax, font_size=9,
+                                                          font_weight="bold", font_color="black")
 
         cycle_edge_set = set()
         if cycle_nodes_list:
@@ -551,26 +1163,62 @@ class DeadlockApp:
 
         normal_edges = []
         cycle_edges_to_draw = []
+        query_edges_to_draw = []
         for u, v in self.graph_G.edges():
-            if (u, v) in cycle_edge_set:
+            in_same_scc = u in scc_id_by_node and scc_id_by_node[u] == scc_id_by_node.get(v)
+            if (u, v) in cycle_edge_set or in_same_scc:
                 cycle_edges_to_draw.append((u, v))
+            elif (u, v) in query_edge_set:
+                query_edges_to_draw.append((u, v))
             else:
                 normal_edges.append((u, v))
+        if lod_mode and len(query_edges_to_draw) > self.lod_max_curved_edges:
+            normal_edges.extend(query_edges_to_draw[self.lod_max_curved_edges:])  # Цепочка длиннее лимита патчей
+            query_edges_to_draw = query_edges_to_draw[:self.lod_max_curved_edges]
 
         connection_style_with_rad = 'arc3,rad=0.15'
 
-        nx.draw_networkx_edges(self.graph_G, self.graph_pos, ax=self.ax, edgelist=normal_edges,
-                               edge_color=self.edge_color_default,
-                               width=1.5, arrowsize=20,
-                               node_size=self.node_size_val,
-                               connectionstyle=connection_style_with_rad)
+        if lod_mode:
+            # Огромная тупиковая компонента дала бы те же тысячи патчей: кривыми остаются ребра
+            # найденного цикла и сколько влезет в лимит, остальные - красные штрихи в общей коллекции
+            curved_limit = max(self.lod_max_curved_edges, len(cycle_edge_set))
+            overflow = []
+            if len(cycle_edges_to_draw) > curved_limit:
+                extra = [edge for edge in cycle_edges_to_draw if edge not in cycle_edge_set]
+                keep = curved_limit - len(cycle_edge_set)
+                cycle_edges_to_draw = [edge for edge in cycle_edges_to_draw if edge in cycle_edge_set] + extra[:keep]
+                overflow = extra[keep:]
+            if normal_edges or overflow:
+                self._draw_lod_edges(normal_edges, overflow)
+        else:
+            normal_edge_artists = nx.draw_networkx_edges(self.graph_G, self.graph_pos, ax=self.ax,
+                                                         edgelist=normal_edges, edge_color=self.edge_color_default,
+                                                         width=1.5, arrowsize=20,
+                                                         node_size=base_node_size,
+                                                         connectionstyle=connection_style_with_rad)
+            self._register_edge_artists(normal_edges, normal_edge_artists)
 
         if cycle_edges_to_draw:
-            nx.draw_networkx_edges(self.graph_G, self.graph_pos, ax=self.ax, edgelist=cycle_edges_to_draw,
-                                   edge_color=self.edge_color_cycle,
-                                   width=2.5, arrowsize=25, style='dashed',
-                                   node_size=self.node_size_val,
-                                   connectionstyle=connection_style_with_rad)
+            cycle_edge_artists = nx.draw_networkx_edges(self.graph_G, self.graph_pos, ax=self.ax,
+                                                        edgelist=cycle_edges_to_draw,
+                                                        edge_color=self.edge_color_cycle,
+                                                        width=2.5, arrowsize=25, style='dashed',
+                                                        node_size=base_node_size,
+                                                        connectionstyle=connection_style_with_rad)
+            self._register_edge_artists(cycle_edges_to_draw, cycle_edge_artists)
+            if isinstance(cycle_edge_artists, list) and len(cycle_edge_artists) == len(cycle_edges_to_draw):
+                for edge, patch in zip(cycle_edges_to_draw, cycle_edge_artists):
+                    if edge in cycle_edge_set:  # Выбранный цикл толще остальных ребер тупиков
+                        patch.set_linewidth(3.5)
+
+        if query_edges_to_draw:
+            query_edge_artists = nx.draw_networkx_edges(self.graph_G, self.graph_pos, ax=self.ax,
+                                                        edgelist=query_edges_to_draw,
+                                                        edge_color=self.edge_color_query,
+                                                        width=3.0, arrowsize=22,
+                                                        node_size=base_node_size,
+                                                        connectionstyle=connection_style_with_rad)
+            self._register_edge_artists(query_edges_to_draw, query_edge_artists)
 
         if current_xlim and current_ylim:
             self.ax.set_xlim(current_xlim)
@@ -583,68 +1231,1140 @@ class DeadlockApp:
             self._last_valid_xlim_for_redraw = self.ax.get_xlim()
             self._last_valid_ylim_for_redraw = self.ax.get_ylim()
 
+        self._apply_culling(redraw=False)
+        # Зум колесом, панорамирование и инструменты панели меняют пределы осей (cla() снимает подписку)
+        self.ax.callbacks.connect('xlim_changed', self._schedule_culling)
+        self.ax.callbacks.connect('ylim_changed', self._schedule_culling)
+
         self.fig.tight_layout(pad=1.0)
         self.canvas.draw_idle()
 
+    @staticmethod
+    def _marker_path(marker):
+        # Путь маркера в том виде, в каком его кладет в коллекцию scatter
+        from matplotlib.markers import MarkerStyle
+        style = MarkerStyle(marker)
+        return style.get_path().transformed(style.get_transform())
+
+    def compute_graph_layout(self, parsed_graph, layout_engine='auto', deadlocked_sccs=None, cancel_event=None,
+                             previous_layout=None, timings=None, stored_coords=None):
+        # Не трогает Tk/Matplotlib, поэтому может выполняться в фоновом потоке.
+        # Раскладка считается прямо по CSR-графу, networkx нужен только для отрисовки.
+        # previous_layout - (граф, позиции, ключ) текущей картинки для дораскладки после правок;
+        # stored_coords - x, y по ID вершин из двоичного снимка (раскладка не считается и не кэшируется)
+        if timings is None:
+            timings = PhaseTimings()
+        with timings.phase('networkx', nodes=parsed_graph.node_count, edges=parsed_graph.edge_count):
+            graph_G = parsed_graph.to_networkx()
+        if stored_coords is not None:
+            with timings.phase('layout', engine=layout_engine, source='snapshot'):
+                coords = np.frombuffer(stored_coords, dtype=np.float64).reshape(-1, 2)
+                return graph_G, positions_to_dict(parsed_graph, coords), None
+        with timings.phase('layout', engine=layout_engine, source='full') as counts:
+            layout_key = f"{layout_engine}:{graph_structure_key(parsed_graph)}"
+            graph_pos = self.layout_cache.get(layout_key) if self.layout_cache is not None else None
+            if graph_pos is not None and len(graph_pos) == parsed_graph.node_count:
+                counts['source'] = 'cache'
+                return graph_G, graph_pos, layout_key
+
+            coords = None
+            if previous_layout is not None:
+                previous_graph, previous_pos, previous_key = previous_layout
+                # При смене движка раскладка строится заново
+                if previous_key is not None and previous_key.split(':', 1)[0] == layout_engine:
+                    coords = seeded_layout(parsed_graph, previous_pos, previous_graph, cancel_event=cancel_event)
+                    if coords is not None:
+                        counts['source'] = 'seeded'
+            if coords is None:
+                components = [[parsed_graph.index_of[name] for name in component]
+                              for component in deadlocked_sccs or []]
+                _, coords = compute_layout(parsed_graph, layout_engine, components, cancel_event=cancel_event)
+            graph_pos = positions_to_dict(parsed_graph, coords)
+        if self.layout_cache is not None and not (cancel_event is not None and cancel_event.is_set()):
+            self.layout_cache.put(layout_key, graph_pos)  # Недосчитанную из-за отмены раскладку не кэшируем
+        return graph_G, graph_pos, layout_key
+
     def run_detection_and_draw(self):
+        # Текст читается в главном потоке (Tk не потокобезопасен), остальное - в фоне
         input_text = self.input_area.get("1.0", tk.END)
-        parsed_graph = self.parse_input(input_text)
-
+        self.start_analysis(('text', input_text))
+
+    def start_analysis(self, source):
+        self.stop_live_monitor()
+        self._ensure_graph_view()  # Рабочий поток строит раскладку, ему нужны загруженные NumPy/NetworkX
+        if self._analysis_cancel_event is not None:
+            self._analysis_cancel_event.set()  # Предыдущий запуск больше не нужен
+        self._analysis_generation += 1
+        self._analysis_cancel_event = threading.Event()
+        self._last_analysis_source = source
+        self._discard_profile_capture()
+        if self.profiling_var.get():
+            self._profile_capture = ProfileCapture().start()
+        previous_layout = None
+        if self.view_graph_for_draw and self.graph_pos:  # Снимок текущей картинки для дораскладки в фоне
+            previous_layout = (self.view_graph_for_draw, dict(self.graph_pos), self._layout_key)
+        # В режиме автоанализа вместе с графом строится модель текста для последующих правок
+        build_text_model = self.auto_analyze_var.get() and source[0] == 'text'
+        worker = threading.Thread(target=self._analysis_worker,
+                                  args=(self._analysis_generation, source, self.layout_engine_var.get(),
+                                        self._analysis_cancel_event, previous_layout,
+                                        self.condensed_view_var.get(), self._profile_capture, build_text_model),
+                                  daemon=True)
+        worker.start()
+
+        self.cancel_button.config(state=tk.NORMAL)
+        self._set_progress(0.0, "Анализ запущен...")
+        if self._analysis_poll_id is None:
+            self._analysis_poll_id = self.master.after(50, self._poll_analysis_queue)
+
+    def cancel_analysis(self):
+        if self._analysis_cancel_event is None:
+            return
+        # Этапы прерываются на ближайшей контрольной точке; уже идущий вызов networkx
+        # досчитывается в фоне, но его результат будет отброшен как устаревший
+        self._analysis_cancel_event.set()
+        self._analysis_generation += 1
+        self._discard_profile_capture()
+        self._finish_analysis("Анализ отменен.")
+
+    def _discard_profile_capture(self):
+        if self._profile_capture is not None:
+            self._profile_capture.discard()
+            self._profile_capture = None
+
+    def _finish_analysis(self, status_text):
+        self._analysis_cancel_event = None
+        self.cancel_button.config(state=tk.DISABLED)
+        self._set_progress(0.0, status_text)
+
+    def _set_progress(self, fraction, status_text):
+        self.progress_bar['value'] = fraction
+        self.status_label.config(text=status_text)
+
+    def _analysis_worker(self, generation, source, layout_engine, cancel_event, previous_layout=None,
+                         condensed=False, profile_capture=None, build_text_model=False):
+        def post(kind, payload):
+            self._analysis_queue.put((generation, kind, payload))
+
+        def checkpoint(fraction, status_text):
+            if cancel_event.is_set():
+                raise AnalysisCancelled()
+            post('progress', (fraction, status_text))
+
+        timings = PhaseTimings(trace_memory=profile_capture is not None)
+        profiling = profile_capture.profile_thread() if profile_capture is not None else contextlib.nullcontext()
+        try:
+            with profiling:
+                checkpoint(0.05, "Разбор входных данных...")
+                source_kind, source_value = source
+                text_model = snapshot = resources = None
+                costs = {}  # Стоимости снятия процессов из директив '#@cost' (в двоичном снимке их нет)
+                with timings.phase('parse') as counts:
+                    if source_kind == 'snapshot':  # Разбора нет: массивы читаются прямо из файла через mmap
+                        snapshot = open_snapshot(source_value)
+                        parsed_graph, errors = snapshot.graph, WFGParseErrors()
+                    elif source_kind == 'history':  # Состояние истории: граф уже собран из ее дельт
+                        parsed_graph, errors = source_value[1], WFGParseErrors()
+                    elif source_kind == 'file' and is_resource_file(source_value):
+                        resources, errors = parse_resource_file(source_value)
+                        parsed_graph = resources.graph
+                    elif source_kind == 'file':
+                        parsed_graph, errors = parse_wfg_file(source_value, costs)
+                    elif is_resource_format(io.StringIO(source_value)):  # Автоанализ правок тут не работает
+                        resources, errors = parse_resource_stream(io.StringIO(source_value))
+                        parsed_graph = resources.graph
+                    elif build_text_model:
+                        text_model, parsed_graph, errors = WFGTextModel.parse(source_value.split('\n'), costs)
+                    else:
+                        parsed_graph, errors = parse_wfg_stream(io.StringIO(source_value), costs)
+                    counts.update(nodes=parsed_graph.node_count, edges=parsed_graph.edge_count)
+
+                checkpoint(0.35, f"Поиск тупиков (процессов: {parsed_graph.node_count}, "
+                                 f"зависимостей: {parsed_graph.edge_count})...")
+                reduction = None
+                with timings.phase('detect') as counts:
+                    if resources is not None:
+                        # Цикл здесь еще не тупик: решает редукция, в тупике - несводимые процессы и их ресурсы
+                        reduction = resources.reduce()
+                        deadlocked_sccs = [reduction.deadlocked + reduction.deadlocked_resources] if reduction else []
+                        component_cycles = []
+                        counts['deadlocked_processes'] = len(reduction.blocked)
+                    else:
+                        stored_components = (snapshot.deadlocked_components()
+                                             if snapshot is not None and snapshot.has_components else None)
+                        if stored_components is None and parsed_graph.edge_count >= PARALLEL_MIN_EDGES \
+                                and (os.cpu_count() or 1) > 1:
+                            stored_components = parallel_deadlocked_components(
+                                parsed_graph, executor=self._get_detect_executor())
+                        deadlocked_sccs, component_cycles = analyze_deadlocks(parsed_graph, stored_components)
+                        counts['deadlocked_sccs'] = len(deadlocked_sccs)
+
+                plan = None
+                if deadlocked_sccs and resources is None:
+                    checkpoint(0.45, "План разрешения тупиков...")
+                    with timings.phase('resolve') as counts:
+                        index_of = parsed_graph.index_of
+                        plan = plan_resolution(parsed_graph, [[index_of[name] for name in component]
+                                                              for component in deadlocked_sccs], costs)
+                        counts['victims'] = len(plan.victims)
+
+                layout = condensed_view = None
+                if VISUALIZATION_ENABLED and parsed_graph:
+                    view_graph, view_sccs = parsed_graph, deadlocked_sccs
+                    if condensed and resources is None:
+                        checkpoint(0.5, "Сжатие графа до компонент...")
+                        with timings.phase('condense') as counts:
+                            index_of = parsed_graph.index_of
+                            condensation = WFGCondensation(parsed_graph, [[index_of[name] for name in component]
+                                                                          for component in deadlocked_sccs])
+                            view_graph, view_sccs, collapsed_sizes = condensation.view()
+                            condensed_view = (condensation, view_graph, view_sccs, collapsed_sizes)
+                            counts['groups'] = len(condensation)
+                    checkpoint(0.6, "Расчет раскладки графа...")
+                    # Раскладка из снимка подходит только для графа процессов, не для сжатого вида
+                    stored_coords = snapshot.coords if snapshot is not None and not condensed else None
+                    layout = self.compute_graph_layout(view_graph, layout_engine, view_sccs, cancel_event,
+                                                       previous_layout, timings, stored_coords)
+                checkpoint(1.0, "Отрисовка...")
+            post('done', (parsed_graph, errors, deadlocked_sccs, component_cycles, layout, condensed_view, timings,
+                          text_model, plan, costs, reduction))
+        except AnalysisCancelled:
+            pass
+        except (OSError, UnicodeDecodeError) as exc:
+            post('error', ("Ошибка Чтения", f"Не удалось прочитать файл '{source[1]}':\n{exc}"))
+        except ValueError as exc:
+            if source[0] == 'snapshot':  # Поврежденный или чужой двоичный снимок
+                post('error', ("Ошибка Чтения", f"Не удалось открыть снимок '{source[1]}':\n{exc}"))
+            else:
+                post('error', ("Ошибка Анализа", f"{type(exc).__name__}: {exc}"))
+        except Exception as exc:  # Иначе интерфейс навсегда останется в состоянии "идет анализ"
+            post('error', ("Ошибка Анализа", f"{type(exc).__name__}: {exc}"))
+
+    def _poll_analysis_queue(self):
+        # Вызывается через master.after: все обновления интерфейса - только в главном потоке
+        self._analysis_poll_id = None
+        while True:
+            try:
+                generation, kind, payload = self._analysis_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._analysis_generation:
+                continue  # Результат устаревшего или отмененного запуска
+            if kind == 'progress':
+                self._set_progress(*payload)
+            elif kind == 'error':
+                title, message = payload
+                self._discard_profile_capture()
+                self._finish_analysis(title + ".")
+                messagebox.showerror(title, message)
+            elif kind == 'done':
+                self._finish_analysis("Готово.")
+                parsed_graph, errors, deadlocked_sccs, component_cycles, layout, condensed_view, timings, \
+                    text_model, plan, costs, reduction = payload
+                self.report_parse_errors(errors)
+                self.analysis_timings = timings
+                # Сам рендер Matplotlib выполняется позже, по draw_idle: его время добавит _on_canvas_drawn
+                self._render_pending = VISUALIZATION_ENABLED
+                profile_capture = self._profile_capture
+                profiling = (profile_capture.profile_thread() if profile_capture is not None
+                             else contextlib.nullcontext())
+                with profiling:
+                    with timings.phase('draw'):
+                        self.show_analysis_result(parsed_graph, deadlocked_sccs, component_cycles, layout,
+                                                  condensed_view, plan, reduction)
+                    if profile_capture is not None and self._render_pending:
+                        self.canvas.draw()  # При профилировании рендер синхронный, чтобы попасть в отчет
+                if profile_capture is not None:
+                    self._write_profile_report()
+                self._update_timings_label()
+                self._record_analysis_history(parsed_graph, condensed_view, reduction)
+                self._text_model = text_model
+                self._resolution_costs = costs
+                if text_model is not None:
+                    self._schedule_auto_analysis()  # Правки, сделанные, пока шел полный анализ
+        if self._analysis_cancel_event is not None:
+            self._analysis_poll_id = self.master.after(50, self._poll_analysis_queue)
+
+    def _on_canvas_drawn(self, seconds):
+        # Вызывается холстом после каждой полной перерисовки (blit при перетаскивании сюда не попадает)
+        if self._render_pending and self.analysis_timings is not None:
+            self._render_pending = False
+            self.analysis_timings.add('render', seconds)
+        else:
+            self._last_redraw_seconds = seconds
+        self._update_timings_label()
+
+    def _write_profile_report(self):
+        profile_capture, self._profile_capture = self._profile_capture, None
+        try:
+            path = profile_capture.write_report(default_report_path(), self.analysis_timings)
+            self.status_label.config(text=f"Отчет профилирования: {path}")
+        except OSError as exc:
+            messagebox.showerror("Ошибка Записи", f"Не удалось сохранить отчет профилирования:\n{exc}")
+
+    def _update_timings_label(self):
+        parts = []
+        if self.analysis_timings is not None:
+            parts.append(self.analysis_timings.summary())
+        if self._last_redraw_seconds is not None:
+            parts.append(f"перерисовка {format_seconds(self._last_redraw_seconds)}")
+        self.timings_label.config(text="Время: " + " | ".join(parts) if parts else "")
+
+    def show_analysis_result(self, parsed_graph, deadlocked_sccs, component_cycles, layout=None,
+                             condensed_view=None, plan=None, reduction=None):
+        # reduction - итог редукции графа распределения ресурсов (None для обычного WFG)
+        self._reset_cycle_paging()
+        self._invalidate_reachability()
+        self._set_resolution_plan(plan)
+        self.resource_nodes = set(reduction.availability) if reduction is not None else set()
+        self._remembered_pos = {}  # Раскладка считается заново, старые позиции к ней не относятся
+        self.condensation = None
+        self._expanded_groups = set()
+        self._collapsed_sizes = {}
         if parsed_graph is None:
             self.display_result("Ошибка в формате ввода. Проверьте сообщения.", self.error_color_fg)
             if VISUALIZATION_ENABLED:
                 self.parsed_graph_for_draw = None  # Очищаем сохраненный граф
+                self.view_graph_for_draw = None
                 self.cycle_nodes_for_draw = None
+                self.deadlocked_sccs_for_draw = None
                 self.draw_graph_visual(None, None, recalculate_layout_and_graph=True)
             return
 
         self.parsed_graph_for_draw = parsed_graph  # Сохраняем для перетаскивания
+        self.view_graph_for_draw = parsed_graph
 
-        all_graph_nodes_parsed = set()
-        if parsed_graph:
-            all_graph_nodes_parsed.update(parsed_graph.keys())
-            for deps in parsed_graph.values():
-                all_graph_nodes_parsed.update(deps)
-
-        if not all_graph_nodes_parsed and not parsed_graph:  # Проверяем, если граф действительно пуст
+        if not parsed_graph:  # Проверяем, если граф действительно пуст
             self.display_result("Граф пуст (нет узлов для анализа). Тупиков нет.", self.info_color_fg)
             if VISUALIZATION_ENABLED:
                 self.cycle_nodes_for_draw = None
-                self.draw_graph_visual(self.parsed_graph_for_draw, None, recalculate_layout_and_graph=True)
+                self.deadlocked_sccs_for_draw = None
+                self.draw_graph_visual(self.view_graph_for_draw, None, recalculate_layout_and_graph=True)
             return
 
-        cycle = detect_deadlock_wfg(parsed_graph)
+        cycle = component_cycles[0] if component_cycles else None
         self.cycle_nodes_for_draw = cycle  # Сохраняем для перетаскивания
+        self.deadlocked_sccs_for_draw = deadlocked_sccs
+        if condensed_view is not None:  # Рисуется граф компонент, тупики - в именах супервершин
+            self.condensation, self.view_graph_for_draw, self.deadlocked_sccs_for_draw, self._collapsed_sizes = \
+                condensed_view
 
         # Сбрасываем сохраненные пределы перед полным пересчетом layout'а, чтобы autoscale сработал корректно
         if hasattr(self, '_last_valid_xlim_for_redraw'):
             del self._last_valid_xlim_for_redraw
             del self._last_valid_ylim_for_redraw
 
-        if cycle:
-            cycle_str = " -> ".join(cycle) + " -> " + cycle[0]
-            result_text = f"ОБНАРУЖЕН ТУПИК!\nЦикл: {cycle_str}"
-            self.display_result(result_text, self.error_color_fg)
+        if reduction is not None:  # Циклы двудольного графа - не тупики, поэтому их листание не включается
+            result_lines = [reduction.summary()] + reduction.format_blocked(RESOURCE_RESULT_MAX_PROCESSES)
+            self.display_result("\n".join(result_lines), self.error_color_fg if reduction else self.success_color_fg)
             if VISUALIZATION_ENABLED:
-                self.draw_graph_visual(self.parsed_graph_for_draw, self.cycle_nodes_for_draw,
-                                       recalculate_layout_and_graph=True)
+                self.draw_graph_visual(self.view_graph_for_draw, None, recalculate_layout_and_graph=True,
+                                       deadlocked_sccs=self.deadlocked_sccs_for_draw, precomputed_layout=layout)
+        elif deadlocked_sccs:
+            result_lines = [f"ОБНАРУЖЕН ТУПИК! Компонент с циклами: {len(deadlocked_sccs)}"]
+            for number, (component, component_cycle) in enumerate(zip(deadlocked_sccs, component_cycles), start=1):
+                cycle_str = " -> ".join(component_cycle) + " -> " + component_cycle[0]
+                result_lines.append(f"{number}. Процессов: {len(component)}. Цикл: {cycle_str}")
+            if plan is not None:
+                result_lines.append(self._resolution_line(plan.summary(), plan.victims))
+            self.display_result("\n".join(result_lines), self.error_color_fg)
+            self._cycle_summary = result_lines[0]
+            self._cycle_iterator = iter_deadlock_cycles(parsed_graph, max_cycles=CYCLE_ENUM_MAX_CYCLES,
+                                                        max_length=CYCLE_ENUM_MAX_LENGTH,
+                                                        time_limit=CYCLE_ENUM_TIME_LIMIT)
+            self._update_cycle_nav()
+            if VISUALIZATION_ENABLED:
+                self.draw_graph_visual(self.view_graph_for_draw, self.cycle_nodes_for_draw,
+                                       recalculate_layout_and_graph=True,
+                                       deadlocked_sccs=self.deadlocked_sccs_for_draw, precomputed_layout=layout)
         else:
             result_text = "Тупиков не обнаружено."
             self.display_result(result_text, self.success_color_fg)
             if VISUALIZATION_ENABLED:
-                self.draw_graph_visual(self.parsed_graph_for_draw, None, recalculate_layout_and_graph=True)
+                self.draw_graph_visual(self.view_graph_for_draw, None, recalculate_layout_and_graph=True,
+                                       precomputed_layout=layout)
+
+    def _set_resolution_plan(self, plan):
+        self.resolution_plan = plan
+        self.victim_nodes = set(plan.victims) if plan is not None else set()
+
+    @staticmethod
+    def _resolution_line(summary, victims):
+        shown = ", ".join(victims[:RESOLUTION_MAX_NAMES])
+        if len(victims) > RESOLUTION_MAX_NAMES:
+            shown += f" ... (+{len(victims) - RESOLUTION_MAX_NAMES})"
+        return f"Разрешение: {summary}: {shown}"
+
+    # --- Листание элементарных циклов ---
+    def _reset_cycle_paging(self):
+        self._cycle_iterator = None
+        self._seen_cycles = []
+        self._selected_cycle = None
+        self._cycle_summary = ""
+        self._update_cycle_nav()
+
+    def _pull_cycles(self, count):
+        # Догоняет генератор до count перебранных циклов (или до его конца)
+        while len(self._seen_cycles) < count and self._cycle_iterator is not None:
+            cycle = next(self._cycle_iterator, None)
+            if cycle is None:
+                self._cycle_iterator = None
+            else:
+                self._seen_cycles.append(cycle)
+
+    def select_cycle(self, step):
+        target = 0 if self._selected_cycle is None else self._selected_cycle + step
+        if target < 0:
+            return
+        self._pull_cycles(target + 2)  # На один вперед - чтобы знать, есть ли следующий
+        if target >= len(self._seen_cycles):
+            self._update_cycle_nav()
+            return
+        self._selected_cycle = target
+        self.cycle_nodes_for_draw = self._seen_cycles[target]
+        self._show_cycle_page()
+        self._update_cycle_nav()
+        if VISUALIZATION_ENABLED and self.graph_G is not None:
+            self.draw_graph_visual(self.view_graph_for_draw, self.cycle_nodes_for_draw,
+                                   recalculate_layout_and_graph=False, deadlocked_sccs=self.deadlocked_sccs_for_draw)
+
+    def _show_cycle_page(self):
+        # Страница перечня вокруг выбранного цикла; выбранная строка выделяется фоном
+        first = self._selected_cycle - self._selected_cycle % CYCLE_PAGE_SIZE
+        page = self._seen_cycles[first:first + CYCLE_PAGE_SIZE]
+        result_lines = [self._cycle_summary]
+        for number, cycle in enumerate(page, start=first + 1):
+            marker = ">" if number - 1 == self._selected_cycle else " "
+            result_lines.append(f"{marker} {number}. " + " -> ".join(cycle) + " -> " + cycle[0])
+        self.display_result("\n".join(result_lines), self.error_color_fg)
+        selected_line = self._selected_cycle - first + 2
+        self.result_area.tag_add("selected_cycle", f"{selected_line}.0", f"{selected_line}.end")
+        self.result_area.tag_config("selected_cycle", background="#ffe3e0")
+        self.result_area.see(f"{selected_line}.0")
+
+    def _update_cycle_nav(self):
+        if self._cycle_iterator is None and not self._seen_cycles:
+            self.prev_cycle_button.config(state=tk.DISABLED)
+            self.next_cycle_button.config(state=tk.DISABLED)
+            self.cycle_nav_label.config(text="")
+            return
+        selected = self._selected_cycle
+        has_next = (selected is None or selected + 1 < len(self._seen_cycles) or self._cycle_iterator is not None)
+        self.prev_cycle_button.config(state=tk.NORMAL if selected else tk.DISABLED)
+        self.next_cycle_button.config(state=tk.NORMAL if has_next else tk.DISABLED)
+        if selected is None:
+            text = "Все элементарные циклы - кнопкой \"Цикл >\""
+        elif self._cycle_iterator is None:
+            text = f"Цикл {selected + 1} из {len(self._seen_cycles)}"
+            if len(self._seen_cycles) >= CYCLE_ENUM_MAX_CYCLES:
+                text += " (достигнут предел перебора)"
+        else:
+            text = f"Цикл {selected + 1} из {len(self._seen_cycles)}+"
+        self.cycle_nav_label.config(text=text)
+
+    # --- Запросы достижимости: кого процесс ждет, кто ждет его, самая длинная цепочка ---
+    def _reachability_index(self):
+        # Индекс строится при первом запросе к графу и живет до его изменения (_invalidate_reachability)
+        if self._reach_index is None:
+            graph = self._current_wfgraph()
+            if graph is None:
+                return None
+            self.master.config(cursor="watch")
+            self._set_progress(0.0, "Построение индекса достижимости...")
+            self.master.update_idletasks()
+            try:
+                started = time.perf_counter()
+                self._reach_index = WFGReachability(graph)
+                self._set_progress(0.0, f"Индекс достижимости: процессов {graph.node_count}, "
+                                        f"построен за {format_seconds(time.perf_counter() - started)}")
+            finally:
+                self.master.config(cursor="")
+        return self._reach_index
+
+    def run_reachability_query(self, kind):
+        name = self.query_entry.get().strip()
+        if not name and kind != 'chain':
+            self.query_label.config(text="Введите имя процесса.")
+            return
+        index = self._reachability_index()
+        if index is None:
+            self.query_label.config(text="Нет графа для запроса: сначала выполните анализ.")
+            return
+        edges = []
+        try:
+            if kind == 'upstream':
+                nodes = index.upstream(name)
+                holders = [", ".join(holder) for holder in index.root_holders(name)]
+                text = (f"{name} ждет процессов: {len(nodes)}; корневые держатели ({len(holders)}): "
+                        f"{self._short_names(holders) or 'нет'}")
+            elif kind == 'downstream':
+                nodes = index.downstream(name)
+                text = f"{name} ждут процессов: {len(nodes)}: {self._short_names(nodes) or 'никто'}"
+            else:
+                chain = index.longest_chain(name or None)
+                nodes = [node for unit in chain for node in unit]
+                edges = index.chain_edges(chain)
+                links = ["{" + ", ".join(unit) + "}" if len(unit) > 1 else unit[0] for unit in chain]
+                text = (f"Самая длинная цепочка{' через ' + name if name else ''}: звеньев {len(chain)}: "
+                        f"{' -> '.join(links[:QUERY_MAX_NAMES])}{' -> ...' if len(links) > QUERY_MAX_NAMES else ''}")
+        except KeyError:
+            self.query_label.config(text=f"Процесс '{name}' не найден в графе.")
+            return
+        self.query_nodes = set(nodes)
+        if name:
+            self.query_nodes.add(name)
+        self.query_edges = edges
+        self.query_label.config(text=text)
+        self._redraw_query_highlight()
+
+    @staticmethod
+    def _short_names(names):
+        shown = ", ".join(names[:QUERY_MAX_NAMES])
+        return shown + (f" ... (+{len(names) - QUERY_MAX_NAMES})" if len(names) > QUERY_MAX_NAMES else "")
+
+    def clear_reachability_query(self):
+        had_highlight = bool(self.query_nodes or self.query_edges)
+        self.query_nodes = set()
+        self.query_edges = []
+        self.query_label.config(text="")
+        if had_highlight:
+            self._redraw_query_highlight()
+
+    def _invalidate_reachability(self):
+        # Граф изменился: индекс устарел, подсветка снимается с холста до того, как его тронет правка
+        self._reach_index = None
+        if self.query_nodes or self.query_edges:
+            self.clear_reachability_query()
+
+    def _redraw_query_highlight(self):
+        if VISUALIZATION_ENABLED and self.graph_G is not None:
+            self.draw_graph_visual(self.view_graph_for_draw, self.cycle_nodes_for_draw,
+                                   recalculate_layout_and_graph=False, deadlocked_sccs=self.deadlocked_sccs_for_draw)
+
+    def _query_view_highlight(self):
+        # Подсветка в именах нарисованного графа: в сжатом виде процесс свернутой группы - ее супервершина
+        if not self.query_nodes and not self.query_edges:
+            return set(), set()
+        condensation = self.condensation
+        graph_G = self.graph_G
+
+        def view_node(name):
+            if condensation is None or name in graph_G:
+                return name
+            group = condensation.group_of_name(name)
+            return None if group is None else condensation.labels[group]
+
+        nodes = {view_node(name) for name in self.query_nodes}
+        nodes.discard(None)
+        edges = {(view_node(waiter), view_node(holder)) for waiter, holder in self.query_edges}
+        return nodes, {(waiter, holder) for waiter, holder in edges if waiter != holder}
+
+    def on_view_mode_changed(self):
+        # Смена вида требует другой раскладки - анализ того же источника повторяется в фоне.
+        # Показанное прошлое состояние истории остается показанным
+        index = self._history_view_index
+        if index is not None and self._live_stop_event is None and index >= self.history.first_index:
+            self.start_analysis(('history', (index, self.history.graph_at(index))))
+        elif self._last_analysis_source is not None and self.parsed_graph_for_draw is not None:
+            self.start_analysis(self._last_analysis_source)
+
+    def toggle_group(self, view_node):
+        # Двойной щелчок: супервершина разворачивается на месте, процесс развернутой группы сворачивает ее
+        group = self.condensation.group_of_name(view_node)
+        if group is None or len(self.condensation.groups[group]) == 1:
+            return
+        previous_pos = self.graph_pos
+        names = self.parsed_graph_for_draw.names
+        if group in self._expanded_groups:
+            self._expanded_groups.discard(group)
+            members = [names[node_id] for node_id in self.condensation.groups[group]]
+            placed = [previous_pos[name] for name in members if name in previous_pos]
+            hints = {self.condensation.labels[group]: tuple(np.mean(placed, axis=0))} if placed else {}
+        else:
+            self._expanded_groups.add(group)
+            hints = {names[node_id]: previous_pos[view_node] for node_id in self.condensation.groups[group]}
+
+        view_graph, view_sccs, self._collapsed_sizes = self.condensation.view(self._expanded_groups)
+        # Остальные вершины остаются на своих местах, раскладываются только процессы группы
+        coords = seeded_layout(view_graph, previous_pos, hints=hints, max_changed_fraction=None)
+        if coords is None:
+            components = [[view_graph.index_of[name] for name in component] for component in view_sccs]
+            _, coords = compute_layout(view_graph, self.layout_engine_var.get(), components)
+        self.view_graph_for_draw = view_graph
+        self.deadlocked_sccs_for_draw = view_sccs
+        self.graph_G = view_graph.to_networkx()
+        self.graph_pos = positions_to_dict(view_graph, coords)
+        self._layout_key = None
+        self.spatial_index = SpatialGridIndex(self.graph_pos)
+        self._hovered_node = None
+        self.draw_graph_visual(self.view_graph_for_draw, self.cycle_nodes_for_draw,
+                               recalculate_layout_and_graph=False, deadlocked_sccs=self.deadlocked_sccs_for_draw)
+
+    # --- Автоанализ при правке текста ---
+    def on_auto_analyze_toggled(self):
+        if self.auto_analyze_var.get():
+            self._schedule_auto_analysis(0)
+        else:
+            self._text_model = None
+            if self._auto_analysis_id is not None:
+                self.master.after_cancel(self._auto_analysis_id)
+                self._auto_analysis_id = None
+
+    def _on_input_modified(self, event=None):
+        # <<Modified>> приходит только при смене флага, поэтому флаг сразу сбрасывается
+        if not self.input_area.edit_modified():
+            return
+        self.input_area.edit_modified(False)
+        if self.auto_analyze_var.get():
+            self._schedule_auto_analysis()
+
+    def _schedule_auto_analysis(self, delay_ms=AUTO_ANALYZE_DELAY_MS):
+        # Каждая правка лишь откладывает анализ: серия нажатий дает один пересчет
+        if self._auto_analysis_id is not None:
+            self.master.after_cancel(self._auto_analysis_id)
+        self._auto_analysis_id = self.master.after(delay_ms, self._run_auto_analysis)
+
+    def _run_auto_analysis(self):
+        self._auto_analysis_id = None
+        if not self.auto_analyze_var.get() or self._live_stop_event is not None:
+            return
+        if self._analysis_cancel_event is not None:
+            return  # Правки подхватит _poll_analysis_queue, когда полный анализ закончится
+        input_text = self.input_area.get("1.0", tk.END)
+        # Сжатый вид рисует компоненты, а не процессы, - его правки пересчитываются целиком
+        if self._text_model is None or self.condensed_view_var.get() or \
+                (VISUALIZATION_ENABLED and self.graph_G is None):
+            self.start_analysis(('text', input_text))
+            return
+        self._apply_text_edit(input_text)
+
+    def _apply_text_edit(self, input_text):
+        # Правка доходит до модели текста и затронутых artists холста; раскладка не пересчитывается
+        started = time.perf_counter()
+        lines = input_text.split('\n')
+        edit = self._text_model.update(lines)
+        self._last_analysis_source = ('text', input_text)
+        # Директивы '#@cost' - комментарии, в правку графа не попадают: их изменение проверяется отдельно
+        costs = parse_wfg_costs(line for line in lines if COST_DIRECTIVE in line)
+        costs_changed = costs != self._resolution_costs
+        self._resolution_costs = costs
+        if edit:
+            self._invalidate_reachability()
+            self._record_history(edit.added, edit.removed, "Правка")
+            if edit.deadlocks_changed:
+                self.deadlocked_sccs_for_draw = self._text_model.graph.deadlocked_sccs()
+                self._show_incremental_result(self._text_model.graph)
+            elif costs_changed:
+                self._show_incremental_result(self._text_model.graph)
+            if VISUALIZATION_ENABLED:
+                if self.spatial_index is None:  # Был нарисован пустой граф
+                    self.spatial_index = SpatialGridIndex({}, cell_size=LIVE_NODE_SPACING)
+                self._layout_key = None  # Картинка больше не совпадает с раскладкой из кэша
+                self._patch_live_canvas(LiveDelta(edit.added, edit.removed), edit.deadlocks_changed or costs_changed,
+                                        follow_view=False)
+        elif costs_changed and self.deadlocked_sccs_for_draw:
+            self._show_incremental_result(self._text_model.graph)
+            self._redraw_query_highlight()
+        status = (f"Автоанализ: +{len(edit.added)} / -{len(edit.removed)} зависимостей за "
+                  f"{format_seconds(time.perf_counter() - started)}")
+        if self._text_model.error_count:
+            status += f", некорректных строк {self._text_model.error_count}"
+            if edit.errors:
+                line_number, _, reason = edit.errors.samples[0]
+                status += f" (строка {line_number}: {reason})"
+        self._set_progress(0.0, status)
+
+    def _show_incremental_result(self, graph):
+        # graph - IncrementalWFG показанного графа (модель текста или состояние истории)
+        sccs = self.deadlocked_sccs_for_draw
+        self._reset_cycle_paging()
+        if not sccs:
+            self.cycle_nodes_for_draw = None
+            self._set_resolution_plan(None)
+            self.display_result("Тупиков не обнаружено.", self.success_color_fg)
+            return
+        # План строится по подграфу тупиков: ребра вне компонент циклов не образуют
+        deadlocked_graph = graph.to_graph(node for component in sccs for node in component)
+        plan = plan_resolution_by_names(deadlocked_graph, sccs, self._resolution_costs)
+        self._set_resolution_plan(plan)
+        result_lines = [f"ОБНАРУЖЕН ТУПИК! Компонент с циклами: {len(sccs)}"]
+        for number, component in enumerate(sccs[:AUTO_RESULT_MAX_COMPONENTS], start=1):
+            cycle = graph.cycle_in_component(component)
+            if number == 1:
+                self.cycle_nodes_for_draw = cycle
+            result_lines.append(f"{number}. Процессов: {len(component)}. Цикл: "
+                                + " -> ".join(cycle) + " -> " + cycle[0])
+        if len(sccs) > AUTO_RESULT_MAX_COMPONENTS:
+            result_lines.append(f"... и еще компонент: {len(sccs) - AUTO_RESULT_MAX_COMPONENTS}")
+        result_lines.append(self._resolution_line(plan.summary(), plan.victims))
+        self.display_result("\n".join(result_lines), self.error_color_fg)
+        # Циклы есть только внутри тупиковых компонент - перебору хватает их подграфа
+        self._cycle_summary = result_lines[0]
+        self._cycle_iterator = iter_deadlock_cycles(deadlocked_graph,
+                                                    max_cycles=CYCLE_ENUM_MAX_CYCLES,
+                                                    max_length=CYCLE_ENUM_MAX_LENGTH,
+                                                    time_limit=CYCLE_ENUM_TIME_LIMIT)
+        self._update_cycle_nav()
+
+    # --- История состояний и шкала времени ---
+    def _record_analysis_history(self, parsed_graph, condensed_view, reduction):
+        # Полный анализ - новое состояние истории: ребра сравниваются с последним состоянием
+        source_kind, source_value = self._last_analysis_source
+        history = self.history
+        index = None
+        if source_kind == 'history':  # Показано прошлое состояние, само оно в истории уже есть
+            index = source_value[0]
+            self._history_view_index = None if index == history.last_index else index
+        elif parsed_graph is None or reduction is not None or parsed_graph.edge_count > HISTORY_MAX_EDGES:
+            # Граф ресурсов - двудольный, не граф ожидания; слишком большой граф дорого сравнивать.
+            # Правки такого графа в историю не пишутся: их не с чем сравнить
+            self._history_tracking = False
+            self._history_view_index = None
+        else:
+            names = parsed_graph.names
+            label = {'text': "Анализ текста", 'file': "Файл", 'snapshot': "Снимок"}.get(source_kind, "Анализ")
+            history.record_edges(((names[source], names[target]) for source, target in parsed_graph.edges()), label)
+            self._history_tracking = True
+            self._history_view_index = None
+            index = history.last_index
+        self._history_shown = index if condensed_view is None else None
+        self._update_timeline()
+
+    def _record_history(self, added, removed, label):
+        # Дельта текущего графа (правка текста, события мониторинга) - новое состояние истории
+        if not self._history_tracking:
+            return
+        if self.history.record(added, removed, label) is not None and self._history_view_index is None \
+                and self._history_shown is not None:
+            self._history_shown = self.history.last_index
+        self._update_timeline()
+
+    def _history_displayed_index(self):
+        return self._history_view_index if self._history_view_index is not None else self.history.last_index
+
+    def _update_timeline(self):
+        history = self.history
+        if not len(history):
+            self.timeline_scale.config(from_=0, to=0)
+            self.timeline_scale.set(0)
+            self.timeline_scale.config(state=tk.DISABLED)
+            self.latest_state_button.config(state=tk.DISABLED)
+            self.timeline_label.config(text="")
+            return
+        index = self._history_displayed_index()
+        self.timeline_scale.config(state=tk.NORMAL, from_=history.first_index, to=history.last_index)
+        self.timeline_scale.set(max(index, history.first_index))
+        self.latest_state_button.config(state=tk.DISABLED if self._history_view_index is None else tk.NORMAL)
+        if index < history.first_index:
+            self.timeline_label.config(text="Показанное состояние уже вытеснено из истории")
+            return
+        state = history.state(index)
+        self.timeline_label.config(
+            text=f"{index - history.first_index + 1}/{len(history)} "
+                 f"{time.strftime('%H:%M:%S', time.localtime(state.time))} {state.label}: "
+                 f"+{len(state.added)} / -{len(state.removed)}, зависимостей {state.edge_count}"
+                 + ("" if self._history_view_index is None else " (прошлое)"))
+
+    def _on_timeline_moved(self, value):
+        # Шкала сообщает о каждом сдвиге ползунка; перемотка выполняется в простое, к последней позиции
+        target = int(float(value))
+        if target == self._history_displayed_index():
+            return  # Ползунок выставлен программно или вернулся на показанное состояние
+        self._scrub_target = target
+        if self._scrub_id is None:
+            self._scrub_id = self.master.after_idle(self._apply_scrub)
+
+    def show_latest_state(self):
+        if len(self.history):
+            self._scrub_target = self.history.last_index
+            self._apply_scrub()
+
+    def _apply_scrub(self):
+        # Перемотка к состоянию _scrub_target: граф меняется дельтами истории, холст - как при правке текста
+        self._scrub_id = None
+        history = self.history
+        index = self._scrub_target
+        if not history.first_index <= index <= history.last_index or index == self._history_displayed_index():
+            return
+        cursor = self._history_cursor
+        shown = self._history_shown
+        if cursor.index is not None and cursor.index != shown:
+            cursor.detach()  # Граф курсора - не тот, что показан: дельты считаются от показанного состояния
+        if shown is None or (cursor.index is None and shown < history.first_index):
+            # Показан не граф процессов состояния (сжатый вид, граф ресурсов) - полный анализ состояния,
+            # граф которого собирается из истории без разбора текста
+            self.start_analysis(('history', (index, history.graph_at(index))))
+            return
+        if self._analysis_cancel_event is not None:
+            self.cancel_analysis()
+        started = time.perf_counter()
+        edit, rebuilt = cursor.seek(index, shown)
+        self._history_shown = index
+        self._history_view_index = None if index == history.last_index else index
+        self._text_model = None  # Показанный граф больше не совпадает с текстом: правка запустит полный анализ
+        self._invalidate_reachability()
+        self.deadlocked_sccs_for_draw = cursor.graph.deadlocked_sccs()
+        self._show_incremental_result(cursor.graph)
+        if self._live_stop_event is not None:
+            self._live_victims = self.resolution_plan.victims if self.resolution_plan is not None else []
+        if VISUALIZATION_ENABLED and self.graph_G is not None:
+            if self.spatial_index is None:  # Был нарисован пустой граф
+                self.spatial_index = SpatialGridIndex({}, cell_size=LIVE_NODE_SPACING)
+            self._layout_key = None
+            self._patch_live_canvas(LiveDelta(edit.added, edit.removed), edit.deadlocks_changed, follow_view=False)
+        self._update_timeline()
+        self._set_progress(0.0, f"История: +{len(edit.added)} / -{len(edit.removed)} зависимостей за "
+                                f"{format_seconds(time.perf_counter() - started)}"
+                                + (" (граф собран от контрольной точки)" if rebuilt else ""))
+
+    # --- Живой мониторинг событий WAIT/RELEASE ---
+    def toggle_live_monitor(self):
+        if self._live_stop_event is not None:
+            self.stop_live_monitor()
+            return
+        spec = simpledialog.askstring("Живой Мониторинг",
+                                      "Файл журнала событий WAIT/RELEASE или unix:/путь/к/сокету:",
+                                      initialvalue=self._live_source_spec, parent=self.master)
+        if spec and spec.strip():
+            self.start_live_monitor(spec.strip())
+
+    def start_live_monitor(self, spec):
+        # Граф строится с нуля по событиям; IncrementalWFG живет в читающем потоке, сюда приходят только дельты
+        self.cancel_analysis()
+        self.stop_live_monitor()
+        self._live_source_spec = spec
+        self._live_stop_event = threading.Event()
+        self._live_pending = []
+        self._live_recent_cycles.clear()
+        self._live_victims = []
+        self._reset_cycle_paging()
+        self._invalidate_reachability()
+        self._set_resolution_plan(None)
+        self.resource_nodes = set()
+        self._text_model = None
+        self._live_spiral_index = 0
+        self._live_auto_limits = None
+        self._remembered_pos = {}
+        self.lod_edge_threshold = min(LOD_EDGE_THRESHOLD, LIVE_LOD_EDGE_THRESHOLD)
+        self.parsed_graph_for_draw = None
+        self.view_graph_for_draw = None
+        self.condensation = None
+        self._expanded_groups = set()
+        self._collapsed_sizes = {}
+        self._last_analysis_source = None
+        self.cycle_nodes_for_draw = None
+        self.deadlocked_sccs_for_draw = []
+        self._layout_key = None
+        self.analysis_timings = None
+        self._hovered_node = None
+        if self._ensure_graph_view():
+            self.graph_G = nx.DiGraph()
+            self.graph_pos = {}
+            self.spatial_index = SpatialGridIndex({}, cell_size=LIVE_NODE_SPACING)
+            self.draw_graph_visual(self.graph_G, None, recalculate_layout_and_graph=False)
+
+        # Мониторинг начинается с пустого графа - это тоже состояние истории
+        self.history.record_edges((), "Мониторинг")
+        self._history_tracking = True
+        self._history_shown = self.history.last_index
+        self._history_view_index = None
+        self._update_timeline()
+        threading.Thread(target=self._live_worker, args=(spec, self._live_stop_event), daemon=True).start()
+        self.live_button.config(text="Остановить Мониторинг")
+        self._set_progress(0.0, f"Мониторинг: {spec}")
+        self.display_result("Мониторинг запущен. Тупиков нет.", self.success_color_fg)
+        self._live_poll_id = self.master.after(LIVE_POLL_MS, self._poll_live_queue)
+
+    def stop_live_monitor(self):
+        if self._live_stop_event is None:
+            return
+        self._live_stop_event.set()
+        self._live_stop_event = None
+        if self._live_poll_id is not None:
+            self.master.after_cancel(self._live_poll_id)
+            self._live_poll_id = None
+        if self._live_pending:
+            self._apply_live_delta(merge_deltas(self._live_pending))
+            self._live_pending = []
+        self.live_button.config(text="Живой Мониторинг")
+        self._set_progress(0.0, "Мониторинг остановлен.")
+        self.lod_edge_threshold = LOD_EDGE_THRESHOLD
+        if VISUALIZATION_ENABLED and self.graph_G is not None and self.graph_G.number_of_edges():
+            # Итоговый граф становится обычным результатом: повторный анализ раскладывает его от этой картинки
+            builder = WFGraphBuilder()
+            for waiter, holder in self.graph_G.edges():
+                builder.add_edge(waiter, holder)
+            self.parsed_graph_for_draw = self.view_graph_for_draw = builder.build()
+
+    def _live_worker(self, spec, stop_event):
+        def post(kind, payload):
+            self._live_queue.put((stop_event, kind, payload))
+
+        try:
+            run_live_reader(open_event_source(spec, stop_event), LiveMonitor(), lambda delta: post('delta', delta),
+                            stop_event)
+        except OSError as exc:
+            post('error', ("Ошибка Мониторинга", f"Не удалось открыть источник '{spec}':\n{exc}"))
+        except Exception as exc:  # Иначе мониторинг молча остановится
+            post('error', ("Ошибка Мониторинга", f"{type(exc).__name__}: {exc}"))
+
+    def _poll_live_queue(self):
+        # Все дельты, накопившиеся с прошлого тика, применяются одной: интерфейс не отстает от потока
+        # событий, при большой нагрузке он просто обновляется реже
+        self._live_poll_id = None
+        while True:
+            try:
+                stop_event, kind, payload = self._live_queue.get_nowait()
+            except queue.Empty:
+                break
+            if stop_event is not self._live_stop_event:
+                continue  # Сообщение остановленного запуска
+            if kind == 'error':
+                title, message = payload
+                self.stop_live_monitor()
+                messagebox.showerror(title, message)
+                return
+            self._live_pending.append(payload)
+        if self._live_pending and self.dragged_node_id is None:  # Во время перетаскивания холст не трогаем
+            self._apply_live_delta(merge_deltas(self._live_pending))
+            self._live_pending = []
+        if self._live_stop_event is not None:
+            self._live_poll_id = self.master.after(LIVE_POLL_MS, self._poll_live_queue)
+
+    def _apply_live_delta(self, delta):
+        if delta.cycles:
+            self._live_recent_cycles.extend(delta.cycles)
+            self.master.bell()  # Тупик замечен сразу, даже если окно не в фокусе внимания
+        if delta.added or delta.removed:
+            self._record_history(delta.added, delta.removed, "Мониторинг")
+        if self._history_view_index is not None:
+            # Показано прошлое состояние: события только пишутся в историю, "Сейчас" покажет итог
+            self._set_progress(0.0, f"Мониторинг (просмотр истории): процессов {delta.node_count}, "
+                                    f"ожиданий {delta.edge_count}")
+            return
+        deadlocks_changed = delta.deadlocked_sccs is not None and delta.deadlocked_sccs != self.deadlocked_sccs_for_draw
+        if deadlocks_changed:
+            self.deadlocked_sccs_for_draw = delta.deadlocked_sccs
+            self.victim_nodes = set(delta.victims or ())
+            self._live_victims = delta.victims or []
+        if delta.cycles or deadlocks_changed:
+            if self.deadlocked_sccs_for_draw:
+                result_lines = [f"ОБНАРУЖЕН ТУПИК! Компонент с циклами: {len(self.deadlocked_sccs_for_draw)}"]
+                result_lines.extend("Цикл: " + " -> ".join(cycle) + " -> " + cycle[0]
+                                    for cycle in reversed(self._live_recent_cycles))
+                result_lines.append(self._resolution_line(f"снять процессов: {len(self._live_victims)}",
+                                                          self._live_victims))
+                self.display_result("\n".join(result_lines), self.error_color_fg)
+            else:
+                self.display_result("Тупиков нет (все циклы распались).", self.success_color_fg)
+        self._set_progress(0.0, f"Мониторинг: процессов {delta.node_count}, ожиданий {delta.edge_count}, "
+                                f"тупиков {len(self.deadlocked_sccs_for_draw)}"
+                                + (f", некорректных строк {delta.errors}" if delta.errors else ""))
+        if VISUALIZATION_ENABLED:
+            self._patch_live_canvas(delta, deadlocks_changed)
+
+    def _live_place_node(self, node, neighbor):
+        # Вершина, уже бывшая на холсте (перемотка истории, повторное ожидание), - на прежнее место.
+        # Иначе рядом с уже размещенным соседом или на раскручивающейся спирали (вершины не наслаиваются).
+        # Шаг - размер ячейки пространственного индекса, то есть типичное расстояние между вершинами
+        spacing = self.spatial_index.cell_size
+        position = self._remembered_pos.pop(node, None)
+        if position is None and neighbor in self.graph_pos:
+            angle = random.uniform(0.0, 2.0 * math.pi)
+            neighbor_x, neighbor_y = self.graph_pos[neighbor]
+            position = (neighbor_x + spacing * math.cos(angle),
+                        neighbor_y + spacing * math.sin(angle))
+        elif position is None:
+            self._live_spiral_index += 1
+            radius = spacing * 1.5 * math.sqrt(self._live_spiral_index)
+            angle = self._live_spiral_index * 2.399963  # Золотой угол
+            position = (radius * math.cos(angle), radius * math.sin(angle))
+        self.graph_pos[node] = position
+        self.spatial_index.add(node, *position)
+
+    def _patch_live_canvas(self, delta, deadlocks_changed, follow_view=True):
+        # На холсте меняются только затронутые вершины и ребра; полная перерисовка - только при смене
+        # режима детализации. follow_view - подгонять вид под растущий граф, пока зум не трогали
+        graph_G = self.graph_G
+        added = [edge for edge in delta.added if not graph_G.has_edge(*edge)]
+        removed = [edge for edge in delta.removed if graph_G.has_edge(*edge)]
+        if not (added or removed or deadlocks_changed):
+            return
+        new_nodes = []
+        for waiter, holder in added:
+            for node, neighbor in ((waiter, holder), (holder, waiter)):
+                if node not in self.graph_pos:
+                    self._live_place_node(node, neighbor)
+                    new_nodes.append(node)
+        graph_G.add_edges_from(added)
+        graph_G.remove_edges_from(removed)
+        gone_nodes = {node for edge in removed for node in edge if node in graph_G and graph_G.degree(node) == 0}
+        graph_G.remove_nodes_from(gone_nodes)
+        remembered = self._remembered_pos
+        for node in gone_nodes:
+            remembered[node] = self.graph_pos.pop(node)
+            self.spatial_index.remove(node)
+        while len(remembered) > REMEMBERED_POS_MAX:
+            del remembered[next(iter(remembered))]  # Самые давно исчезнувшие
+        if self._hovered_node in gone_nodes:
+            self._hovered_node = None
+
+        auto_view = follow_view and (self._live_auto_limits is None or
+                                     self._live_auto_limits == (self.ax.get_xlim(), self.ax.get_ylim()))
+        lod_wanted = graph_G.number_of_edges() > self.lod_edge_threshold
+        if self._node_collection is None or lod_wanted != self._lod_mode:
+            self.draw_graph_visual(graph_G, None, recalculate_layout_and_graph=False,
+                                   deadlocked_sccs=self.deadlocked_sccs_for_draw)
+        else:
+            self._patch_live_nodes(new_nodes, gone_nodes, deadlocks_changed)
+            self._patch_live_edges(added, removed, deadlocks_changed)
+            self._apply_culling(redraw=False)
+            self.canvas.draw_idle()
+        if auto_view and graph_G.number_of_nodes():
+            self._fit_live_view()
+
+    def _fit_live_view(self):
+        # Пока пользователь не менял зум, вид следует за растущим графом
+        coords = self.spatial_index.coords
+        margin = LIVE_NODE_SPACING
+        (x0, y0), (x1, y1) = coords.min(axis=0) - margin, coords.max(axis=0) + margin
+        self.ax.set_xlim(x0, x1)
+        self.ax.set_ylim(y0, y1)
+        self._live_auto_limits = (self.ax.get_xlim(), self.ax.get_ylim())
+        self._last_valid_xlim_for_redraw, self._last_valid_ylim_for_redraw = self._live_auto_limits
+        self.canvas.draw_idle()
+
+    def _live_deadlocked_nodes(self):
+        return {node for component in self.deadlocked_sccs_for_draw or () for node in component}
+
+    def _patch_live_nodes(self, new_nodes, gone_nodes, deadlocks_changed):
+        # Данные вершин в порядке отрисовки (из них _apply_culling собирает видимую часть коллекции)
+        deadlocked_nodes = self._live_deadlocked_nodes()
+        victim_nodes = self.victim_nodes
+        default_rgba = matplotlib.colors.to_rgba(self.node_color_default, 0.95)
+        cycle_rgba = matplotlib.colors.to_rgba(self.node_color_cycle, 0.95)
+        victim_rgba = matplotlib.colors.to_rgba(self.node_color_victim, 0.95)
+
+        def node_rgba(node):
+            if node in victim_nodes:
+                return victim_rgba
+            return cycle_rgba if node in deadlocked_nodes else default_rgba
+
+        nodes = list(self._node_draw_index)
+        face_colors, edge_colors, sizes = self._node_face_colors, self._node_edge_colors, self._node_sizes
+        if gone_nodes:
+            keep = np.array([node not in gone_nodes for node in nodes], dtype=bool)
+            nodes = [node for node in nodes if node not in gone_nodes]
+            face_colors, edge_colors, sizes = face_colors[keep], edge_colors[keep], sizes[keep]
+            for node in gone_nodes:
+                label = self._label_artists.pop(node, None)
+                if label is not None:
+                    label.remove()
+        if new_nodes:
+            nodes.extend(new_nodes)
+            edge_rgba = edge_colors[0] if len(edge_colors) else matplotlib.colors.to_rgba('black', 0.95)
+            face_colors = np.vstack((face_colors, [node_rgba(node) for node in new_nodes]))
+            edge_colors = np.vstack((edge_colors, np.tile(edge_rgba, (len(new_nodes), 1))))
+            base_node_size = self.lod_node_size if self._lod_mode else self.node_size_val
+            sizes = np.concatenate((sizes, np.full(len(new_nodes), base_node_size, dtype=float)))
+            if not self._lod_mode:
+                self._label_artists.update(nx.draw_networkx_labels(
+                    self.graph_G, self.graph_pos, labels={node: node for node in new_nodes}, ax=self.ax,
+                    font_size=9, font_weight="bold", font_color="black"))
+        if deadlocks_changed:
+            face_colors = np.array([node_rgba(node) for node in nodes], dtype=float).reshape(-1, 4)
+        self._node_draw_index = {node: index for index, node in enumerate(nodes)}
+        self._node_face_colors, self._node_edge_colors, self._node_sizes = face_colors, edge_colors, sizes
+
+    def _patch_live_edges(self, added, removed, deadlocks_changed):
+        scc_id_by_node = {node: scc_id for scc_id, component in enumerate(self.deadlocked_sccs_for_draw or ())
+                          for node in component}
+
+        def in_deadlock(edge):
+            return edge[0] in scc_id_by_node and scc_id_by_node[edge[0]] == scc_id_by_node.get(edge[1])
+
+        removed_set = set(removed)
+        if self._lod_mode and deadlocks_changed:
+            removed_set = {edge for edge, _ in self._edge_patches}  # Кривые тупиков уходят в общую коллекцию
+        if removed_set:
+            for edge, patch in self._edge_patches:
+                if edge in removed_set:
+                    patch.remove()
+            self._edge_patches = [(edge, patch) for edge, patch in self._edge_patches if edge not in removed_set]
+            for node in {node for edge in removed_set for node in edge}:
+                remaining = [(edge, patch) for edge, patch in self._edge_artists_by_node.get(node, ())
+                             if edge not in removed_set]
+                if remaining:
+                    self._edge_artists_by_node[node] = remaining
+                else:
+                    self._edge_artists_by_node.pop(node, None)
+
+        if self._lod_mode:
+            # Все изменившиеся ребра - в общей коллекции, ребра тупиков - ее красными штрихами
+            if deadlocks_changed:
+                edges = list(self.graph_G.edges())
+            else:
+                edges = [edge for edge in (self._lod_edges['edges'] if self._lod_edges is not None else ())
+                         if edge not in removed_set] + added
+            patched = {edge for edge, _ in self._edge_patches}
+            edges = [edge for edge in edges if edge not in patched]
+            self._draw_lod_edges([edge for edge in edges if not in_deadlock(edge)],
+                                 [edge for edge in edges if in_deadlock(edge)],
+                                 self._lod_edges['collection'] if self._lod_edges is not None else None)
+            return
+
+        if deadlocks_changed:  # Стиль стрелок, вошедших в тупик или вышедших из него
+            for edge, patch in self._edge_patches:
+                deadlocked = in_deadlock(edge)
+                patch.set_color(self.edge_color_cycle if deadlocked else self.edge_color_default)
+                patch.set_linestyle('dashed' if deadlocked else 'solid')
+                patch.set_linewidth(2.5 if deadlocked else 1.5)
+                patch.set_mutation_scale(25 if deadlocked else 20)
+        base_node_size = self.node_size_val
+        for edgelist, style in (([edge for edge in added if not in_deadlock(edge)],
+                                 dict(edge_color=self.edge_color_default, width=1.5, arrowsize=20)),
+                                ([edge for edge in added if in_deadlock(edge)],
+                                 dict(edge_color=self.edge_color_cycle, width=2.5, arrowsize=25, style='dashed'))):
+            if edgelist:
+                edge_artists = nx.draw_networkx_edges(self.graph_G, self.graph_pos, ax=self.ax, edgelist=edgelist,
+                                                      node_size=base_node_size, connectionstyle='arc3,rad=0.15',
+                                                      **style)
+                self._register_edge_artists(edgelist, edge_artists)
 
     def clear_all(self):
+        self.stop_live_monitor()
+        self.cancel_analysis()
         self.input_area.delete("1.0", tk.END)
         self.input_area.insert(tk.END,
                                "# Пример с тупиком:\nP1 -> P2\nP2 -> P3\nP3 -> P1\nP4 -> P1\n\n# Пример без тупика:\nA -> B\nB -> C\nX -> Y")
         self.display_result("", self.info_color_fg)
 
         self.parsed_graph_for_draw = None
+        self.view_graph_for_draw = None
+        self.condensation = None
+        self._expanded_groups = set()
+        self._collapsed_sizes = {}
+        self._last_analysis_source = None
         self.cycle_nodes_for_draw = None
+        self._reset_cycle_paging()
+        self._invalidate_reachability()
+        self._set_resolution_plan(None)
+        self.resource_nodes = set()
+        self._text_model = None
+        self.history.clear()
+        self._history_cursor.detach()
+        self._history_tracking = False
+        self._history_shown = self._history_view_index = None
+        self._update_timeline()
+        self._remembered_pos = {}
+        self.deadlocked_sccs_for_draw = None
         self.graph_G = None  # Сбрасываем объект графа
         self.graph_pos = None  # Сбрасываем позиции
+        self._layout_key = None
+        self.spatial_index = None
         self.dragged_node_id = None  # Сбрасываем перетаскиваемую вершину
+        self.analysis_timings = None
+        self._render_pending = False
 
         if VISUALIZATION_ENABLED:
             if hasattr(self, '_last_valid_xlim_for_redraw'):  # Сбрасываем сохраненные пределы
@@ -653,6 +2373,27 @@ class DeadlockApp:
             self.draw_graph_visual(None, None, recalculate_layout_and_graph=True)
         self.input_area.focus_set()
 
+    def _get_detect_executor(self):
+        # Вызывается из рабочего потока. Пул живет до закрытия окна: процессы spawn запускаются
+        # (и импортируют модули) один раз, а не при каждом анализе
+        with self._detect_executor_lock:
+            if self._detect_executor is None:
+                self._detect_executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+            return self._detect_executor
+
+    def on_close(self):
+        self.stop_live_monitor()
+        self.cancel_analysis()
+        with self._detect_executor_lock:
+            if self._detect_executor is not None:
+                self._detect_executor.shutdown(wait=False, cancel_futures=True)
+        if self.layout_cache is not None:
+            try:
+                self.layout_cache.save()
+            except OSError as exc:  # Закрытию окна это не мешает
+                print(f"Не удалось сохранить кэш раскладок: {exc}")
+        self.master.destroy()
+
 
 if __name__ == "__main__":  # pragma: no cover
     root = tk.Tk()
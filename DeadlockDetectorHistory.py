@@ -0,0 +1,250 @@
+"""История состояний графа ожидания для перемотки во времени.
+
+Каждое состояние хранится как дельта к предыдущему: появившиеся и исчезнувшие ребра
+(ожидающий, удерживающий). Полное множество ребер сохраняется только в контрольных точках,
+и точки разделяют память: ребра разложены по BUCKET_COUNT корзинам по хешу ожидающего,
+корзина - frozenset, а контрольная точка - кортеж корзин. Новая точка заново замораживает
+только корзины, измененные с прошлой точки, остальные берет из прошлой как есть. Точка
+ставится, когда с прошлой изменилась заметная доля ребер (или накопилось CHECKPOINT_INTERVAL
+состояний): восстановление любого состояния стоит одной точки и дельт не больше доли графа,
+а память растет с объемом изменений, а не с числом состояний.
+
+HistoryCursor перематывает IncrementalWFG между состояниями: на близкие состояния - только
+дельтами (обратный ход - те же дельты наоборот), на далекие - от ближайшей контрольной точки.
+Текст при этом заново не разбирается. Только стандартная библиотека, как и DeadlockDetectorCore.
+"""
+import time
+from bisect import bisect_right
+
+from DeadlockDetectorCore import IncrementalWFG, WFGParseErrors, WFGraphBuilder, WFGTextEdit
+
+CHECKPOINT_INTERVAL = 1024  # Состояний между контрольными точками (не больше)
+CHECKPOINT_CHANGE_SHARE = 0.25  # Точка ставится раньше, если изменилось столько ребер от текущего числа
+CHECKPOINT_MIN_CHANGES = 1024  # ... но не меньше этого: на маленьких графах дельты и так короткие
+MAX_STATES = 10_000  # Старые состояния отбрасываются от начала, до ближайшей контрольной точки
+BUCKET_COUNT = 1024  # Корзин в контрольной точке (степень двойки)
+
+_EMPTY_BUCKET = frozenset()
+
+
+class HistoryState:
+    # Одно состояние истории: дельта к предыдущему и подпись для шкалы времени
+    __slots__ = ('time', 'label', 'added', 'removed', 'edge_count', 'changes_total')
+
+    def __init__(self, timestamp, label, added, removed, edge_count, changes_total):
+        self.time = timestamp
+        self.label = label
+        self.added = added  # Появившиеся ребра (кортеж)
+        self.removed = removed  # Исчезнувшие ребра (кортеж)
+        self.edge_count = edge_count  # Ребер в графе после этого состояния
+        self.changes_total = changes_total  # Изменений ребер с начала истории: разность - цена перемотки
+
+
+class WFGHistory:
+    # Последовательность состояний с абсолютными номерами: first_index..last_index.
+    # Номера не сдвигаются при отбрасывании старых состояний
+    def __init__(self, checkpoint_interval=CHECKPOINT_INTERVAL, max_states=MAX_STATES,
+                 bucket_count=BUCKET_COUNT):
+        if bucket_count & (bucket_count - 1):
+            raise ValueError("Число корзин должно быть степенью двойки.")
+        self.checkpoint_interval = checkpoint_interval
+        self.max_states = max(max_states, checkpoint_interval + 1)
+        self._mask = bucket_count - 1
+        self.clear()
+
+    def clear(self):
+        self._states = []
+        self._first = 0  # Абсолютный номер _states[0]
+        self._head = [set() for _ in range(self._mask + 1)]  # Ребра последнего состояния по корзинам
+        self._frozen = (_EMPTY_BUCKET,) * (self._mask + 1)  # Корзины последней контрольной точки
+        self._dirty = set()  # Корзины, измененные после последней точки
+        self._changes = 0  # Изменений ребер после последней точки
+        self._changes_total = 0
+        self._checkpoints = {}  # Номер состояния -> кортеж корзин
+        self._checkpoint_indexes = []  # Номера контрольных точек по возрастанию
+        self.edge_count = 0
+
+    def __len__(self):
+        return len(self._states)
+
+    @property
+    def first_index(self):
+        return self._first
+
+    @property
+    def last_index(self):
+        # Номер последнего состояния; -1 - история пуста
+        return self._first + len(self._states) - 1
+
+    def state(self, index):
+        return self._states[index - self._first]
+
+    def edges(self):
+        # Ребра последнего состояния (новое множество)
+        return set().union(*self._head)
+
+    def record(self, added, removed, label=""):
+        # Новое состояние по дельте к последнему. Ребра, которых нет (или которые уже есть), отбрасываются.
+        # Как в WFGTextModel.update, освобождения идут первыми: ребро из обоих списков остается в графе.
+        # Номер состояния или None, если граф не изменился (первое состояние записывается всегда)
+        head, mask = self._head, self._mask
+        added = dict.fromkeys(added)
+        removed = tuple(edge for edge in dict.fromkeys(removed)
+                        if edge not in added and edge in head[hash(edge[0]) & mask])
+        added = tuple(edge for edge in added if edge not in head[hash(edge[0]) & mask])
+        if not added and not removed and self._states:
+            return None
+        dirty = self._dirty
+        for edge in removed:
+            bucket = hash(edge[0]) & mask
+            head[bucket].discard(edge)
+            dirty.add(bucket)
+        for edge in added:
+            bucket = hash(edge[0]) & mask
+            head[bucket].add(edge)
+            dirty.add(bucket)
+        changes = len(added) + len(removed)
+        self.edge_count += len(added) - len(removed)
+        self._changes += changes
+        self._changes_total += changes
+        self._states.append(HistoryState(time.time(), label, added, removed, self.edge_count,
+                                         self._changes_total))
+        index = self.last_index
+        if (not self._checkpoint_indexes or index - self._checkpoint_indexes[-1] >= self.checkpoint_interval
+                or self._changes >= max(CHECKPOINT_MIN_CHANGES, CHECKPOINT_CHANGE_SHARE * self.edge_count)):
+            self._checkpoint(index)
+        if len(self._states) > self.max_states:
+            self._trim()
+        return index
+
+    def record_edges(self, edges, label=""):
+        # Новое состояние по полному набору ребер (например, после полного анализа): дельта считается здесь
+        edges = set(edges)
+        current = self.edges()
+        return self.record(edges - current, current - edges, label)
+
+    def edges_at(self, index):
+        # Множество ребер состояния index: ближайшая контрольная точка не позже него плюс дельты
+        if not self._first <= index <= self.last_index:
+            raise IndexError(f"Состояния {index} нет в истории.")
+        checkpoint = self._checkpoint_indexes[bisect_right(self._checkpoint_indexes, index) - 1]
+        edges = set().union(*self._checkpoints[checkpoint])
+        states, first = self._states, self._first
+        for position in range(checkpoint + 1 - first, index + 1 - first):
+            state = states[position]
+            edges.difference_update(state.removed)
+            edges.update(state.added)
+        return edges
+
+    def graph_at(self, index):
+        # WFGraph состояния index - для полного анализа (сжатый вид)
+        builder = WFGraphBuilder()
+        for waiter, holder in self.edges_at(index):
+            builder.add_edge(waiter, holder)
+        return builder.build()
+
+    def _checkpoint(self, index):
+        # Неизмененные корзины - те же frozenset, что в прошлой точке (структурное разделение)
+        buckets = list(self._frozen)
+        head = self._head
+        for bucket in self._dirty:
+            buckets[bucket] = frozenset(head[bucket]) if head[bucket] else _EMPTY_BUCKET
+        self._frozen = tuple(buckets)
+        self._checkpoints[index] = self._frozen
+        self._checkpoint_indexes.append(index)
+        self._dirty = set()
+        self._changes = 0
+
+    def _trim(self):
+        # Отбрасываются состояния до второй контрольной точки: новое первое состояние - точка
+        while len(self._states) > self.max_states and len(self._checkpoint_indexes) > 1:
+            dropped = self._checkpoint_indexes.pop(0)
+            del self._checkpoints[dropped]
+            new_first = self._checkpoint_indexes[0]
+            del self._states[:new_first - self._first]
+            self._first = new_first
+
+
+class HistoryCursor:
+    # Граф (IncrementalWFG) одного состояния истории. index None - курсор "отцеплен": показан
+    # последний граф, который хранит не курсор, а вызывающий код (текстовая модель, живой монитор)
+    def __init__(self, history):
+        self.history = history
+        self.index = None
+        self.edges = None  # Ребра показанного состояния (None у отцепленного курсора)
+        self.graph = None
+
+    def detach(self):
+        self.index = None
+        self.edges = None
+        self.graph = None
+
+    def seek(self, index, shown=None):
+        # Переход к состоянию index -> (WFGTextEdit относительно показанного до этого графа,
+        # перестроен ли граф заново). У отцепленного курсора показанный граф - состояние shown
+        # (по умолчанию последнее)
+        history = self.history
+        if self.index is None or self.index < history.first_index:
+            return self._rebuild(index, shown), True
+        # Дельты дороже перестроения, если изменений на пути больше, чем ребер в целевом графе
+        target = history.state(index)
+        if abs(target.changes_total - history.state(self.index).changes_total) > \
+                max(CHECKPOINT_MIN_CHANGES, target.edge_count):
+            return self._rebuild(index), True
+        states, first = history._states, history.first_index
+        net = {}  # Ребро -> появилось (True) или исчезло (False) относительно текущего состояния
+        if index > self.index:
+            steps = ((states[position].added, states[position].removed)
+                     for position in range(self.index + 1 - first, index + 1 - first))
+        else:
+            # Обратный ход: состояние отменяется - его появившиеся ребра исчезают и наоборот
+            steps = ((states[position].removed, states[position].added)
+                     for position in range(self.index - first, index - first, -1))
+        for appeared, vanished in steps:
+            for edge in vanished:
+                if net.pop(edge, None) is None:
+                    net[edge] = False
+            for edge in appeared:
+                if net.pop(edge, None) is None:
+                    net[edge] = True
+        removed = [edge for edge, appeared in net.items() if not appeared]
+        added = [edge for edge, appeared in net.items() if appeared]
+        # Освобождение внутри компоненты разбивает ее за O(размер компоненты): в гигантской
+        # компоненте несколько таких освобождений дороже, чем собрать граф заново
+        graph = self.graph
+        split_work = sum(graph.component_size(waiter) for waiter, holder in removed
+                         if graph.in_same_component(waiter, holder))
+        if split_work > max(CHECKPOINT_MIN_CHANGES, target.edge_count):
+            return self._rebuild(index), True
+        self.index = index
+        return self._apply(added, removed), False
+
+    def _rebuild(self, index, shown=None):
+        history = self.history
+        edges = history.edges_at(index)
+        if self.edges is not None:
+            shown = self.edges
+        else:
+            shown = history.edges() if shown is None else history.edges_at(shown)
+        added = list(edges - shown)
+        removed = list(shown - edges)
+        builder = WFGraphBuilder()
+        for waiter, holder in edges:
+            builder.add_edge(waiter, holder)
+        self.graph = IncrementalWFG.from_graph(builder.build())
+        self.edges = edges
+        self.index = index
+        return WFGTextEdit(added, removed, [], WFGParseErrors(), True)
+
+    def _apply(self, added, removed):
+        # Как WFGTextModel.update: сначала освобождения, тупики меняются только при удалении ребра
+        # внутри компоненты или при новом цикле
+        graph, edges = self.graph, self.edges
+        deadlocks_changed = False
+        for edge in removed:
+            deadlocks_changed = deadlocks_changed or graph.in_same_component(*edge)
+            graph.remove_wait(*edge)
+            edges.discard(edge)
+        cycles = [cycle for cycle in (graph.add_wait(*edge) for edge in added) if cycle]
+        edges.update(added)
+        return WFGTextEdit(added, removed, cycles, WFGParseErrors(), deadlocks_changed or bool(cycles))
@@ -0,0 +1,430 @@
+"""Раскладки графа ожидания с выбором алгоритма по размеру графа.
+
+Все движки работают с CSR-графом (WFGraph) и возвращают массив координат NumPy
+формы (n, 2) в порядке ID вершин. Маленькие графы раскладываются networkx
+(Kamada-Kawai, spring), большие - векторизованным силовым алгоритмом
+Фрюхтермана-Рейнгольда с приближением Барнса-Хата для отталкивания.
+Итеративные движки укладываются в бюджет времени и реагируют на cancel_event.
+
+LayoutCache хранит готовые раскладки по хешу структуры графа (LRU, по желанию -
+в файле), а seeded_layout достраивает раскладку после небольшой правки графа,
+сдвигая только новые и затронутые правкой вершины.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_TIME_BUDGET = 2.0  # Секунды: картинка должна появиться быстро при любом размере графа
+KAMADA_KAWAI_MAX_NODES = 100  # Kamada-Kawai требует все пары кратчайших путей - O(n^2) памяти
+SPRING_MAX_NODES = 500  # spring_layout networkx считает отталкивание всех пар на каждой итерации
+DIRECT_REPULSION_MAX_PAIRS = 20_000_000  # Порог (подвижные x все вершины) для точного отталкивания
+
+LAYOUT_ENGINES = {}  # Имя -> функция(graph, deadlocked_components, time_budget, cancel_event)
+
+
+def register_layout(name):
+    def decorator(engine):
+        LAYOUT_ENGINES[name] = engine
+        return engine
+    return decorator
+
+
+def choose_layout_engine(node_count, has_deadlocks=False):
+    if node_count <= KAMADA_KAWAI_MAX_NODES:
+        return 'kamada_kawai'
+    if has_deadlocks:
+        return 'cycles'
+    if node_count <= SPRING_MAX_NODES:
+        return 'spring'
+    return 'force'
+
+
+def compute_layout(graph, engine='auto', deadlocked_components=None, time_budget=DEFAULT_TIME_BUDGET,
+                   cancel_event=None):
+    # Возвращает (имя использованного движка, координаты (n, 2) в диапазоне [-1, 1])
+    if graph.node_count == 0:
+        return engine, np.zeros((0, 2))
+    if engine == 'auto':
+        engine = choose_layout_engine(graph.node_count, bool(deadlocked_components))
+    coords = LAYOUT_ENGINES[engine](graph, deadlocked_components or [], time_budget, cancel_event)
+    return engine, rescale_layout(coords)
+
+
+def positions_to_dict(graph, coords):
+    names = graph.names
+    return {names[node_id]: (float(x), float(y)) for node_id, (x, y) in enumerate(coords)}
+
+
+def rescale_layout(coords):
+    # Центрирование и масштаб в [-1, 1], как nx.rescale_layout
+    if len(coords) == 0:
+        return coords
+    coords = coords - coords.mean(axis=0)
+    scale = np.abs(coords).max()
+    return coords / scale if scale > 0 else coords
+
+
+def edge_arrays(graph, drop_self_loops=True):
+    # Ребра CSR как два массива ID вершин (без копирования targets)
+    counts = np.diff(np.frombuffer(graph.offsets, dtype=np.int64))
+    sources = np.repeat(np.arange(graph.node_count, dtype=np.int64), counts)
+    targets = np.frombuffer(graph.targets, dtype=np.int32).astype(np.int64)
+    if drop_self_loops:
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+    return sources, targets
+
+
+# --- Движки networkx для небольших графов ---
+def _networkx_coords(graph, graph_pos):
+    return np.array([graph_pos[name] for name in graph.names], dtype=float)
+
+
+@register_layout('kamada_kawai')
+def kamada_kawai_engine(graph, deadlocked_components, time_budget, cancel_event):
+    import networkx as nx
+    graph_nx = graph.to_networkx()
+    try:
+        return _networkx_coords(graph, nx.kamada_kawai_layout(graph_nx))
+    except Exception:  # Например, без scipy
+        return spring_engine(graph, deadlocked_components, time_budget, cancel_event)
+
+
+@register_layout('spring')
+def spring_engine(graph, deadlocked_components, time_budget, cancel_event):
+    import networkx as nx
+    graph_nx = graph.to_networkx()
+    try:
+        return _networkx_coords(graph, nx.spring_layout(graph_nx, k=0.7, iterations=70, seed=42))
+    except Exception:
+        return circular_engine(graph, deadlocked_components, time_budget, cancel_event)
+
+
+@register_layout('circular')
+def circular_engine(graph, deadlocked_components, time_budget, cancel_event):
+    angles = np.linspace(0, 2 * math.pi, graph.node_count, endpoint=False)
+    return np.column_stack((np.cos(angles), np.sin(angles)))
+
+
+# --- Векторизованный силовой алгоритм для больших графов ---
+@register_layout('force')
+def force_engine(graph, deadlocked_components, time_budget, cancel_event):
+    sources, targets = edge_arrays(graph)
+    return force_directed_layout(graph.node_count, sources, targets, time_budget=time_budget,
+                                 cancel_event=cancel_event)
+
+
+def force_directed_layout(node_count, sources, targets, initial=None, fixed=None, k=1.0,
+                          time_budget=DEFAULT_TIME_BUDGET, max_iterations=300, cancel_event=None, seed=42,
+                          temperature=None):
+    # Фрюхтерман-Рейнгольд: притяжение d^2/k по ребрам, отталкивание k^2/d (Барнс-Хат).
+    # fixed - булева маска закрепленных вершин, initial - стартовые координаты,
+    # temperature - максимальный начальный шаг (по умолчанию десятая часть стороны раскладки)
+    rng = np.random.default_rng(seed)
+    side = k * math.sqrt(max(node_count, 1))
+    positions = (np.array(initial, dtype=float) if initial is not None
+                 else rng.random((node_count, 2)) * side)
+    if node_count < 2:
+        return positions
+    movable = None if fixed is None else ~np.asarray(fixed, dtype=bool)
+    # Если двигается лишь горстка вершин (дораскладка), точное отталкивание только для них дешевле Барнса-Хата.
+    # Как в сеточном варианте Фрюхтермана-Рейнгольда, учитываются только вершины ближе 2k: иначе
+    # несбалансированное дальнее поле закрепленной раскладки уносит подвижные вершины от соседей
+    movable_ids = None
+    if movable is not None and int(movable.sum()) * node_count <= DIRECT_REPULSION_MAX_PAIRS:
+        movable_ids = np.flatnonzero(movable)
+        touching = movable[sources] | movable[targets]  # Ребра между закрепленными вершинами ни на что не влияют
+        sources, targets = sources[touching], targets[touching]
+
+    if temperature is None:
+        temperature = side * 0.1
+    cooling = temperature / max_iterations
+    deadline = time.perf_counter() + time_budget
+    for _ in range(max_iterations):
+        if time.perf_counter() > deadline or (cancel_event is not None and cancel_event.is_set()):
+            break
+        if movable_ids is not None:
+            displacement = np.zeros_like(positions)
+            displacement[movable_ids] = direct_repulsion(positions, movable_ids, k, cutoff=2 * k)
+        else:
+            displacement = barnes_hut_repulsion(positions, k)
+
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            distance = np.sqrt(np.einsum('ij,ij->i', delta, delta)) + 1e-9
+            pull = delta * (distance / k)[:, None]
+            for axis in (0, 1):
+                displacement[:, axis] -= np.bincount(sources, pull[:, axis], node_count)
+                displacement[:, axis] += np.bincount(targets, pull[:, axis], node_count)
+
+        length = np.sqrt(np.einsum('ij,ij->i', displacement, displacement)) + 1e-9
+        step = displacement * (np.minimum(length, temperature) / length)[:, None]
+        if movable is not None:
+            step[~movable] = 0.0
+        positions += step
+        temperature = max(temperature - cooling, side * 0.001)
+    return positions
+
+
+def direct_repulsion(positions, node_ids, k, cutoff=None, chunk_pairs=1 << 20):
+    # Точное отталкивание вершин node_ids от всех остальных (не дальше cutoff), блоками по chunk_pairs пар
+    result = np.zeros((len(node_ids), 2))
+    rows = max(1, chunk_pairs // max(len(positions), 1))
+    for start in range(0, len(node_ids), rows):
+        block = node_ids[start:start + rows]
+        delta = positions[block][:, None, :] - positions[None, :, :]
+        distance_squared = np.einsum('ijk,ijk->ij', delta, delta)
+        factor = k * k / (distance_squared + 1e-12)
+        factor[np.arange(len(block)), block] = 0.0
+        if cutoff is not None:
+            factor[distance_squared > cutoff * cutoff] = 0.0
+        result[start:start + len(block)] = np.einsum('ijk,ij->ik', delta, factor)
+    return result
+
+
+def barnes_hut_repulsion(positions, k):
+    # Отталкивание всех пар за O(n log n): иерархия сеток 2^l x 2^l (квадродерево по уровням).
+    # На уровне l вершина взаимодействует с центрами масс ячеек, которые соседствуют с ее
+    # родительской ячейкой, но не с ее собственной (не более 27 ячеек на уровень).
+    # Ближнее поле (своя и соседние ячейки самого мелкого уровня) считается точно.
+    node_count = len(positions)
+    displacement = np.zeros_like(positions)
+    k_squared = k * k
+    lower = positions.min(axis=0)
+    span = float((positions.max(axis=0) - lower).max()) * (1 + 1e-9) + 1e-12
+    unit = (positions - lower) / span
+    finest_level = int(min(10, max(2, math.ceil(math.log(max(node_count / 2.0, 2.0), 4)))))
+
+    for level in range(2, finest_level + 1):
+        grid = 1 << level
+        cell_x = np.minimum((unit[:, 0] * grid).astype(np.int64), grid - 1)
+        cell_y = np.minimum((unit[:, 1] * grid).astype(np.int64), grid - 1)
+        flat = cell_x * grid + cell_y
+        mass = np.bincount(flat, minlength=grid * grid).astype(float)
+        safe_mass = np.maximum(mass, 1.0)
+        center_x = np.bincount(flat, positions[:, 0], grid * grid) / safe_mass
+        center_y = np.bincount(flat, positions[:, 1], grid * grid) / safe_mass
+        base_x = (cell_x // 2) * 2 - 2
+        base_y = (cell_y // 2) * 2 - 2
+        for offset_x in range(6):
+            target_x = base_x + offset_x
+            far_x = np.abs(target_x - cell_x) > 1
+            in_x = (target_x >= 0) & (target_x < grid)
+            for offset_y in range(6):
+                target_y = base_y + offset_y
+                valid = in_x & (target_y >= 0) & (target_y < grid) & (far_x | (np.abs(target_y - cell_y) > 1))
+                target = np.where(valid, target_x * grid + target_y, 0)
+                weight = np.where(valid, mass[target], 0.0)
+                delta_x = positions[:, 0] - center_x[target]
+                delta_y = positions[:, 1] - center_y[target]
+                factor = k_squared * weight / (delta_x * delta_x + delta_y * delta_y + 1e-12)
+                displacement[:, 0] += delta_x * factor
+                displacement[:, 1] += delta_y * factor
+
+    # Ближнее поле: точные пары в своей и соседних ячейках самого мелкого уровня
+    grid = 1 << finest_level
+    cell_x = np.minimum((unit[:, 0] * grid).astype(np.int64), grid - 1)
+    cell_y = np.minimum((unit[:, 1] * grid).astype(np.int64), grid - 1)
+    flat = cell_x * grid + cell_y
+    order = np.argsort(flat, kind='stable')
+    cell_count = np.bincount(flat, minlength=grid * grid)
+    cell_start = np.concatenate(([0], np.cumsum(cell_count)[:-1]))
+    node_ids = np.arange(node_count)
+    for offset_x in (-1, 0, 1):
+        neighbor_x = cell_x + offset_x
+        for offset_y in (-1, 0, 1):
+            neighbor_y = cell_y + offset_y
+            valid = (neighbor_x >= 0) & (neighbor_x < grid) & (neighbor_y >= 0) & (neighbor_y < grid)
+            neighbor = np.where(valid, neighbor_x * grid + neighbor_y, 0)
+            count = np.where(valid, cell_count[neighbor], 0)
+            for slot in range(int(count.max(initial=0))):
+                selected = node_ids[count > slot]
+                others = order[cell_start[neighbor[selected]] + slot]
+                delta = positions[selected] - positions[others]
+                distance_squared = np.einsum('ij,ij->i', delta, delta)
+                mask = others != selected
+                factor = np.where(mask, k_squared / (distance_squared + 1e-12), 0.0)
+                np.add.at(displacement, selected, delta * factor[:, None])
+    return displacement
+
+
+# --- Раскладка с выделением тупиков ---
+@register_layout('cycles')
+def cycle_ring_engine(graph, deadlocked_components, time_budget, cancel_event):
+    # Каждая тупиковая компонента - на собственном кольце; кольца упакованы рядами,
+    # остальные вершины раскладываются силовым алгоритмом вокруг закрепленных колец
+    node_count = graph.node_count
+    spacing = 1.0
+    rng = np.random.default_rng(42)
+    positions = np.zeros((node_count, 2))
+    fixed = np.zeros(node_count, dtype=bool)
+
+    rings = sorted(deadlocked_components, key=len, reverse=True)
+    radii = [max(spacing, spacing * len(component) / (2 * math.pi)) for component in rings]
+    row_width = math.sqrt(sum((2 * radius + spacing) ** 2 for radius in radii)) * 1.5 if rings else 0.0
+    cursor_x = cursor_y = row_height = 0.0
+    for component, radius in zip(rings, radii):
+        diameter = 2 * radius + spacing
+        if cursor_x > 0 and cursor_x + diameter > row_width:
+            cursor_x = 0.0
+            cursor_y += row_height
+            row_height = 0.0
+        center = (cursor_x + diameter / 2, cursor_y + diameter / 2)
+        angles = np.linspace(0, 2 * math.pi, len(component), endpoint=False)
+        members = np.asarray(component, dtype=np.int64)
+        positions[members, 0] = center[0] + radius * np.cos(angles)
+        positions[members, 1] = center[1] + radius * np.sin(angles)
+        fixed[members] = True
+        cursor_x += diameter
+        row_height = max(row_height, diameter)
+
+    free = ~fixed
+    side = max(row_width, cursor_y + row_height, spacing * math.sqrt(int(free.sum()) or 1))
+    positions[free] = rng.random((int(free.sum()), 2)) * side
+    sources, targets = edge_arrays(graph)
+    return force_directed_layout(node_count, sources, targets, initial=positions, fixed=fixed, k=spacing,
+                                 time_budget=time_budget, cancel_event=cancel_event)
+
+
+# --- Кэш раскладок и дораскладка после небольших правок ---
+SEEDED_TIME_BUDGET = 0.5  # Дораскладка должна быть почти мгновенной
+SEEDED_MAX_ITERATIONS = 60
+SEEDED_MAX_CHANGED_FRACTION = 0.5  # Если затронуто больше вершин, дешевле разложить граф заново
+
+
+def graph_structure_key(graph):
+    # Канонический хеш множества вершин и ребер: не зависит от порядка строк во вводе
+    names = graph.names
+    sources, targets = edge_arrays(graph, drop_self_loops=False)
+    edge_keys = sorted(names[source] + "\0" + names[target]
+                       for source, target in zip(sources.tolist(), targets.tolist()))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\0".join(sorted(names)).encode("utf-8"))
+    digest.update(b"\1")
+    digest.update("\1".join(edge_keys).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _edge_name_set(graph):
+    names = graph.names
+    sources, targets = edge_arrays(graph)
+    return {(names[source], names[target]) for source, target in zip(sources.tolist(), targets.tolist())}
+
+
+def seeded_layout(graph, previous_positions, previous_graph=None, time_budget=SEEDED_TIME_BUDGET,
+                  cancel_event=None, hints=None, max_changed_fraction=SEEDED_MAX_CHANGED_FRACTION):
+    # Раскладка, продолжающая предыдущую: старые вершины остаются на местах (с учетом
+    # перетаскиваний), двигаются только новые вершины и концы добавленных/удаленных ребер.
+    # hints - {вершина: (x, y)} стартовые точки новых вершин (например, место свернутой группы).
+    # Координаты не масштабируются, чтобы картинка не "прыгала".
+    # Возвращает None, если от предыдущей раскладки осталось слишком мало.
+    node_count = graph.node_count
+    names = graph.names
+    known = np.array([name in previous_positions for name in names], dtype=bool)
+    if node_count == 0 or known.sum() < 2:
+        return None
+    movable = ~known
+    if previous_graph is not None:
+        index_of = graph.index_of
+        for source, target in _edge_name_set(graph) ^ _edge_name_set(previous_graph):
+            for name in (source, target):
+                if name in index_of:
+                    movable[index_of[name]] = True
+    if max_changed_fraction is not None and movable.sum() > node_count * max_changed_fraction:
+        return None
+
+    positions = np.zeros((node_count, 2))
+    positions[known] = [previous_positions[names[node_id]] for node_id in np.flatnonzero(known)]
+    lower = positions[known].min(axis=0)
+    upper = positions[known].max(axis=0)
+    # Характерное расстояние между вершинами старой раскладки
+    area = max(float(np.prod(np.maximum(upper - lower, 1e-9))), 1e-12)
+    k = math.sqrt(area / known.sum())
+
+    # Новая вершина появляется в подсказанной точке, рядом с уже размещенными соседями или в случайной точке
+    sources, targets = edge_arrays(graph)
+    rng = np.random.default_rng(42)
+    new_nodes = np.flatnonzero(~known)
+    neighbor_sum = np.zeros((node_count, 2))
+    neighbor_count = np.zeros(node_count)
+    for ends, others in ((sources, targets), (targets, sources)):
+        placed = known[others]
+        np.add.at(neighbor_sum, ends[placed], positions[others[placed]])
+        np.add.at(neighbor_count, ends[placed], 1)
+    hints = hints or {}
+    for node_id in new_nodes.tolist():
+        if names[node_id] in hints:
+            positions[node_id] = np.asarray(hints[names[node_id]], dtype=float) + rng.normal(0, k * 0.3, 2)
+        elif neighbor_count[node_id]:
+            positions[node_id] = neighbor_sum[node_id] / neighbor_count[node_id] + rng.normal(0, k * 0.3, 2)
+        else:
+            positions[node_id] = lower + rng.random(2) * (upper - lower)
+
+    return force_directed_layout(node_count, sources, targets, initial=positions, fixed=~movable, k=k,
+                                 time_budget=time_budget, max_iterations=SEEDED_MAX_ITERATIONS,
+                                 cancel_event=cancel_event, temperature=k)
+
+
+class LayoutCache:
+    # LRU-кэш {ключ: {вершина: (x, y)}}; потокобезопасен, т.к. раскладка считается в фоне
+    FORMAT_VERSION = 1
+
+    def __init__(self, capacity=16, path=None):
+        self.capacity = capacity
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(positions)
+
+    def put(self, key, positions):
+        with self._lock:
+            self._entries[key] = dict(positions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def load(self):
+        # Поврежденный или чужой файл кэша просто игнорируется
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+            if data.get("version") != self.FORMAT_VERSION:
+                return
+            entries = [(key, {node: (float(x), float(y)) for node, (x, y) in positions.items()})
+                       for key, positions in data["entries"]]
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return
+        for key, positions in entries:
+            self.put(key, positions)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, {node: [x, y] for node, (x, y) in positions.items()}]
+                       for key, positions in self._entries.items()]
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"version": self.FORMAT_VERSION, "entries": entries}, cache_file, ensure_ascii=False)
+        os.replace(temp_path, self.path)  # Атомарно: при сбое старый кэш не портится
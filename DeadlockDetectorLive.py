@@ -0,0 +1,333 @@
+"""Живой мониторинг: поток событий ожидания/освобождения вместо снимка графа.
+
+События "WAIT P1 P2" (P1 начал ждать P2) и "RELEASE P1 P2" (перестал ждать) читаются
+из растущего файла журнала или из локального unix-сокета. Читающий поток собирает их
+в пачки, применяет к IncrementalWFG и отдает дельты графа (добавленные и удаленные
+ребра, новые циклы). Не импортирует Tkinter/Matplotlib.
+
+Пример (генератор нагрузки и наблюдение без GUI):
+    python DeadlockDetectorLive.py produce unix:/tmp/wfg.sock --rate 20000
+    python DeadlockDetectorLive.py watch unix:/tmp/wfg.sock
+"""
+import argparse
+import json
+import os
+import random
+import selectors
+import socket
+import stat
+import sys
+import threading
+import time
+
+from DeadlockDetectorCore import IncrementalWFG
+from DeadlockDetectorResolution import plan_resolution_by_names
+
+EVENT_KINDS = ('WAIT', 'RELEASE')
+SOCKET_PREFIX = "unix:"
+READ_CHUNK_SIZE = 1 << 16
+POLL_INTERVAL = 0.05  # Ожидание новых данных источником, с
+FLUSH_INTERVAL = 0.05  # Не реже этого читающий поток отдает накопленную пачку, с
+MAX_BURST_EVENTS = 50000  # Пачка отдается раньше, если событий набралось столько
+
+
+def parse_event(line):
+    # ('WAIT' | 'RELEASE', ожидающий, удерживающий) или None для пустых строк и комментариев.
+    # Поля перед событием (время, уровень журнала) пропускаются: берутся три последних поля
+    parts = line.split()
+    if not parts or parts[0].startswith('#'):
+        return None
+    if len(parts) < 3 or parts[-3].upper() not in EVENT_KINDS:
+        raise ValueError("Неверный формат. Используйте 'WAIT P1 P2' или 'RELEASE P1 P2'.")
+    return parts[-3].upper(), parts[-2], parts[-1]
+
+
+class LiveDelta:
+    # Изменения графа за одну пачку событий
+    def __init__(self, added=(), removed=(), cycles=(), deadlocked_sccs=None, events=0, errors=0,
+                 node_count=0, edge_count=0, victims=None):
+        self.added = list(added)  # Ребра (ожидающий, удерживающий), появившиеся в графе
+        self.removed = list(removed)  # Ребра, исчезнувшие из графа
+        self.cycles = list(cycles)  # Циклы, замкнутые ребрами пачки
+        self.deadlocked_sccs = deadlocked_sccs  # Все тупиковые компоненты или None, если не менялись
+        self.victims = victims  # План разрешения всех тупиков (кого снять) или None, если не менялся
+        self.events = events
+        self.errors = errors
+        self.node_count = node_count
+        self.edge_count = edge_count
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.cycles or self.deadlocked_sccs is not None)
+
+
+def merge_deltas(deltas):
+    # Несколько дельт подряд -> одна (интерфейс не успел их применить): для ребра важно последнее состояние
+    if len(deltas) == 1:
+        return deltas[0]
+    present = {}
+    merged = LiveDelta()
+    for delta in deltas:
+        for edge in delta.removed:
+            present[edge] = False
+        for edge in delta.added:
+            present[edge] = True
+        merged.cycles.extend(delta.cycles)
+        if delta.deadlocked_sccs is not None:
+            merged.deadlocked_sccs = delta.deadlocked_sccs
+            merged.victims = delta.victims
+        merged.events += delta.events
+        merged.errors += delta.errors
+    merged.added = [edge for edge, is_present in present.items() if is_present]
+    merged.removed = [edge for edge, is_present in present.items() if not is_present]
+    merged.node_count, merged.edge_count = deltas[-1].node_count, deltas[-1].edge_count
+    return merged
+
+
+class LiveMonitor:
+    # Владеет IncrementalWFG, поэтому вызывается только из одного (читающего) потока
+    def __init__(self):
+        self.graph = IncrementalWFG()
+        self.event_count = 0
+        self.error_count = 0
+        self._edge_count = 0
+        self._deadlocked_sccs = []  # Последние отправленные тупиковые компоненты
+
+    def apply(self, lines):
+        # Пачка строк -> LiveDelta. События пачки схлопываются по ребру до последнего: WAIT и RELEASE
+        # одного ребра внутри пачки не трогают граф (такой цикл распался сам и тупиком не был)
+        last_kind = {}
+        events = errors = 0
+        for line in lines:
+            try:
+                event = parse_event(line)
+            except ValueError:
+                errors += 1
+                continue
+            if event is not None:
+                events += 1
+                last_kind[event[1], event[2]] = event[0]
+
+        graph = self.graph
+        # Как в WFGTextModel.update: тупики меняются, только если освобождено ребро внутри компоненты
+        # или замкнут новый цикл. Остальные освобождения не пересчитывают компоненты
+        removed = []
+        split = False
+        for edge, kind in last_kind.items():
+            if kind == 'RELEASE':
+                inside = graph.in_same_component(*edge)
+                if graph.remove_wait(*edge):
+                    removed.append(edge)
+                    split = split or inside
+        added = []
+        cycles = []
+        for edge, kind in last_kind.items():
+            if kind == 'WAIT' and not graph.has_wait(*edge):
+                cycle = graph.add_wait(*edge)
+                added.append(edge)
+                if cycle:
+                    cycles.append(cycle)
+        self.event_count += events
+        self.error_count += errors
+        self._edge_count += len(added) - len(removed)
+        # Освобождение внутри компоненты может разбить тупик, новое ребро - создать или расширить
+        deadlocked_sccs = graph.deadlocked_sccs() if cycles or split else None
+        if not cycles and deadlocked_sccs == self._deadlocked_sccs:
+            # Освобождения внутри компонент их не разбили: ребер только меньше, прежние жертвы
+            # по-прежнему разрывают все циклы, и план не пересчитывается
+            deadlocked_sccs = None
+        victims = None
+        if deadlocked_sccs is not None:  # План строится по подграфу тупиков, стоимости событий не задают
+            self._deadlocked_sccs = deadlocked_sccs
+            deadlocked_nodes = [node for component in deadlocked_sccs for node in component]
+            victims = plan_resolution_by_names(graph.to_graph(deadlocked_nodes), deadlocked_sccs).victims
+        return LiveDelta(added, removed, cycles, deadlocked_sccs, events, errors, graph.node_count(),
+                         self._edge_count, victims)
+
+
+# --- Источники событий: генераторы пачек строк, пустая пачка - новых данных пока нет ---
+def follow_file(path, stop_event, from_start=True, poll_interval=POLL_INTERVAL):
+    # Как tail -F: дочитывает растущий файл; при усечении или ротации начинает новый файл с начала
+    log_file = open(path, 'rb')
+    try:
+        if not from_start:
+            log_file.seek(0, os.SEEK_END)
+        partial = b''
+        while not stop_event.is_set():
+            chunk = log_file.read(READ_CHUNK_SIZE)
+            if chunk:
+                pieces = (partial + chunk).split(b'\n')
+                partial = pieces.pop()
+                yield [piece.decode('utf-8', 'replace') for piece in pieces]
+                continue
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None  # Файл переименован, новый еще не создан
+            if current is not None and (current.st_size < log_file.tell() or
+                                        current.st_ino != os.fstat(log_file.fileno()).st_ino):
+                log_file.close()
+                log_file = open(path, 'rb')
+                partial = b''
+                continue
+            yield []
+            stop_event.wait(poll_interval)
+    finally:
+        log_file.close()
+
+
+def listen_unix_socket(path, stop_event, poll_interval=POLL_INTERVAL):
+    # Локальный сервер: любое число производителей подключается и пишет события построчно
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("Unix-сокеты не поддерживаются в этой системе.")
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)  # Сокет от прошлого запуска
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    selector = selectors.DefaultSelector()
+    partial = {}  # Соединение -> недочитанный конец строки
+    try:
+        server.bind(path)
+        server.listen()
+        server.setblocking(False)
+        selector.register(server, selectors.EVENT_READ)
+        while not stop_event.is_set():
+            lines = []
+            for key, _ in selector.select(timeout=poll_interval):
+                if key.fileobj is server:
+                    connection, _ = server.accept()
+                    connection.setblocking(False)
+                    selector.register(connection, selectors.EVENT_READ)
+                    partial[connection] = b''
+                    continue
+                connection = key.fileobj
+                try:
+                    data = connection.recv(READ_CHUNK_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if not data:  # Производитель отключился
+                    selector.unregister(connection)
+                    connection.close()
+                    tail = partial.pop(connection)
+                    if tail:
+                        lines.append(tail.decode('utf-8', 'replace'))
+                    continue
+                pieces = (partial[connection] + data).split(b'\n')
+                partial[connection] = pieces.pop()
+                lines.extend(piece.decode('utf-8', 'replace') for piece in pieces)
+            yield lines
+    finally:
+        for connection in partial:
+            connection.close()
+        selector.close()
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def open_event_source(spec, stop_event):
+    # "unix:/путь/к/сокету" или путь к файлу журнала
+    if spec.startswith(SOCKET_PREFIX):
+        return listen_unix_socket(spec[len(SOCKET_PREFIX):], stop_event)
+    return follow_file(spec, stop_event)
+
+
+def run_live_reader(source, monitor, post, stop_event, flush_interval=FLUSH_INTERVAL):
+    # Цикл читающего потока: строки копятся и отдаются дельтой не чаще flush_interval,
+    # поэтому интерфейс получает десятки обновлений в секунду, а не по одному на событие
+    pending = []
+    last_flush = time.perf_counter()
+    for lines in source:
+        pending.extend(lines)
+        now = time.perf_counter()
+        if pending and (not lines or now - last_flush >= flush_interval or len(pending) >= MAX_BURST_EVENTS):
+            delta = monitor.apply(pending)
+            pending = []
+            last_flush = now
+            if delta or delta.errors:
+                post(delta)
+        if stop_event.is_set():
+            break
+
+
+# --- Командная строка: генератор нагрузки и наблюдение без GUI ---
+def produce_events(process_count, rng):
+    # Бесконечный поток событий: каждый процесс ждет не больше одного другого, поэтому тупики
+    # то появляются, то распадаются по мере освобождений
+    waiting_for = {}
+    names = [f"P{index}" for index in range(process_count)]
+    while True:
+        waiter = rng.randrange(process_count)
+        holder = waiting_for.pop(waiter, None)
+        if holder is not None:
+            yield f"RELEASE {names[waiter]} {names[holder]}\n"
+        else:
+            holder = rng.randrange(process_count)
+            waiting_for[waiter] = holder
+            yield f"WAIT {names[waiter]} {names[holder]}\n"
+
+
+def run_producer(spec, rate, process_count, duration=None, seed=None):
+    # Пишет события в файл (дописывая) или в unix-сокет примерно с частотой rate в секунду
+    if spec.startswith(SOCKET_PREFIX):
+        sink = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sink.connect(spec[len(SOCKET_PREFIX):])
+        write = sink.sendall
+    else:
+        sink = open(spec, 'ab', buffering=0)
+        write = sink.write
+    events = produce_events(process_count, random.Random(seed))
+    tick = 0.01
+    per_tick = max(1, int(rate * tick))
+    started = time.perf_counter()
+    sent = 0
+    try:
+        while duration is None or time.perf_counter() - started < duration:
+            write("".join(next(events) for _ in range(per_tick)).encode('utf-8'))
+            sent += per_tick
+            delay = started + sent / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        sink.close()
+    return sent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Живой мониторинг событий WAIT/RELEASE.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    produce = subparsers.add_parser("produce", help="Генерировать случайные события (для проверки)")
+    produce.add_argument("target", help="Файл журнала или unix:/путь/к/сокету")
+    produce.add_argument("--rate", type=int, default=10000, help="Событий в секунду")
+    produce.add_argument("--processes", type=int, default=1000)
+    produce.add_argument("--duration", type=float, help="Секунд работы (по умолчанию - до Ctrl+C)")
+    produce.add_argument("--seed", type=int)
+    watch = subparsers.add_parser("watch", help="Печатать новые тупики строками JSON")
+    watch.add_argument("source", help="Файл журнала или unix:/путь/к/сокету")
+    args = parser.parse_args(argv)
+
+    if args.command == "produce":
+        sent = run_producer(args.target, args.rate, args.processes, args.duration, args.seed)
+        print(f"Отправлено событий: {sent}", file=sys.stderr)
+        return 0
+
+    monitor = LiveMonitor()
+    stop_event = threading.Event()
+
+    def report(delta):
+        for cycle in delta.cycles:
+            print(json.dumps({"time": round(time.time(), 3), "cycle": cycle, "events": monitor.event_count,
+                              "nodes": delta.node_count, "edges": delta.edge_count}, ensure_ascii=False),
+                  flush=True)
+
+    try:
+        run_live_reader(open_event_source(args.source, stop_event), monitor, report, stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
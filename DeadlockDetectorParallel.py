@@ -0,0 +1,224 @@
+"""Многоядерный поиск тупиков по слабым компонентам связности.
+
+Граф делится на слабые компоненты одним проходом (union-find или векторные метки NumPy). Компоненты-деревья
+(ребер меньше, чем вершин) циклов содержать не могут и отбрасываются сразу, остальные
+раскладываются по задачам примерно равного веса и обрабатываются в пуле процессов.
+CSR-массивы и списки корней задач лежат в одном блоке разделяемой памяти, поэтому
+задача передается в процесс как несколько чисел, а не как маринованный граф.
+Каждая задача - тот же алгоритм Тарьяна WFGraph.deadlocked_components, запущенный
+только от вершин своих компонент. Разбиение векторизуется NumPy, если он установлен;
+без него работает чистый Python, как и DeadlockDetectorCore.
+"""
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from DeadlockDetectorCore import WFGraph
+
+PARALLEL_MIN_EDGES = 200_000  # Меньшие графы быстрее обработать в одном процессе, чем запускать пул
+TASKS_PER_WORKER = 4  # Задач на процесс: мелкие задачи выравнивают нагрузку, если компоненты разного размера
+
+
+def _import_numpy():
+    # NumPy импортируется только при разбиении большого графа: CLI и GUI запускаются без него.
+    # Без NumPy разбиение медленнее, но результат тот же
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def weakly_connected_labels(graph):
+    # ID вершины -> метка ее слабой компоненты (одинаковая у всех вершин компоненты)
+    np = _import_numpy()
+    if np is not None:
+        return _numpy_weak_labels(graph, np)
+    return _union_find_labels(graph)
+
+
+def _numpy_weak_labels(graph, np):
+    # Метки-минимумы: концы каждого ребра "подвешиваются" к меньшей метке, затем пути
+    # сжимаются прыжками по указателям. Число раундов растет как логарифм диаметра компонент
+    node_count = len(graph.offsets) - 1
+    degrees = np.diff(np.frombuffer(graph.offsets, dtype=np.int64))
+    sources = np.repeat(np.arange(node_count, dtype=np.int64), degrees)
+    targets = np.frombuffer(graph.targets, dtype=np.int32).astype(np.int64)
+    labels = np.arange(node_count, dtype=np.int64)
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        differ = source_labels != target_labels
+        if not differ.any():
+            return labels
+        source_labels, target_labels = source_labels[differ], target_labels[differ]
+        lower = np.minimum(source_labels, target_labels)
+        np.minimum.at(labels, source_labels, lower)
+        np.minimum.at(labels, target_labels, lower)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def _union_find_labels(graph):
+    # Union-find по ребрам с объединением по размеру и делением путей пополам
+    node_count = len(graph.offsets) - 1
+    offsets = graph.offsets
+    targets = graph.targets
+    parent = array('i', range(node_count))
+    size = array('i', [1]) * node_count
+    for source in range(node_count):
+        start, end = offsets[source], offsets[source + 1]
+        if start == end:
+            continue
+        root = source
+        while parent[root] != root:
+            parent[root] = parent[parent[root]]
+            root = parent[root]
+        for target in targets[start:end]:
+            other = target
+            while parent[other] != other:
+                parent[other] = parent[parent[other]]
+                other = parent[other]
+            if other == root:
+                continue
+            if size[root] < size[other]:
+                root, other = other, root
+            parent[other] = root
+            size[root] += size[other]
+    for node_id in range(node_count):
+        root = parent[node_id]
+        while parent[root] != root:
+            root = parent[root]
+        parent[node_id] = root
+    return parent
+
+
+def cyclic_partitions(graph):
+    # Слабые компоненты, в которых возможен цикл (ребер не меньше, чем вершин), - [(число ребер, ID вершин)].
+    # Компонента с меньшим числом ребер - дерево, и даже петли в ней нет
+    labels = weakly_connected_labels(graph)
+    np = _import_numpy()
+    if np is not None:
+        node_count = len(labels)
+        degrees = np.diff(np.frombuffer(graph.offsets, dtype=np.int64))
+        node_counts = np.bincount(labels, minlength=node_count)
+        edge_counts = np.bincount(labels, weights=degrees, minlength=node_count).astype(np.int64)
+        candidate = (edge_counts >= node_counts) & (node_counts > 0)
+        members = np.flatnonzero(candidate[labels])
+        order = members[np.argsort(labels[members], kind='stable')]
+        ordered_labels = labels[order]
+        bounds = np.flatnonzero(np.diff(ordered_labels)) + 1
+        return [(int(edge_counts[nodes_label]), nodes)
+                for nodes_label, nodes in zip(ordered_labels[np.r_[0, bounds]] if len(order) else [],
+                                              np.split(order.astype(np.int32), bounds))]
+    offsets = graph.offsets
+    node_counts = {}
+    edge_counts = {}
+    for node_id, label in enumerate(labels):
+        node_counts[label] = node_counts.get(label, 0) + 1
+        edge_counts[label] = edge_counts.get(label, 0) + offsets[node_id + 1] - offsets[node_id]
+    members = {label: array('i') for label, edges in edge_counts.items() if edges >= node_counts[label]}
+    for node_id, label in enumerate(labels):
+        nodes = members.get(label)
+        if nodes is not None:
+            nodes.append(node_id)
+    return [(edge_counts[label], nodes) for label, nodes in members.items()]
+
+
+def _balanced_tasks(partitions, task_count):
+    # Жадное LPT-распределение: самая тяжелая компонента - в наименее загруженную задачу.
+    # Задача - список массивов ID вершин своих компонент
+    tasks = [[0, []] for _ in range(min(task_count, len(partitions)))]
+    for edges, nodes in sorted(partitions, key=lambda partition: partition[0], reverse=True):
+        lightest = min(tasks, key=lambda task: task[0])
+        lightest[0] += edges + len(nodes)
+        lightest[1].append(nodes)
+    return [chunks for _, chunks in tasks if chunks]
+
+
+def _concatenate_roots(chunks):
+    roots = array('i')
+    for nodes in chunks:
+        roots.frombytes(memoryview(nodes).cast('B'))
+    return roots
+
+
+def _detect_in_shared_graph(block_name, node_count, edge_count, roots_start, roots_stop):
+    # Выполняется в процессе пула: Тарьян по общему CSR только от корней своей задачи.
+    # Процессы пула используют resource_tracker родителя, поэтому блок удаляет только родитель
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        buffer = block.buf
+        offsets_size = 8 * (node_count + 1)
+        targets_size = 4 * edge_count
+        offsets = buffer[:offsets_size].cast('q')
+        targets = buffer[offsets_size:offsets_size + targets_size].cast('i')
+        roots = buffer[offsets_size + targets_size:].cast('i')[roots_start:roots_stop]
+        components = WFGraph(None, None, offsets, targets).deadlocked_components(roots)
+        # memoryview на блок нужно отпустить до close(), иначе BufferError
+        del offsets, targets, roots, buffer
+        return components
+    finally:
+        block.close()
+
+
+def parallel_deadlocked_components(graph, workers=None, min_edges=PARALLEL_MIN_EDGES, executor=None):
+    # Тупиковые компоненты (списки ID), как у graph.deadlocked_components(), но по слабым компонентам
+    # в workers процессах. Небольшие графы и графы из одной большой компоненты считаются здесь же
+    # (без пула разбиение не окупается). executor - готовый пул для повторных вызовов
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(graph.targets) < min_edges:
+        return _sorted_components(graph.deadlocked_components())
+    partitions = cyclic_partitions(graph)
+    candidate_edges = sum(edges for edges, _ in partitions)
+    if len(partitions) <= 1 or candidate_edges < min_edges:
+        # Компоненты-деревья уже известны - их не обходим
+        roots = _concatenate_roots(nodes for _, nodes in partitions)
+        return _sorted_components(graph.deadlocked_components(roots))
+
+    tasks = _balanced_tasks(partitions, workers * TASKS_PER_WORKER)
+    node_count = len(graph.offsets) - 1
+    edge_count = len(graph.targets)
+    offsets_bytes = memoryview(graph.offsets).cast('B')
+    targets_bytes = memoryview(graph.targets).cast('B')
+    task_roots = [_concatenate_roots(chunks) for chunks in tasks]
+    roots_size = 4 * sum(len(roots) for roots in task_roots)
+    block = shared_memory.SharedMemory(create=True, size=len(offsets_bytes) + len(targets_bytes) + roots_size)
+    try:
+        buffer = block.buf
+        position = 0
+        for chunk in [offsets_bytes, targets_bytes] + [memoryview(roots).cast('B') for roots in task_roots]:
+            buffer[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        del buffer
+
+        bounds = []
+        start = 0
+        for roots in task_roots:
+            bounds.append((start, start + len(roots)))
+            start += len(roots)
+        own_executor = executor is None
+        if own_executor:
+            # spawn, а не fork: вызывающий процесс может быть многопоточным приложением Tk
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                           mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = [executor.submit(_detect_in_shared_graph, block.name, node_count, edge_count, start, stop)
+                       for start, stop in bounds]
+            components = [component for future in futures for component in future.result()]
+        finally:
+            if own_executor:
+                executor.shutdown()
+    finally:
+        block.close()
+        block.unlink()
+    return _sorted_components(components)
+
+
+def _sorted_components(components):
+    # Порядок не зависит от разбиения на задачи: по наименьшему ID вершины компоненты
+    return sorted(components, key=min)
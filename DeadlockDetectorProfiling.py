@@ -0,0 +1,155 @@
+"""Замеры этапов анализа и профилирование по запросу.
+
+PhaseTimings записывает время, размеры графа и (при включенном tracemalloc) пик
+памяти каждого этапа; без профилирования это два вызова perf_counter на этап.
+ProfileCapture включает cProfile и tracemalloc на один анализ и пишет отчет в файл.
+Только стандартная библиотека.
+"""
+import contextlib
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+PHASE_LABELS = {
+    'parse': "разбор",
+    'detect': "поиск тупиков",
+    'condense': "сжатие",
+    'networkx': "граф networkx",
+    'layout': "раскладка",
+    'draw': "построение",
+    'render': "отрисовка",
+}
+REPORT_TOP_FUNCTIONS = 40  # Строк cProfile в отчете
+REPORT_TOP_ALLOCATIONS = 20  # Строк tracemalloc в отчете
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.0f} мс" if seconds < 1.0 else f"{seconds:.2f} с"
+
+
+def format_bytes(size):
+    return f"{size / 2 ** 20:.1f} МБ" if size >= 2 ** 20 else f"{size / 1024:.0f} КБ"
+
+
+class PhaseTimings:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory  # Пик памяти только при запущенном tracemalloc (он замедляет все)
+        self.phases = []  # [{"phase", "seconds", "peak_bytes", счетчики...}] в порядке выполнения
+
+    @contextlib.contextmanager
+    def phase(self, name, **counts):
+        # Счетчики можно дописать внутри блока: with timings.phase('parse') as counts: counts['nodes'] = ...
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            self.add(name, time.perf_counter() - started, peak, **counts)
+
+    def add(self, name, seconds, peak_bytes=None, **counts):
+        self.phases.append({"phase": name, "seconds": seconds, "peak_bytes": peak_bytes, **counts})
+
+    def total(self):
+        return sum(record["seconds"] for record in self.phases)
+
+    def summary(self):
+        # Одна строка для интерфейса: "разбор 12 мс · поиск тупиков 3 мс ... = 0.45 с | пик 30 МБ"
+        if not self.phases:
+            return ""
+        parts = " · ".join(f"{PHASE_LABELS.get(record['phase'], record['phase'])} {format_seconds(record['seconds'])}"
+                           for record in self.phases)
+        text = f"{parts} = {format_seconds(self.total())}"
+        peaks = [record["peak_bytes"] for record in self.phases if record["peak_bytes"] is not None]
+        if peaks:
+            text += f" | пик {format_bytes(max(peaks))}"
+        return text
+
+    def format_table(self):
+        lines = [f"{'этап':<16}{'время, с':>12}{'пик памяти':>14}  размеры"]
+        for record in self.phases:
+            counts = ", ".join(f"{key}={value}" for key, value in record.items()
+                               if key not in ("phase", "seconds", "peak_bytes"))
+            peak = format_bytes(record["peak_bytes"]) if record["peak_bytes"] is not None else "-"
+            lines.append(f"{PHASE_LABELS.get(record['phase'], record['phase']):<16}"
+                         f"{record['seconds']:>12.6f}{peak:>14}  {counts}")
+        lines.append(f"{'всего':<16}{self.total():>12.6f}")
+        return "\n".join(lines)
+
+
+class ProfileCapture:
+    # cProfile профилирует только поток, в котором включен, поэтому фоновый анализ и
+    # отрисовка в главном потоке заводят по своему профайлеру; отчет объединяет оба
+    def __init__(self):
+        self._profilers = []
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = False
+        self.finished = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        return self
+
+    @contextlib.contextmanager
+    def profile_thread(self):
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._profilers.append(profiler)
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+
+    def discard(self):
+        # Анализ отменен или заменен новым: отчет не нужен, tracemalloc больше не замедляет программу
+        if not self.finished:
+            self.finished = True
+            self._stop_tracemalloc()
+
+    def _stop_tracemalloc(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def write_report(self, path, timings):
+        # Текстовый отчет (этапы, горячие функции, места выделения памяти) и рядом .prof для snakeviz/pstats
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        self.finished = True
+        self._stop_tracemalloc()
+
+        stream = io.StringIO()
+        stats = None
+        with self._lock:
+            profilers = list(self._profilers)
+        if profilers:
+            stats = pstats.Stats(profilers[0], stream=stream)
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_TOP_FUNCTIONS)
+
+        with open(path, "w", encoding="utf-8") as report_file:
+            report_file.write(f"Профиль анализа WFG, {datetime.datetime.now().isoformat(timespec='seconds')}\n\n")
+            report_file.write(timings.format_table() + "\n\n")
+            if snapshot is not None:
+                report_file.write(f"Выделения памяти (top {REPORT_TOP_ALLOCATIONS}):\n")
+                for statistic in snapshot.statistics('lineno')[:REPORT_TOP_ALLOCATIONS]:
+                    report_file.write(f"  {statistic}\n")
+                report_file.write("\n")
+            report_file.write(stream.getvalue())
+        if stats is not None:
+            stats.dump_stats(os.path.splitext(path)[0] + ".prof")
+        return path
+
+
+def default_report_path(directory=None):
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(directory or os.path.expanduser("~"), f"wfg_profile_{stamp}.txt")
@@ -0,0 +1,343 @@
+"""Индекс достижимости графа ожидания: "кого в итоге ждет P" и "кто стоит за P".
+
+Компоненты сильной связности (тупики) сжимаются в узлы DAG. На DAG строится сжатое
+транзитивное замыкание на интервальных метках (Agrawal, Borgida, Jagadish): узлы
+нумеруются при выходе из обхода остовного леса, и все достижимое из узла хранится как
+несколько непересекающихся отрезков номеров. Проверка "P ждет H" - двоичный поиск по
+отрезкам P, перечень ожидаемых процессов - проход по отрезкам (время пропорционально
+ответу). Длины самых длинных цепочек ожидания вверх и вниз от каждого узла считаются
+одним проходом по топологическому порядку. Замыкание в обратную сторону ("кто ждет P")
+строится при первом таком запросе. Только стандартная библиотека, как и DeadlockDetectorCore.
+
+Пример:
+    python DeadlockDetectorReachability.py dump.wfg --upstream P17 --downstream H0 --longest
+"""
+import argparse
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from DeadlockDetectorCore import parse_wfg_file
+
+MAX_PRINTED_NAMES = 50  # Столько имен печатает main на один запрос
+
+
+class _IntervalClosure:
+    # Сжатое транзитивное замыкание DAG: adjacency - списки соседей узлов, order - топологический
+    # порядок по направлению adjacency. Узел достижим из самого себя
+    def __init__(self, adjacency, order):
+        unit_count = len(adjacency)
+        post = array('i', [-1]) * unit_count  # Узел -> номер при выходе из обхода
+        low = array('i', bytes(4 * unit_count))  # Наименьший номер в поддереве остовного леса
+        unit_at = array('i', bytes(4 * unit_count))  # Номер -> узел
+        cursor = array('i', bytes(4 * unit_count))
+        visited = bytearray(unit_count)
+        counter = 0
+        for root in order:
+            if visited[root]:
+                continue
+            visited[root] = 1
+            low[root] = counter
+            stack = [root]
+            while stack:
+                unit = stack[-1]
+                neighbors = adjacency[unit]
+                position = cursor[unit]
+                descended = False
+                while position < len(neighbors):
+                    neighbor = neighbors[position]
+                    position += 1
+                    if not visited[neighbor]:
+                        visited[neighbor] = 1
+                        low[neighbor] = counter
+                        stack.append(neighbor)
+                        descended = True
+                        break
+                cursor[unit] = position
+                if descended:
+                    continue
+                stack.pop()
+                post[unit] = counter
+                unit_at[counter] = unit
+                counter += 1
+
+        # Отрезки узла = его поддерево + отрезки соседей, слитые с соседними и вложенными.
+        # У узлов с одним отрезком (типичная цепочка или дерево ожидания) это само поддерево
+        # [low, post], и массивы для них не заводятся: starts[узел] = None
+        starts = [None] * unit_count
+        ends = [None] * unit_count
+        for unit in reversed(order):
+            own_low, own_post = low[unit], post[unit]
+            pieces = None
+            for neighbor in adjacency[unit]:
+                neighbor_starts = starts[neighbor]
+                if neighbor_starts is None:
+                    if own_low <= low[neighbor] and post[neighbor] <= own_post:
+                        continue  # Потомок остовного дерева без внешних ребер уже внутри поддерева
+                    neighbor_pieces = [(low[neighbor], post[neighbor])]
+                else:
+                    neighbor_pieces = zip(neighbor_starts, ends[neighbor])
+                if pieces is None:
+                    pieces = [(own_low, own_post)]
+                pieces.extend(neighbor_pieces)
+            if pieces is None:
+                continue
+            pieces.sort()
+            merged_starts, merged_ends = array('i', [pieces[0][0]]), array('i', [pieces[0][1]])
+            for start, end in pieces[1:]:
+                if start <= merged_ends[-1] + 1:
+                    if end > merged_ends[-1]:
+                        merged_ends[-1] = end
+                else:
+                    merged_starts.append(start)
+                    merged_ends.append(end)
+            if len(merged_starts) > 1 or merged_starts[0] != own_low or merged_ends[0] != own_post:
+                starts[unit], ends[unit] = merged_starts, merged_ends
+        self.low = low
+        self.post = post
+        self.unit_at = unit_at
+        self.starts = starts
+        self.ends = ends
+
+    def intervals(self, unit):
+        unit_starts = self.starts[unit]
+        if unit_starts is None:
+            return ((self.low[unit], self.post[unit]),)
+        return zip(unit_starts, self.ends[unit])
+
+    @property
+    def interval_count(self):
+        return sum(1 if unit_starts is None else len(unit_starts) for unit_starts in self.starts)
+
+    def reaches(self, unit, other):
+        number = self.post[other]
+        unit_starts = self.starts[unit]
+        if unit_starts is None:
+            return self.low[unit] <= number <= self.post[unit]
+        position = bisect_right(unit_starts, number) - 1
+        return position >= 0 and number <= self.ends[unit][position]
+
+    def reachable(self, unit):
+        unit_at = self.unit_at
+        for start, end in self.intervals(unit):
+            for number in range(start, end + 1):
+                yield unit_at[number]
+
+    def reachable_among(self, unit, numbers):
+        # Достижимые узлы из отсортированного списка номеров (например, стоков) - без обхода остальных
+        unit_at = self.unit_at
+        for start, end in self.intervals(unit):
+            for position in range(bisect_left(numbers, start), bisect_right(numbers, end)):
+                yield unit_at[numbers[position]]
+
+
+class WFGReachability:
+    # Запросы по именам процессов. Узел DAG ("звено") - тупиковая компонента или одиночный процесс;
+    # длина цепочки считается в звеньях: тупик, через который она проходит, - одно звено
+    def __init__(self, graph, deadlocked_components=None):
+        # deadlocked_components - списки ID вершин, если они уже найдены (иначе ищутся заново)
+        self.graph = graph
+        if deadlocked_components is None:
+            deadlocked_components = graph.deadlocked_components()
+        node_count = graph.node_count
+        self._components = [list(component) for component in deadlocked_components]
+        unit_of = array('i', [-1]) * node_count
+        for unit, component in enumerate(self._components):
+            for node_id in component:
+                unit_of[node_id] = unit
+        unit_count = len(self._components)
+        single_node = array('i')  # Звено-одиночка (номер - unit_count тупиков) -> ID процесса
+        for node_id in range(node_count):
+            if unit_of[node_id] == -1:
+                unit_of[node_id] = unit_count + len(single_node)
+                single_node.append(node_id)
+        unit_count += len(single_node)
+        self._unit_of = unit_of
+        self._single_node = single_node
+
+        successors = [[] for _ in range(unit_count)]
+        predecessors = [[] for _ in range(unit_count)]
+        indegree = array('i', bytes(4 * unit_count))
+        for source, target in graph.edges():
+            source_unit, target_unit = unit_of[source], unit_of[target]
+            if source_unit != target_unit:
+                successors[source_unit].append(target_unit)
+                predecessors[target_unit].append(source_unit)
+                indegree[target_unit] += 1
+        order = [unit for unit in range(unit_count) if indegree[unit] == 0]
+        for unit in order:
+            for successor in successors[unit]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    order.append(successor)
+        self._successors = successors
+        self._predecessors = predecessors
+        self._order = order
+
+        # Самые длинные цепочки: height - звеньев вниз до корневого держателя, depth - вверх
+        # до самого дальнего ожидающего; next_down/next_up - следующее звено такой цепочки
+        height = array('i', [1]) * unit_count
+        next_down = array('i', [-1]) * unit_count
+        for unit in reversed(order):
+            for successor in successors[unit]:
+                if height[successor] >= height[unit]:
+                    height[unit] = height[successor] + 1
+                    next_down[unit] = successor
+        depth = array('i', [1]) * unit_count
+        next_up = array('i', [-1]) * unit_count
+        for unit in order:
+            for predecessor in predecessors[unit]:
+                if depth[predecessor] >= depth[unit]:
+                    depth[unit] = depth[predecessor] + 1
+                    next_up[unit] = predecessor
+        self._height, self._next_down = height, next_down
+        self._depth, self._next_up = depth, next_up
+
+        self._down = _IntervalClosure(successors, order)
+        # Номера корневых держателей (звеньев, которые сами никого не ждут) в порядке замыкания
+        self._sink_numbers = array('i', sorted(self._down.post[unit] for unit in range(unit_count)
+                                               if not successors[unit]))
+        self._up = None
+
+    @property
+    def unit_count(self):
+        return len(self._successors)
+
+    @property
+    def interval_count(self):
+        # Размер сжатого замыкания (отрезков во всех построенных направлениях)
+        return self._down.interval_count + (self._up.interval_count if self._up is not None else 0)
+
+    def _unit(self, name):
+        return self._unit_of[self.graph.index_of[name]]  # KeyError для неизвестного процесса
+
+    def _member_ids(self, unit):
+        if unit < len(self._components):
+            return self._components[unit]
+        return [self._single_node[unit - len(self._components)]]
+
+    def members(self, unit):
+        names = self.graph.names
+        return [names[node_id] for node_id in self._member_ids(unit)]
+
+    def _up_closure(self):
+        if self._up is None:
+            self._up = _IntervalClosure(self._predecessors, self._order[::-1])
+        return self._up
+
+    def _names_in(self, units, exclude):
+        names = self.graph.names
+        return [names[node_id] for unit in units for node_id in self._member_ids(unit) if node_id != exclude]
+
+    def waits_on(self, waiter, holder):
+        # Ждет ли waiter процесса holder напрямую или через цепочку ожиданий
+        waiter_unit, holder_unit = self._unit(waiter), self._unit(holder)
+        if waiter_unit == holder_unit:
+            return waiter_unit < len(self._components)  # Внутри тупика все ждут всех
+        return self._down.reaches(waiter_unit, holder_unit)
+
+    def upstream(self, name):
+        # Все процессы, которых name ждет напрямую или транзитивно (сам name - только если он в тупике)
+        unit = self._unit(name)
+        exclude = -1 if unit < len(self._components) else self.graph.index_of[name]
+        return self._names_in(self._down.reachable(unit), exclude)
+
+    def downstream(self, name):
+        # Все процессы, которые ждут name напрямую или транзитивно
+        unit = self._unit(name)
+        exclude = -1 if unit < len(self._components) else self.graph.index_of[name]
+        return self._names_in(self._up_closure().reachable(unit), exclude)
+
+    def root_holders(self, name):
+        # Корневые держатели, от которых в итоге зависит name: звенья, которые сами никого не ждут
+        # (работающий процесс или тупик без выхода). Списки имен; процесс, который никого не ждет, - []
+        unit = self._unit(name)
+        if not self._successors[unit] and unit >= len(self._components):
+            return []
+        return [self.members(holder) for holder in self._down.reachable_among(unit, self._sink_numbers)]
+
+    def chain_length(self, name=None):
+        # Звеньев в самой длинной цепочке ожидания через name (без name - во всем графе), O(1)
+        if name is None:
+            return max(self._height, default=0)
+        unit = self._unit(name)
+        return self._depth[unit] + self._height[unit] - 1
+
+    def longest_chain(self, name=None):
+        # Самая длинная цепочка через name (без name - во всем графе): звенья от самого дальнего
+        # ожидающего до корневого держателя, каждое - список имен
+        if name is None:
+            if not self.unit_count:
+                return []
+            height = self._height
+            unit = max(range(self.unit_count), key=height.__getitem__)
+            upper = []
+        else:
+            unit = self._unit(name)
+            upper = []
+            above = self._next_up[unit]
+            while above != -1:
+                upper.append(above)
+                above = self._next_up[above]
+            upper.reverse()
+        lower = []
+        while unit != -1:
+            lower.append(unit)
+            unit = self._next_down[unit]
+        return [self.members(chain_unit) for chain_unit in upper + lower]
+
+    def chain_edges(self, chain):
+        # Конкретные ребра (ожидающий, держатель) между соседними звеньями цепочки - для подсветки
+        graph = self.graph
+        index_of, names = graph.index_of, graph.names
+        edges = []
+        for waiters, holders in zip(chain, chain[1:]):
+            holder_unit = self._unit(holders[0])
+            edge = next(((names[source], names[target]) for source in map(index_of.__getitem__, waiters)
+                         for target in graph.neighbors(source) if self._unit_of[target] == holder_unit), None)
+            if edge is not None:
+                edges.append(edge)
+        return edges
+
+
+def _format_names(names, limit=MAX_PRINTED_NAMES):
+    shown = ", ".join(names[:limit])
+    return shown + (f" ... (+{len(names) - limit})" if len(names) > limit else "")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запросы достижимости по снимку графа ожидания (WFG).")
+    parser.add_argument("source", help="Текстовый файл WFG ('-' - stdin)")
+    parser.add_argument("--upstream", action="append", default=[], metavar="P",
+                        help="Кого P ждет транзитивно и кто его корневые держатели")
+    parser.add_argument("--downstream", action="append", default=[], metavar="P",
+                        help="Кто ждет P напрямую или транзитивно")
+    parser.add_argument("--longest", nargs="?", const="", metavar="P",
+                        help="Самая длинная цепочка ожидания (через P или во всем графе)")
+    args = parser.parse_args(argv)
+
+    graph, errors = parse_wfg_file(args.source)
+    if errors:
+        print(f"Некорректных строк: {errors.count} (пропущены).", file=sys.stderr)
+    index = WFGReachability(graph)
+    try:
+        for name in args.upstream:
+            upstream = index.upstream(name)
+            print(f"{name} ждет процессов: {len(upstream)}: {_format_names(upstream)}")
+            holders = [", ".join(holder) for holder in index.root_holders(name)]
+            print(f"  корневые держатели ({len(holders)}): {_format_names(holders)}")
+        for name in args.downstream:
+            downstream = index.downstream(name)
+            print(f"{name} ждут процессов: {len(downstream)}: {_format_names(downstream)}")
+        if args.longest is not None:
+            chain = index.longest_chain(args.longest or None)
+            links = ["{" + ", ".join(unit) + "}" if len(unit) > 1 else unit[0] for unit in chain]
+            print(f"Самая длинная цепочка (звеньев: {len(chain)}): {' -> '.join(links)}")
+    except KeyError as exc:
+        print(f"Процесс {exc} не найден в графе.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
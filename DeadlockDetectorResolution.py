@@ -0,0 +1,309 @@
+"""Планировщик разрешения тупиков: кого снять, чтобы граф ожидания стал ациклическим.
+
+Снятые процессы ("жертвы") образуют разрезающее множество вершин (feedback vertex set):
+после их удаления в графе нет циклов. Задача NP-трудна, поэтому каждая тупиковая
+компонента сначала упрощается точными правилами (вершина без входящих или исходящих
+ребер не лежит на цикле, вершина с петлей обязана стать жертвой). Если после упрощения
+осталось не больше EXACT_MAX_NODES процессов, минимум по стоимости ищется ветвлением
+по вершинам кратчайшего цикла с отсечением по лучшему известному плану. Иначе работает
+жадное приближение: процесс с наибольшим (вход * выход) / стоимость снимается, упрощение
+продолжается очередью, ленивая куча не пересчитывает оценки всех вершин - O(E log V).
+Затем лишние жертвы, без которых граф все равно ациклический, возвращаются обратно.
+
+Стоимости задаются во входном формате директивой '#@cost P1 5' (по умолчанию 1).
+Только стандартная библиотека, как и DeadlockDetectorCore.
+
+Пример:
+    python DeadlockDetectorResolution.py dump.wfg
+"""
+import argparse
+import heapq
+import sys
+from collections import deque
+
+from DeadlockDetectorCore import WFGraph, parse_wfg_file
+
+EXACT_MAX_NODES = 24  # Компоненты больше этого (после упрощения) решаются приближенно
+EXACT_MAX_STEPS = 20_000  # Узлов дерева ветвления; при превышении берется лучший найденный план
+REDUNDANCY_MAX_WORK = 5_000_000  # Предел (жертвы * размер компоненты) для удаления лишних жертв
+DEFAULT_COST = 1.0
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class ResolutionPlan:
+    # Жертвы по тупиковым компонентам: components - [(имена жертв, стоимость, точный ли минимум)]
+    def __init__(self, components):
+        self.components = components
+
+    def __bool__(self):
+        return bool(self.components)
+
+    @property
+    def victims(self):
+        return [name for victims, _, _ in self.components for name in victims]
+
+    @property
+    def cost(self):
+        return sum(cost for _, cost, _ in self.components)
+
+    @property
+    def exact(self):
+        return all(exact for _, _, exact in self.components)
+
+    def summary(self):
+        victims = self.victims
+        kind = "минимальный" if self.exact else "приближенный"
+        return f"Снять процессов: {len(victims)} (стоимость {self.cost:g}, {kind} план)"
+
+
+def plan_resolution(graph, components=None, costs=None, exact_max_nodes=EXACT_MAX_NODES,
+                    exact_max_steps=EXACT_MAX_STEPS):
+    # graph - WFGraph; components - тупиковые компоненты (списки ID), по умолчанию ищутся заново;
+    # costs - {имя процесса: стоимость снятия}. Ребра между компонентами циклов не образуют,
+    # поэтому каждая компонента решается отдельно
+    if components is None:
+        components = graph.deadlocked_components()
+    names = graph.names
+    costs = costs or {}
+    planned = []
+    for component in components:
+        local_of = {node_id: local for local, node_id in enumerate(component)}
+        adjacency = [[local_of[target] for target in graph.neighbors(node_id) if target in local_of]
+                     for node_id in component]
+        weights = [costs.get(names[node_id], DEFAULT_COST) for node_id in component]
+        victims, exact = resolve_component(adjacency, weights, exact_max_nodes, exact_max_steps)
+        victims.sort()
+        planned.append(([names[component[local]] for local in victims],
+                        sum(weights[local] for local in victims), exact))
+    return ResolutionPlan(planned)
+
+
+def plan_resolution_by_names(graph, deadlocked_sccs, costs=None):
+    # То же для графа-словаря {ожидающий: [удерживающие]} и компонент по именам процессов -
+    # например, подграфа тупиков IncrementalWFG.to_graph(...) в живом мониторинге и автоанализе
+    wfgraph = WFGraph.from_dict(graph)
+    index_of = wfgraph.index_of
+    return plan_resolution(wfgraph, [[index_of[name] for name in component] for component in deadlocked_sccs],
+                           costs)
+
+
+def resolve_component(adjacency, weights, exact_max_nodes=EXACT_MAX_NODES, exact_max_steps=EXACT_MAX_STEPS):
+    # adjacency - списки соседей вершин 0..n-1. (жертвы, точный ли минимум)
+    victims, forced, core = _greedy_victims(adjacency, weights)
+    if not core:
+        return victims, True  # Упрощение решило все само: петли обязаны быть жертвами
+    if len(core) > exact_max_nodes:
+        return victims, False
+    forced_set = set(forced)
+    upper_bound = sum(weights[node] for node in victims if node not in forced_set)
+    solution, exact = _exact_victims(adjacency, weights, core, upper_bound, exact_max_steps)
+    if solution is None:  # Жадный план и есть минимум
+        return victims, exact
+    return forced + solution, exact
+
+
+def _greedy_victims(adjacency, weights):
+    # Жадное приближение. (жертвы, жертвы-петли первого упрощения, вершины, оставшиеся после него)
+    node_count = len(adjacency)
+    successors = [set(neighbors) for neighbors in adjacency]
+    predecessors = [set() for _ in range(node_count)]
+    for node, neighbors in enumerate(adjacency):
+        for neighbor in neighbors:
+            predecessors[neighbor].add(node)
+    removed = bytearray(node_count)
+    victims = []
+    pending = deque(range(node_count))
+
+    def remove(node):
+        removed[node] = 1
+        for neighbor in successors[node]:
+            predecessors[neighbor].discard(node)
+            pending.append(neighbor)
+        for neighbor in predecessors[node]:
+            successors[neighbor].discard(node)
+            pending.append(neighbor)
+        successors[node] = predecessors[node] = ()
+
+    def reduce():
+        # Вершина без входящих или исходящих ребер не на цикле, вершина с петлей - обязательная жертва
+        while pending:
+            node = pending.popleft()
+            if removed[node]:
+                continue
+            if node in successors[node]:
+                victims.append(node)
+                remove(node)
+            elif not successors[node] or not predecessors[node]:
+                remove(node)
+
+    reduce()
+    forced = list(victims)
+    core = [node for node in range(node_count) if not removed[node]]
+    heap = [(-len(successors[node]) * len(predecessors[node]) / weights[node], node) for node in core]
+    heapq.heapify(heap)
+    while heap:
+        score, node = heapq.heappop(heap)
+        if removed[node]:
+            continue
+        # Степени только убывают: если оценка не изменилась, вершина - настоящий максимум
+        current = -len(successors[node]) * len(predecessors[node]) / weights[node]
+        if current > score:
+            heapq.heappush(heap, (current, node))
+            continue
+        victims.append(node)
+        remove(node)
+        reduce()
+
+    if len(victims) * (node_count + sum(map(len, adjacency))) <= REDUNDANCY_MAX_WORK:
+        victims = _drop_redundant(adjacency, weights, victims, set(forced))
+    return victims, forced, core
+
+
+def _drop_redundant(adjacency, weights, victims, forced):
+    # Жертва лишняя, если через нее нет цикла среди оставшихся процессов. Дорогие проверяются первыми
+    victim_set = set(victims)
+    for node in sorted(victims, key=lambda candidate: -weights[candidate]):
+        if node in forced:
+            continue
+        victim_set.discard(node)
+        seen = {node}
+        stack = [node]
+        on_cycle = False
+        while stack and not on_cycle:
+            for neighbor in adjacency[stack.pop()]:
+                if neighbor == node:
+                    on_cycle = True
+                    break
+                if neighbor not in seen and neighbor not in victim_set:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        if on_cycle:
+            victim_set.add(node)
+    return [node for node in victims if node in victim_set]
+
+
+def _exact_victims(adjacency, weights, core, upper_bound, max_steps):
+    # Ветвление по вершинам кратчайшего цикла: одна из них обязана быть жертвой. В ветви i
+    # первые i - 1 кандидатов запрещены, поэтому ветви не повторяют друг друга.
+    # (жертвы или None, если дешевле upper_bound нет; доказан ли минимум)
+    local_of = {node: local for local, node in enumerate(core)}
+    successor_masks = [0] * len(core)
+    predecessor_masks = [0] * len(core)
+    for local, node in enumerate(core):
+        for neighbor in adjacency[node]:
+            other = local_of.get(neighbor)
+            if other is not None:
+                successor_masks[local] |= 1 << other
+                predecessor_masks[other] |= 1 << local
+    local_weights = [weights[node] for node in core]
+    best = [upper_bound, None]
+    steps = [0]
+
+    def branch(alive, forbidden, cost, chosen):
+        steps[0] += 1
+        if steps[0] > max_steps:
+            raise _BudgetExceeded()
+        changed = True
+        while changed:
+            changed = False
+            for local in _bits(alive):
+                successors = successor_masks[local] & alive
+                if successors >> local & 1:
+                    if forbidden >> local & 1:
+                        return
+                    cost += local_weights[local]
+                    chosen |= 1 << local
+                elif successors and predecessor_masks[local] & alive:
+                    continue
+                alive &= ~(1 << local)
+                changed = True
+        if cost >= best[0]:
+            return
+        if not alive:
+            best[:] = [cost, chosen]
+            return
+        candidates = [local for local in _shortest_cycle(alive, forbidden, successor_masks)
+                      if not forbidden >> local & 1]
+        candidates.sort(key=local_weights.__getitem__)
+        for position, local in enumerate(candidates):
+            branch(alive & ~(1 << local), forbidden, cost + local_weights[local], chosen | (1 << local))
+            forbidden |= 1 << candidates[position]
+
+    exact = True
+    try:
+        branch((1 << len(core)) - 1, 0, 0.0, 0)
+    except _BudgetExceeded:
+        exact = False
+    if best[1] is None:
+        return None, exact
+    return [core[local] for local in _bits(best[1])], exact
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _shortest_cycle(alive, forbidden, successor_masks):
+    # Кратчайший цикл через разрешенную вершину (поиск в ширину по битовым маскам); [] - такого нет
+    best = []
+    for start in _bits(alive & ~forbidden):
+        parents = {start: None}
+        frontier = [start]
+        visited = 1 << start
+        found = None
+        depth = 1
+        while frontier and found is None and (not best or depth < len(best)):
+            next_frontier = []
+            for node in frontier:
+                successors = successor_masks[node] & alive
+                if successors >> start & 1:
+                    found = node
+                    break
+                for neighbor in _bits(successors & ~visited):
+                    visited |= 1 << neighbor
+                    parents[neighbor] = node
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+            depth += 1
+        if found is None:
+            continue
+        cycle = []
+        while found is not None:
+            cycle.append(found)
+            found = parents[found]
+        best = cycle
+        if len(best) <= 2:
+            break
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="План разрешения тупиков: какие процессы снять.")
+    parser.add_argument("source", help="Текстовый файл WFG ('-' - stdin), стоимости - директивы '#@cost P 5'")
+    parser.add_argument("--exact-max", type=int, default=EXACT_MAX_NODES, metavar="N",
+                        help=f"Точный поиск для компонент до N процессов (по умолчанию {EXACT_MAX_NODES})")
+    args = parser.parse_args(argv)
+
+    costs = {}
+    graph, errors = parse_wfg_file(args.source, costs)
+    if errors:
+        print(f"Некорректных строк: {errors.count} (пропущены).", file=sys.stderr)
+    plan = plan_resolution(graph, costs=costs, exact_max_nodes=args.exact_max)
+    if not plan:
+        print("Тупиков не обнаружено.")
+        return 0
+    print(plan.summary())
+    for number, (victims, cost, exact) in enumerate(plan.components, start=1):
+        kind = "минимум" if exact else "приближение"
+        print(f"{number}. Стоимость {cost:g} ({kind}): {', '.join(victims)}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Графы распределения ресурсов с несколькими экземплярами (пулы соединений, семафоры).
+
+Если у ресурса несколько экземпляров, цикл в графе ожидания еще не доказывает тупик:
+экземпляр, освобожденный держателем вне цикла, может удовлетворить запрос. Поэтому
+ресурсы описываются явно:
+    RESOURCE Pool 3     у ресурса Pool три экземпляра
+    HOLD P1 Pool 2      P1 удерживает два экземпляра Pool (число по умолчанию 1)
+    REQUEST P2 Pool     P2 ждет один экземпляр Pool
+Тупик ищется редукцией графа (Holt): процесс, все запросы которого можно удовлетворить
+свободными экземплярами, завершается и возвращает удерживаемое; не сводимые процессы
+находятся в тупике. Повторных проходов по всем процессам нет: у каждого ресурса очередь
+запросов по возрастанию размера и указатель на первый неудовлетворенный, у каждого
+процесса - счетчик неудовлетворенных запросов. Каждый запрос и каждое удержание
+просматриваются один раз, поэтому время линейно по числу ребер (плюс сортировка очередей
+по размеру запроса). Только стандартная библиотека, как и DeadlockDetectorCore.
+
+Пример:
+    python DeadlockDetectorResources.py pool.rag
+"""
+import argparse
+import sys
+from collections import deque
+
+from DeadlockDetectorCore import WFGParseErrors, WFGraphBuilder
+
+RESOURCE_KEYWORDS = ('RESOURCE', 'HOLD', 'REQUEST')
+RESOURCE_SUFFIX = ".rag"
+
+
+def parse_resource_line(line):
+    # ('RESOURCE', ресурс, экземпляров) | ('HOLD' | 'REQUEST', процесс, ресурс, количество)
+    # или None для пустых строк и комментариев
+    parts = line.split()
+    if not parts or parts[0].startswith('#'):
+        return None
+    kind = parts[0].upper()
+    if kind == 'RESOURCE':
+        if len(parts) != 3:
+            raise ValueError("Неверный формат. Используйте 'RESOURCE R 3'.")
+        return kind, parts[1], _parse_count(parts[2])
+    if kind in ('HOLD', 'REQUEST'):
+        if len(parts) not in (3, 4):
+            raise ValueError(f"Неверный формат. Используйте '{kind} P1 R 2' (число по умолчанию 1).")
+        return kind, parts[1], parts[2], _parse_count(parts[3]) if len(parts) == 4 else 1
+    raise ValueError("В описании ресурсов допустимы только строки RESOURCE, HOLD и REQUEST.")
+
+
+def _parse_count(text):
+    try:
+        count = int(text)
+    except ValueError:
+        raise ValueError(f"Число экземпляров должно быть целым: '{text}'.") from None
+    if count <= 0:
+        raise ValueError("Число экземпляров должно быть положительным.")
+    return count
+
+
+def is_resource_format(lines):
+    # Формат определяется по первой значимой строке: RESOURCE/HOLD/REQUEST - описание ресурсов,
+    # иначе - обычный граф ожидания
+    for line in lines:
+        parts = line.split(None, 1)
+        if parts and not parts[0].startswith('#'):
+            return parts[0].upper() in RESOURCE_KEYWORDS
+    return False
+
+
+def is_resource_file(path):
+    if path == '-':
+        return False  # stdin нельзя прочитать дважды
+    with open(path, encoding='utf-8') as source:
+        return is_resource_format(source)
+
+
+class ResourceAllocationGraph:
+    # Процессы и ресурсы в общем пространстве имен (на графе это вершины двух видов).
+    # Повторные HOLD/REQUEST одной пары складываются
+    def __init__(self):
+        self.processes = []  # ID процесса -> имя
+        self.process_index = {}
+        self.resources = []  # ID ресурса -> имя
+        self.resource_index = {}
+        self.instances = []  # ID ресурса -> число экземпляров (None - не объявлен)
+        self.holds = {}  # (ID процесса, ID ресурса) -> удерживаемых экземпляров
+        self.requests = {}  # (ID процесса, ID ресурса) -> запрошенных экземпляров
+        self._declared_at = {}  # ID ресурса -> номер строки RESOURCE
+        self._graph = None
+
+    def _process(self, name):
+        process_id = self.process_index.get(name)
+        if process_id is None:
+            if name in self.resource_index:
+                raise ValueError(f"'{name}' уже объявлен как ресурс.")
+            process_id = len(self.processes)
+            self.process_index[name] = process_id
+            self.processes.append(name)
+        return process_id
+
+    def _resource(self, name):
+        resource_id = self.resource_index.get(name)
+        if resource_id is None:
+            if name in self.process_index:
+                raise ValueError(f"'{name}' уже используется как процесс.")
+            resource_id = len(self.resources)
+            self.resource_index[name] = resource_id
+            self.resources.append(name)
+            self.instances.append(None)
+        return resource_id
+
+    def add_resource(self, name, instances, line_number=0):
+        resource_id = self._resource(name)
+        if self.instances[resource_id] not in (None, instances):
+            raise ValueError(f"Ресурс '{name}' уже объявлен с {self.instances[resource_id]} экземплярами.")
+        self.instances[resource_id] = instances
+        self._declared_at.setdefault(resource_id, line_number)
+        self._graph = None
+
+    def add_hold(self, process, resource, count=1):
+        key = (self._process(process), self._resource(resource))
+        self.holds[key] = self.holds.get(key, 0) + count
+        self._graph = None
+
+    def add_request(self, process, resource, count=1):
+        key = (self._process(process), self._resource(resource))
+        self.requests[key] = self.requests.get(key, 0) + count
+        self._graph = None
+
+    def validate(self, errors):
+        # Необъявленный ресурс считается одним экземпляром (обычная блокировка). Если выдано больше
+        # экземпляров, чем есть, это ошибка входа: число экземпляров поднимается до выданного
+        held = [0] * len(self.resources)
+        for (_, resource_id), count in self.holds.items():
+            held[resource_id] += count
+        for resource_id, name in enumerate(self.resources):
+            instances = self.instances[resource_id] or 1
+            if held[resource_id] > instances:
+                errors.add(self._declared_at.get(resource_id, 0), f"RESOURCE {name} {instances}",
+                           f"Выдано {held[resource_id]} экземпляров ресурса '{name}' из {instances}.")
+                instances = held[resource_id]
+            self.instances[resource_id] = instances
+
+    @property
+    def graph(self):
+        # Двудольный WFGraph для отрисовки и запросов: ребро P -> R - запрос, R -> P - удержание
+        if self._graph is None:
+            builder = WFGraphBuilder()
+            for name in self.processes:
+                builder.intern(name)
+            for name in self.resources:
+                builder.intern(name)
+            processes, resources = self.processes, self.resources
+            for process_id, resource_id in self.requests:
+                builder.add_edge(processes[process_id], resources[resource_id])
+            for process_id, resource_id in self.holds:
+                builder.add_edge(resources[resource_id], processes[process_id])
+            self._graph = builder.build()
+        return self._graph
+
+    def reduce(self):
+        # Редукция Holt -> ResourceReduction. Сведенный процесс получает запрошенное, завершается и
+        # возвращает все, поэтому свободных экземпляров со временем только больше: каждый запрос
+        # проверяется против текущего остатка один раз и больше не пересматривается
+        if None in self.instances:
+            self.validate(WFGParseErrors())
+        process_count = len(self.processes)
+        available = list(self.instances)
+        held_by = [[] for _ in range(process_count)]
+        for (process_id, resource_id), count in self.holds.items():
+            available[resource_id] -= count
+            held_by[process_id].append((resource_id, count))
+        queues = [[] for _ in self.resources]  # (запрошено, ID процесса) по возрастанию
+        pending = [0] * process_count  # Неудовлетворенных запросов процесса
+        for (process_id, resource_id), count in self.requests.items():
+            queues[resource_id].append((count, process_id))
+            pending[process_id] += 1
+        cursors = [0] * len(queues)
+        ready = deque(process_id for process_id in range(process_count) if not pending[process_id])
+
+        def grant(resource_id):
+            queue, position, free = queues[resource_id], cursors[resource_id], available[resource_id]
+            while position < len(queue) and queue[position][0] <= free:
+                process_id = queue[position][1]
+                pending[process_id] -= 1
+                if not pending[process_id]:
+                    ready.append(process_id)
+                position += 1
+            cursors[resource_id] = position
+
+        for resource_id, queue in enumerate(queues):
+            queue.sort()
+            grant(resource_id)
+        reduced = bytearray(process_count)
+        while ready:
+            process_id = ready.popleft()
+            reduced[process_id] = 1
+            for resource_id, count in held_by[process_id]:
+                available[resource_id] += count
+                grant(resource_id)
+
+        blocked = {}  # Процесс в тупике -> [(ресурс, запрошено, свободно)]
+        for resource_id, queue in enumerate(queues):
+            for count, process_id in queue[cursors[resource_id]:]:
+                blocked.setdefault(process_id, []).append(
+                    (self.resources[resource_id], count, available[resource_id]))
+        # Без тупика полезно знать, были ли циклы ожидания: именно их мог бы принять за тупик поиск по WFG
+        wait_cycles = 0 if blocked else len(self.graph.deadlocked_components())
+        return ResourceReduction(
+            {self.processes[process_id]: blocked[process_id] for process_id in sorted(blocked)},
+            {name: (available[resource_id], self.instances[resource_id])
+             for resource_id, name in enumerate(self.resources)},
+            wait_cycles)
+
+
+class ResourceReduction:
+    # Итог редукции: кто в тупике, чего ему не хватает и сколько экземпляров свободно в конце
+    def __init__(self, blocked, availability, wait_cycles):
+        self.blocked = blocked  # Процесс в тупике -> [(ресурс, запрошено, свободно)]
+        self.availability = availability  # Ресурс -> (свободно после редукции, всего экземпляров)
+        self.wait_cycles = wait_cycles  # Компонент с циклами в графе запросов и удержаний (считаются без тупика)
+
+    def __bool__(self):
+        return bool(self.blocked)
+
+    @property
+    def deadlocked(self):
+        return list(self.blocked)
+
+    @property
+    def deadlocked_resources(self):
+        # Ресурсы, экземпляров которых не дождутся процессы в тупике
+        return sorted({resource for requests in self.blocked.values() for resource, _, _ in requests})
+
+    def summary(self):
+        if self.blocked:
+            return (f"ОБНАРУЖЕН ТУПИК! Процессов в тупике: {len(self.blocked)}, "
+                    f"ресурсов: {len(self.deadlocked_resources)}")
+        if self.wait_cycles:
+            return f"Тупиков нет: циклы ожидания есть ({self.wait_cycles}), но экземпляров ресурсов хватает."
+        return "Тупиков не обнаружено."
+
+    def format_blocked(self, limit=None):
+        lines = []
+        for process, requests in list(self.blocked.items())[:limit]:
+            wanted = ", ".join(f"{resource} x{count} (свободно {free}/{self.availability[resource][1]})"
+                               for resource, count, free in requests)
+            lines.append(f"{process} ждет: {wanted}")
+        if limit is not None and len(self.blocked) > limit:
+            lines.append(f"... и еще процессов в тупике: {len(self.blocked) - limit}")
+        return lines
+
+
+def parse_resource_stream(lines):
+    # (ResourceAllocationGraph, WFGParseErrors): некорректные строки пропускаются и попадают в отчет
+    errors = WFGParseErrors()
+    allocation = ResourceAllocationGraph()
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            parsed = parse_resource_line(line)
+            if parsed is None:
+                continue
+            if parsed[0] == 'RESOURCE':
+                allocation.add_resource(parsed[1], parsed[2], line_number)
+            elif parsed[0] == 'HOLD':
+                allocation.add_hold(*parsed[1:])
+            else:
+                allocation.add_request(*parsed[1:])
+        except ValueError as exc:
+            errors.add(line_number, line.strip(), str(exc))
+    allocation.validate(errors)
+    return allocation, errors
+
+
+def parse_resource_file(path):
+    if path == '-':
+        return parse_resource_stream(sys.stdin)
+    with open(path, encoding='utf-8') as source:
+        return parse_resource_stream(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск тупиков в графе распределения ресурсов.")
+    parser.add_argument("source", help="Файл со строками RESOURCE/HOLD/REQUEST ('-' - stdin)")
+    args = parser.parse_args(argv)
+
+    allocation, errors = parse_resource_file(args.source)
+    if errors:
+        print(f"Некорректных строк: {errors.count} (пропущены).\n{errors.format_report()}", file=sys.stderr)
+    reduction = allocation.reduce()
+    print(reduction.summary())
+    for line in reduction.format_blocked():
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Двоичные снимки графа ожидания с загрузкой через mmap.
+
+Снимок - это таблица интернированных имен и CSR-массивы ребер фиксированной ширины,
+при желании с готовыми номерами тупиковых компонент и координатами раскладки.
+Файл открывается через mmap: WFGraph получает memoryview прямо на страницы файла,
+поэтому поиск тупиков и отрисовка начинаются без разбора и без копирования массивов.
+Имена декодируются по одному при обращении, поиск ID по имени - двоичный поиск по
+хранимому в файле порядку сортировки. Только стандартная библиотека, как и DeadlockDetectorCore.
+
+Пример (текстовый снимок -> двоичный, с компонентами и раскладкой):
+    python DeadlockDetectorSnapshot.py dump.wfg dump.wfgs --layout
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+from DeadlockDetectorCore import WFGraph, parse_wfg_file
+
+MAGIC = b"WFGSNAP1"
+VERSION = 1
+SNAPSHOT_SUFFIX = ".wfgs"
+HEADER = struct.Struct('<8sIIqq')  # Сигнатура, версия, число секций, число вершин, число ребер
+SECTION = struct.Struct('<qq')  # Смещение и длина секции в байтах
+ALIGNMENT = 8
+
+# Секции в порядке записи: (имя, формат элемента memoryview)
+SECTIONS = (
+    ('name_offsets', 'q'),  # n + 1 смещений имен в name_data
+    ('name_data', 'B'),  # Имена в UTF-8 подряд
+    ('name_order', 'i'),  # ID вершин, отсортированные по имени (для поиска ID по имени)
+    ('offsets', 'q'),  # CSR: n + 1 начал списков исходящих ребер
+    ('targets', 'i'),  # CSR: концы ребер
+    ('scc_ids', 'i'),  # Необязательно: номер тупиковой компоненты вершины или -1
+    ('coords', 'd'),  # Необязательно: x, y вершин подряд
+)
+OPTIONAL_SECTIONS = ('scc_ids', 'coords')
+
+
+class SnapshotNames(Sequence):
+    # ID -> имя без списка всех имен в памяти: строка декодируется при обращении
+    def __init__(self, name_offsets, name_data):
+        self._offsets = name_offsets
+        self._data = name_data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, node_id):
+        if isinstance(node_id, slice):
+            return [self[index] for index in range(*node_id.indices(len(self)))]
+        if node_id < 0:
+            node_id += len(self)
+        if not 0 <= node_id < len(self):
+            raise IndexError(node_id)
+        return str(self._data[self._offsets[node_id]:self._offsets[node_id + 1]], 'utf-8')
+
+
+class SnapshotNameIndex(Mapping):
+    # Имя -> ID двоичным поиском по name_order: O(log n) без словаря на все имена
+    def __init__(self, name_offsets, name_data, name_order):
+        self._offsets = name_offsets
+        self._data = name_data
+        self._order = name_order
+
+    def _name_bytes(self, node_id):
+        return self._data[self._offsets[node_id]:self._offsets[node_id + 1]].tobytes()
+
+    def __getitem__(self, name):
+        if not isinstance(name, str):
+            raise KeyError(name)
+        key = name.encode('utf-8')
+        order = self._order
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_bytes(order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and self._name_bytes(order[low]) == key:
+            return order[low]
+        raise KeyError(name)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        return iter(SnapshotNames(self._offsets, self._data))
+
+
+class WFGSnapshot:
+    # Открытый снимок. graph работает прямо на страницах файла, поэтому mmap живет, пока жив снимок
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("Двоичные снимки WFG поддерживаются только на little-endian системах.")
+        with open(path, 'rb') as source:
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if len(buffer) < HEADER.size or bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"'{path}' не является двоичным снимком WFG.")
+        _, version, section_count, node_count, edge_count = HEADER.unpack_from(buffer)
+        if version != VERSION or section_count != len(SECTIONS):
+            raise ValueError(f"Неподдерживаемая версия снимка WFG: {version}.")
+        self.path = path
+        self._sections = {}
+        for index, (name, item_format) in enumerate(SECTIONS):
+            offset, size = SECTION.unpack_from(buffer, HEADER.size + index * SECTION.size)
+            if offset + size > len(buffer):
+                raise ValueError(f"Снимок WFG '{path}' поврежден: секция {name} выходит за конец файла.")
+            if name in OPTIONAL_SECTIONS and not size:
+                self._sections[name] = None
+            else:
+                self._sections[name] = buffer[offset:offset + size].cast(item_format)
+
+        sections = self._sections
+        if len(sections['offsets']) != node_count + 1 or len(sections['targets']) != edge_count:
+            raise ValueError(f"Снимок WFG '{path}' поврежден: размеры массивов не совпадают с заголовком.")
+        names = SnapshotNames(sections['name_offsets'], sections['name_data'])
+        index_of = SnapshotNameIndex(sections['name_offsets'], sections['name_data'], sections['name_order'])
+        self.graph = WFGraph(names, index_of, sections['offsets'], sections['targets'])
+        self.coords = sections['coords']  # memoryview x, y по ID вершин или None
+
+    @property
+    def has_components(self):
+        return self._sections['scc_ids'] is not None
+
+    def deadlocked_components(self):
+        # Сохраненные тупиковые компоненты (списки ID) без повторного алгоритма Тарьяна
+        scc_ids = self._sections['scc_ids']
+        if scc_ids is None:
+            return self.graph.deadlocked_components()
+        components = {}
+        for node_id, scc_id in enumerate(scc_ids):
+            if scc_id >= 0:
+                components.setdefault(scc_id, []).append(node_id)
+        return [components[scc_id] for scc_id in sorted(components)]
+
+
+def is_snapshot(path):
+    try:
+        with open(path, 'rb') as source:
+            return source.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def open_snapshot(path):
+    return WFGSnapshot(path)
+
+
+def save_snapshot(path, graph, deadlocked_components=None, coords=None):
+    # graph - WFGraph; deadlocked_components - списки ID вершин; coords - (x, y) по порядку ID.
+    # Запись идет во временный файл и подменяет path целиком: открытый через mmap старый снимок
+    # (возможно, тот же самый graph) остается читаемым, пока его не закроют
+    if sys.byteorder != 'little':
+        raise ValueError("Двоичные снимки WFG поддерживаются только на little-endian системах.")
+    names = graph.names
+    node_count = graph.node_count
+    encoded = [name.encode('utf-8') for name in names]
+    name_offsets = array('q', bytes(8 * (node_count + 1)))
+    for node_id, name in enumerate(encoded):
+        name_offsets[node_id + 1] = name_offsets[node_id] + len(name)
+    name_order = array('i', sorted(range(node_count), key=encoded.__getitem__))
+    scc_ids = None
+    if deadlocked_components is not None:
+        scc_ids = array('i', [-1]) * node_count
+        for scc_id, component in enumerate(deadlocked_components):
+            for node_id in component:
+                scc_ids[node_id] = scc_id
+    coord_array = None
+    if coords is not None:
+        coord_array = array('d', (value for position in coords for value in position))
+        if len(coord_array) != 2 * node_count:
+            raise ValueError("Координаты нужны для каждой вершины графа.")
+
+    payloads = {'name_offsets': name_offsets, 'name_data': b"".join(encoded), 'name_order': name_order,
+                'offsets': graph.offsets, 'targets': graph.targets, 'scc_ids': scc_ids, 'coords': coord_array}
+    table_size = HEADER.size + len(SECTIONS) * SECTION.size
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'wb') as target:
+        target.write(bytes(table_size))
+        table = []
+        for name, _ in SECTIONS:
+            payload = payloads[name]
+            if payload is None:
+                table.append((0, 0))
+                continue
+            padding = -target.tell() % ALIGNMENT  # memoryview.cast требует выравнивания элементов
+            target.write(bytes(padding))
+            data = memoryview(payload).cast('B')
+            table.append((target.tell(), len(data)))
+            target.write(data)
+        target.seek(0)
+        target.write(HEADER.pack(MAGIC, VERSION, len(SECTIONS), node_count, graph.edge_count))
+        for offset, size in table:
+            target.write(SECTION.pack(offset, size))
+    os.replace(temporary_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Преобразование текстового снимка WFG в двоичный.")
+    parser.add_argument("source", help="Текстовый файл WFG ('-' - stdin)")
+    parser.add_argument("target", help=f"Двоичный снимок (обычно *{SNAPSHOT_SUFFIX})")
+    parser.add_argument("--no-sccs", action="store_true", help="Не сохранять тупиковые компоненты")
+    parser.add_argument("--layout", action="store_true", help="Сохранить раскладку (нужен NumPy)")
+    args = parser.parse_args(argv)
+
+    graph, errors = parse_wfg_file(args.source)
+    if errors:
+        print(f"Некорректных строк: {errors.count} (пропущены).\n{errors.format_report()}", file=sys.stderr)
+    components = None if args.no_sccs else graph.deadlocked_components()
+    coords = None
+    if args.layout:
+        from DeadlockDetectorLayout import compute_layout
+        _, coords = compute_layout(graph, 'auto', components or graph.deadlocked_components())
+        coords = coords.tolist()
+    save_snapshot(args.target, graph, components, coords)
+    print(f"Сохранено: {args.target} (процессов {graph.node_count}, зависимостей {graph.edge_count})",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
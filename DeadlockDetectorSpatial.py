@@ -0,0 +1,165 @@
+"""Пространственный индекс позиций вершин для быстрых запросов по холсту.
+
+Равномерная сетка поверх массива координат NumPy: поиск ближайшей вершины и
+вершин в прямоугольнике просматривает только ячейки рядом с запросом.
+"""
+import math
+
+import numpy as np
+
+
+class SpatialGridIndex:
+    def __init__(self, positions, cell_size=None):
+        # positions: {вершина: (x, y)} - как graph_pos
+        self.nodes = list(positions)
+        self._index_of = {node: index for index, node in enumerate(self.nodes)}
+        self.coords = np.array([positions[node] for node in self.nodes], dtype=float).reshape(-1, 2)
+        self._buffer = self.coords  # coords - начало буфера, add() расширяет буфер с запасом
+        self.cell_size = cell_size or self._auto_cell_size()
+        self._cells = {}  # (cx, cy) -> список индексов вершин
+        self._cell_of = []  # Индекс вершины -> ее ячейка
+        for index in range(len(self.nodes)):
+            cell = self._cell_key(*self.coords[index])
+            self._cells.setdefault(cell, []).append(index)
+            self._cell_of.append(cell)
+        self._update_extent()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _auto_cell_size(self):
+        # В среднем ~2 вершины на ячейку
+        if len(self.nodes) < 2:
+            return 1.0
+        span = self.coords.max(axis=0) - self.coords.min(axis=0)
+        area = max(span[0], 1e-9) * max(span[1], 1e-9)
+        return max(math.sqrt(2.0 * area / len(self.nodes)), 1e-9)
+
+    def _cell_key(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _update_extent(self):
+        if self._cells:
+            keys = np.array(list(self._cells), dtype=np.int64)
+            self._cell_min = keys.min(axis=0)
+            self._cell_max = keys.max(axis=0)
+        else:
+            self._cell_min = self._cell_max = np.zeros(2, dtype=np.int64)
+
+    def move(self, node, x, y):
+        # Инкрементальное обновление при перетаскивании вершины
+        index = self._index_of[node]
+        self.coords[index] = (x, y)
+        new_cell = self._cell_key(x, y)
+        old_cell = self._cell_of[index]
+        if new_cell == old_cell:
+            return
+        members = self._cells[old_cell]
+        members.remove(index)
+        if not members:
+            del self._cells[old_cell]
+        self._cells.setdefault(new_cell, []).append(index)
+        self._cell_of[index] = new_cell
+        self._cell_min = np.minimum(self._cell_min, new_cell)
+        self._cell_max = np.maximum(self._cell_max, new_cell)
+
+    def add(self, node, x, y):
+        # Новая вершина (живой мониторинг); координаты хранятся с запасом, добавление - O(1) в среднем
+        index = len(self.nodes)
+        if index == len(self._buffer):
+            grown = np.empty((max(2 * index, 16), 2), dtype=float)
+            grown[:index] = self._buffer[:index]
+            self._buffer = grown
+        self._buffer[index] = (x, y)
+        self.coords = self._buffer[:index + 1]
+        self.nodes.append(node)
+        self._index_of[node] = index
+        cell = self._cell_key(x, y)
+        self._cells.setdefault(cell, []).append(index)
+        self._cell_of.append(cell)
+        self._cell_min = np.minimum(self._cell_min, cell) if index else np.array(cell, dtype=np.int64)
+        self._cell_max = np.maximum(self._cell_max, cell) if index else np.array(cell, dtype=np.int64)
+
+    def remove(self, node):
+        # На место удаленной вершины переезжает последняя, чтобы индексы оставались плотными
+        index = self._index_of.pop(node)
+        last = len(self.nodes) - 1
+        members = self._cells[self._cell_of[index]]
+        members.remove(index)
+        if not members:
+            del self._cells[self._cell_of[index]]
+        if index != last:
+            last_node = self.nodes[last]
+            last_members = self._cells[self._cell_of[last]]
+            last_members[last_members.index(last)] = index
+            self.nodes[index] = last_node
+            self._index_of[last_node] = index
+            self._buffer[index] = self._buffer[last]
+            self._cell_of[index] = self._cell_of[last]
+        self.nodes.pop()
+        self._cell_of.pop()
+        self.coords = self._buffer[:last]
+
+    def _ring_indices(self, center, radius):
+        # Индексы вершин в ячейках на границе квадрата радиуса radius вокруг center
+        cx, cy = center
+        if radius == 0:
+            return list(self._cells.get(center, ()))
+        found = []
+        for dx in range(-radius, radius + 1):
+            for cell in ((cx + dx, cy - radius), (cx + dx, cy + radius)):
+                found.extend(self._cells.get(cell, ()))
+        for dy in range(-radius + 1, radius):
+            for cell in ((cx - radius, cy + dy), (cx + radius, cy + dy)):
+                found.extend(self._cells.get(cell, ()))
+        return found
+
+    def nearest(self, x, y, max_distance=None):
+        # Ближайшая вершина (или None, если дальше max_distance)
+        if not self.nodes:
+            return None
+        center = self._cell_key(x, y)
+        offset_to_extent = np.maximum(np.abs(self._cell_min - center), np.abs(self._cell_max - center))
+        max_radius = int(offset_to_extent.max())
+        if max_distance is not None:
+            max_radius = min(max_radius, math.ceil(max_distance / self.cell_size) + 1)
+
+        best_index = None
+        best_dist_sq = float('inf') if max_distance is None else max_distance ** 2
+        for radius in range(max_radius + 1):
+            # Все вершины за пределами кольца radius дальше (radius * cell_size) от запроса
+            if best_index is not None and ((radius - 1) * self.cell_size) ** 2 > best_dist_sq:
+                break
+            candidates = self._ring_indices(center, radius)
+            if not candidates:
+                continue
+            deltas = self.coords[candidates] - (x, y)
+            dist_sq = np.einsum('ij,ij->i', deltas, deltas)
+            position = int(dist_sq.argmin())
+            if dist_sq[position] < best_dist_sq:
+                best_dist_sq = float(dist_sq[position])
+                best_index = candidates[position]
+        return None if best_index is None else self.nodes[best_index]
+
+    def in_rect(self, x0, y0, x1, y1):
+        # Вершины внутри прямоугольника (углы в любом порядке)
+        if not self.nodes:
+            return []
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        cell_x0, cell_y0 = self._cell_key(x0, y0)
+        cell_x1, cell_y1 = self._cell_key(x1, y1)
+        cell_x0, cell_y0 = max(cell_x0, self._cell_min[0]), max(cell_y0, self._cell_min[1])
+        cell_x1, cell_y1 = min(cell_x1, self._cell_max[0]), min(cell_y1, self._cell_max[1])
+        if cell_x1 < cell_x0 or cell_y1 < cell_y0:
+            return []
+        if (cell_x1 - cell_x0 + 1) * (cell_y1 - cell_y0 + 1) > len(self._cells):
+            candidates = np.arange(len(self.nodes))  # Прямоугольник покрывает почти все - векторная маска
+        else:
+            candidates = [index for cell_x in range(cell_x0, cell_x1 + 1) for cell_y in range(cell_y0, cell_y1 + 1)
+                          for index in self._cells.get((cell_x, cell_y), ())]
+            if not candidates:
+                return []
+        points = self.coords[candidates]
+        mask = (points[:, 0] >= x0) & (points[:, 0] <= x1) & (points[:, 1] >= y0) & (points[:, 1] <= y1)
+        return [self.nodes[index] for index in np.asarray(candidates)[mask]]